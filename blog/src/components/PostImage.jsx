@@ -0,0 +1,22 @@
+// Lets the browser pick the smallest resized variant that fills the slot,
+// falling back to the original upload.
+const srcSet = (urls) =>
+  Object.entries(urls)
+    .map(([width, url]) => `${url} ${width}w`)
+    .join(", ");
+
+const PostImage = ({ src, variants, sizes = "100vw", alt, ...props }) => {
+  if (!variants) {
+    return <img src={src} alt={alt} {...props} />;
+  }
+  return (
+    <picture>
+      {Object.entries(variants).map(([format, urls]) => (
+        <source key={format} type={`image/${format}`} srcSet={srcSet(urls)} sizes={sizes} />
+      ))}
+      <img src={src} alt={alt} loading="lazy" {...props} />
+    </picture>
+  );
+};
+
+export default PostImage;
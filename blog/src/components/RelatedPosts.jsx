@@ -0,0 +1,31 @@
+import axios from "axios";
+import { useEffect, useState } from "react";
+import ArticleCard from "../pages/home/ArticleCard";
+
+// Neighbours precomputed by the server, so this is one cheap request.
+const RelatedPosts = ({ slug }) => {
+  const [posts, setPosts] = useState([]);
+
+  useEffect(() => {
+    axios
+      .get(`http://127.0.0.1:8000/api/blogs/slug/${slug}/related/`)
+      .then((res) => setPosts(res.data))
+      .catch((error) => console.error("Error fetching related posts:", error));
+  }, [slug]);
+
+  if (posts.length === 0) {
+    return null;
+  }
+  return (
+    <section className="mb-12">
+      <h3 className="text-lg font-semibold text-gray-900 mb-4">Related articles</h3>
+      <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
+        {posts.slice(0, 3).map((post) => (
+          <ArticleCard key={post.id} article={post} />
+        ))}
+      </div>
+    </section>
+  );
+};
+
+export default RelatedPosts;
@@ -4,11 +4,14 @@ import axios from 'axios';
 import { useAuth } from '../../context/AuthContext';
 import defaultPfp from '../../assets/Default_pfp.jpg';
 import { useNavigate } from 'react-router-dom';
+import { openNotificationStream } from '../../utils/openNotificationStream';
 
 const Notification = () => {
   const [open, setOpen] = useState(false);
   const [notifications, setNotifications] = useState([]);
   const [loading, setLoading] = useState(false);
+  // Unread total reported by the stream; null until it connects
+  const [streamUnread, setStreamUnread] = useState(null);
   const menuRef = useRef();
   const { isLoggedIn } = useAuth();
   const navigate = useNavigate();
@@ -24,7 +27,7 @@ const Notification = () => {
             Authorization: `Bearer ${token}`,
           },
         });
-        setNotifications(res.data);
+        setNotifications(res.data.results);
       } catch (err) {
         setNotifications([]);
       } finally {
@@ -32,6 +35,21 @@ const Notification = () => {
       }
     };
     fetchNotifications();
+
+    // New notifications are pushed over Server-Sent Events instead of polling
+    return openNotificationStream({
+      notification: (e) => {
+        const { notification, unread_delta } = JSON.parse(e.data);
+        setNotifications((prev) => [notification, ...prev.filter((n) => n.id !== notification.id)]);
+        setStreamUnread((count) => (count ?? 0) + unread_delta);
+      },
+      unread: (e) => {
+        const data = JSON.parse(e.data);
+        setStreamUnread((count) => (data.count !== undefined ? data.count : (count ?? 0) + data.unread_delta));
+      },
+      // The stream's buffer overflowed, so reload the list
+      resync: fetchNotifications,
+    });
   }, [isLoggedIn]);
 
   // Close dropdown on outside click
@@ -45,7 +63,7 @@ const Notification = () => {
     return () => document.removeEventListener('mousedown', handler);
   }, [open]);
 
-  const unreadCount = notifications.filter(n => !n.is_read).length;
+  const unreadCount = streamUnread ?? notifications.filter(n => !n.is_read).length;
   const showNotifications = notifications.slice(0, 4);
   const hasMore = notifications.length > 4;
 
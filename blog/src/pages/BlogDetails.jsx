@@ -9,6 +9,7 @@ import { useAuth } from "../context/AuthContext";
 import { FiEdit, FiTrash2 } from "react-icons/fi";
 import { useNavigate } from "react-router-dom";
 import ConfirmationModal from "../components/ConfirmationModal";
+import RelatedPosts from "../components/RelatedPosts";
 import Register from "./auth/Register";
 
 function getImageUrl(path) {
@@ -71,19 +72,19 @@ const BlogDetails = () => {
       setShowRegister(true);
       return;
     }
-    setIsBookmarked((prev) => !prev);
+    const bookmarked = !isBookmarked;
+    setIsBookmarked(bookmarked);
     try {
-      await axios.post(
-        `http://127.0.0.1:8000/api/blogs/${article.id}/bookmark/`,
-        {},
-        {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem('access')}`,
-          },
-        }
-      );
+      // PUT/DELETE set the state, so repeated clicks cannot flip it twice
+      await axios.request({
+        method: bookmarked ? 'put' : 'delete',
+        url: `http://127.0.0.1:8000/api/blogs/${article.id}/bookmark/`,
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('access')}`,
+        },
+      });
     } catch (error) {
-      setIsBookmarked((prev) => !prev);
+      setIsBookmarked(!bookmarked);
       console.error("Error bookmarking post:", error);
     }
   };
@@ -94,21 +95,21 @@ const BlogDetails = () => {
       setShowRegister(true);
       return;
     }
-    setIsLiked((prev) => !prev);
-    setLikeCount((prev) => (isLiked ? prev - 1 : prev + 1));
+    const liked = !isLiked;
+    setIsLiked(liked);
+    setLikeCount((prev) => (liked ? prev + 1 : prev - 1));
     try {
-      await axios.post(
-        `http://127.0.0.1:8000/api/blogs/${article.id}/like/`,
-        {},
-        {
-          headers: {
-            Authorization: `Bearer ${localStorage.getItem('access')}`,
-          },
-        }
-      );
+      const response = await axios.request({
+        method: liked ? 'put' : 'delete',
+        url: `http://127.0.0.1:8000/api/blogs/${article.id}/like/`,
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('access')}`,
+        },
+      });
+      setLikeCount(response.data.total_likes);
     } catch (error) {
-      setIsLiked((prev) => !prev);
-      setLikeCount((prev) => (isLiked ? prev + 1 : prev - 1));
+      setIsLiked(!liked);
+      setLikeCount((prev) => (liked ? prev - 1 : prev + 1));
       console.error("Error liking post:", error);
     }
   };
@@ -285,6 +286,8 @@ const BlogDetails = () => {
         )}
       </div>
 
+      <RelatedPosts slug={article.slug} />
+
       <CommentSection initialComments={article.comments || []} currentUser={user} postSlug={article.slug} />
     </div>
   );
@@ -1,6 +1,7 @@
 import axios from "axios";
 import React, { useEffect, useState } from "react";
 import { useParams, Link } from "react-router-dom";
+import PostImage from "../components/PostImage";
 import { ClipLoader } from "react-spinners";
 
 const CategoryPage = () => {
@@ -15,7 +16,7 @@ const CategoryPage = () => {
         const res = await axios.get(
           `http://127.0.0.1:8000/api/blogs/filter/?slug=${slug}`
         );
-        setBlogs(res.data);
+        setBlogs(res.data.results);
       } catch (error) {
         console.log(error);
       } finally {
@@ -45,8 +46,10 @@ const CategoryPage = () => {
               key={blog.id}
               className="bg-white rounded-lg shadow hover:shadow-lg transition p-3"
             >
-              <img
+              <PostImage
                 src={blog.image}
+                variants={blog.image_variants}
+                sizes="(min-width: 768px) 33vw, (min-width: 640px) 50vw, 100vw"
                 alt={blog.title}
                 className="w-full h-36 object-cover rounded mb-3"
               />
@@ -60,7 +63,7 @@ const CategoryPage = () => {
                   day: "numeric",
                 })}
               </p>
-              <p className="text-sm text-gray-600 line-clamp-3" dangerouslySetInnerHTML={{ __html: blog.content }}></p>
+              <p className="text-sm text-gray-600 line-clamp-3">{blog.excerpt}</p>
             </Link>
           ))}
         </div>
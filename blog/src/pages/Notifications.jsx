@@ -3,6 +3,7 @@ import { FaRegCommentDots, FaRegThumbsUp } from 'react-icons/fa';
 import axios from 'axios';
 import { useAuth } from '../context/AuthContext';
 import defaultPfp from '../assets/Default_pfp.jpg';
+import { openNotificationStream } from '../utils/openNotificationStream';
 
 const Notifications = () => {
   const [notifications, setNotifications] = useState([]);
@@ -20,7 +21,7 @@ const Notifications = () => {
             Authorization: `Bearer ${token}`,
           },
         });
-        setNotifications(res.data);
+        setNotifications(res.data.results);
       } catch (err) {
         setNotifications([]);
       } finally {
@@ -28,11 +29,41 @@ const Notifications = () => {
       }
     };
     fetchNotifications();
+
+    // New notifications are pushed over Server-Sent Events instead of polling
+    return openNotificationStream({
+      notification: (e) => {
+        const { notification } = JSON.parse(e.data);
+        setNotifications((prev) => [notification, ...prev.filter((n) => n.id !== notification.id)]);
+      },
+      // The stream's buffer overflowed, so reload the list
+      resync: fetchNotifications,
+    });
   }, [isLoggedIn]);
 
+  const markAllRead = async () => {
+    try {
+      await axios.post('http://127.0.0.1:8000/api/notifications/mark_all_read/', {}, {
+        headers: {
+          Authorization: `Bearer ${localStorage.getItem('access')}`,
+        },
+      });
+      setNotifications((prev) => prev.map((n) => ({ ...n, is_read: true })));
+    } catch (err) {
+      // Leave the list as it was
+    }
+  };
+
   return (
     <div className="max-w-2xl mx-auto px-4 py-8">
-      <h1 className="text-2xl font-bold mb-6">All Notifications</h1>
+      <div className="flex items-center justify-between mb-6">
+        <h1 className="text-2xl font-bold">All Notifications</h1>
+        {notifications.some((n) => !n.is_read) && (
+          <button className="text-sm text-blue-600 hover:underline" onClick={markAllRead}>
+            Mark all as read
+          </button>
+        )}
+      </div>
       {loading ? (
         <div className="text-center text-gray-400 py-10">Loading...</div>
       ) : notifications.length === 0 ? (
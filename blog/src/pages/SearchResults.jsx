@@ -32,7 +32,7 @@ const SearchResults = () => {
             ? { headers: { Authorization: `Bearer ${token}` } }
             : undefined
         );
-        setResults(res.data);
+        setResults(res.data.results);
       } catch (err) {
         setResults([]);
       }
@@ -59,9 +59,14 @@ const SearchResults = () => {
               <h3 className="text-xl font-semibold mb-2 text-blue-700 hover:underline">
                 {blog.title}
               </h3>
-              <p className="text-gray-700 mb-2">
-                {blog.summary || (blog.content ? blog.content.replace(/<[^>]+>/g, '').slice(0, 120) + (blog.content.length > 120 ? '...' : '') : "")}
-              </p>
+              {blog.snippet ? (
+                // The snippet is escaped server-side apart from its <mark> tags
+                <p className="text-gray-700 mb-2" dangerouslySetInnerHTML={{ __html: blog.snippet }}></p>
+              ) : (
+                <p className="text-gray-700 mb-2">
+                  {blog.excerpt}
+                </p>
+              )}
               <span className="text-xs text-gray-500">Read more &rarr;</span>
             </Link>
           ))}
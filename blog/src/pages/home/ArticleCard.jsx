@@ -1,10 +1,13 @@
 import { Link } from "react-router-dom";
+import PostImage from "../../components/PostImage";
 
 const ArticleCard = ({ article, showCategory = true }) => {
   return (
     <Link to={`/blog/${article.slug}`} className="block group">
-      <img
+      <PostImage
         src={article.image}
+        variants={article.image_variants}
+        sizes="(min-width: 768px) 25vw, 100vw"
         alt={article.title}
         onError={(e) => {
           e.target.onerror = null;
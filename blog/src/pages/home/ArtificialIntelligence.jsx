@@ -18,7 +18,7 @@ const ArtificialIntelligence = () => {
           `http://127.0.0.1:8000/api/blogs/filter/?slug=artificial_intelligence&limit=4`
         );
         if (isMounted) {
-          setArticles(res.data);
+          setArticles(res.data.results);
         }
       } catch (error) {
         if (isMounted) {
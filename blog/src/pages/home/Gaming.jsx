@@ -17,7 +17,7 @@ const Gaming = () => {
           `http://127.0.0.1:8000/api/blogs/filter/?slug=gaming&limit=4`
         );
         if (isMounted) {
-          setArticles(res.data);
+          setArticles(res.data.results);
         }
       } catch (error) {
         if (isMounted) {
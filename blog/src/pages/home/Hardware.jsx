@@ -18,7 +18,7 @@ const Hardware = () => {
           `http://127.0.0.1:8000/api/blogs/filter/?slug=hardware&limit=4`
         );
         if (isMounted) {
-          setArticles(res.data);
+          setArticles(res.data.results);
         }
       } catch (error) {
         if (isMounted) {
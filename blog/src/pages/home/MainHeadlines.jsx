@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from "react";
 import { Link } from "react-router-dom";
+import PostImage from "../../components/PostImage";
 
 const MainHeadlines = () => {
   const [stories, setStories] = useState([]);
@@ -78,8 +79,10 @@ const MainHeadlines = () => {
       <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
         {main ? (
           <Link to={`/blog/${main.slug}`} className="relative md:col-span-2 col-span-1 block group">
-            <img
+            <PostImage
               src={main.image}
+              variants={main.image_variants}
+              sizes="(min-width: 768px) 66vw, 100vw"
               alt={main.title}
               className="w-full h-[380px] object-cover rounded-lg group-hover:opacity-90 transition"
             />
@@ -99,8 +102,10 @@ const MainHeadlines = () => {
         <div className="flex flex-col gap-6 h-full justify-between">
           {side.slice(0, 2).map((story, idx) => (
             <Link to={`/blog/${story.slug}`} className="flex flex-col md:flex-row gap-4 group" key={story.id}>
-              <img
+              <PostImage
                 src={story.image}
+                variants={story.image_variants}
+                sizes="(min-width: 768px) 200px, 100vw"
                 alt={story.title}
                 className="w-full md:w-[200px] h-[180px] object-cover rounded-lg group-hover:opacity-90 transition"
               />
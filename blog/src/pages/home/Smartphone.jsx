@@ -17,7 +17,7 @@ const Smartphone = () => {
           `http://127.0.0.1:8000/api/blogs/filter/?slug=smartphone&limit=4`
         );
         if (isMounted) {
-          setArticles(res.data);
+          setArticles(res.data.results);
         }
       } catch (error) {
         if (isMounted) {
@@ -0,0 +1,44 @@
+import axios from 'axios';
+
+// Seconds to wait before reconnecting a dropped stream
+const RETRY_SECONDS = 5;
+
+// Opens the notification stream with a single-use ticket, so the access
+// token never appears in a URL, and reconnects with a fresh ticket when it
+// drops. `listeners` maps event names to handlers. Returns a close function.
+export const openNotificationStream = (listeners) => {
+  let source = null;
+  let retry = null;
+  let closed = false;
+
+  const connect = async () => {
+    let ticket;
+    try {
+      const token = localStorage.getItem('access');
+      const res = await axios.post('http://127.0.0.1:8000/api/notifications/stream_ticket/', {}, {
+        headers: {
+          Authorization: `Bearer ${token}`,
+        },
+      });
+      ticket = res.data.ticket;
+    } catch (err) {
+      // Logged out or the token expired; keep what was fetched
+      return;
+    }
+    if (closed) return;
+    source = new EventSource(`http://127.0.0.1:8000/api/notifications/stream/?ticket=${encodeURIComponent(ticket)}`);
+    Object.entries(listeners).forEach(([event, handler]) => source.addEventListener(event, handler));
+    source.onerror = () => {
+      // A ticket opens one stream, so reconnect with a new one
+      source.close();
+      if (!closed) retry = setTimeout(connect, RETRY_SECONDS * 1000);
+    };
+  };
+
+  connect();
+  return () => {
+    closed = true;
+    clearTimeout(retry);
+    if (source) source.close();
+  };
+};
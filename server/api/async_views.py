@@ -0,0 +1,234 @@
+"""ASGI-native versions of the hot read endpoints.
+
+``techgeek.asgi`` routes requests through ``techgeek.asgi_urls``, which mounts
+these views at the same paths as their DRF counterparts in ``api.views``.
+GET and HEAD are handled here with the async ORM, so a request waiting on
+the database or a slow client holds no thread of its own. Any other method
+is passed to the DRF view in ``api_view_class``.
+
+The DRF view also supplies the permissions, serializer and paginator, so
+responses carry the same JSON and ETags as the DRF views and share their
+anonymous response cache. Pages are loaded with everything their
+serializer reads, so serializing them runs no queries. Django raises
+``SynchronousOnlyOperation`` if a query slips through.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from users.models import User
+from . import cache, conditional, db, feed, trending
+from .authentication import aauthenticate
+from .comment_tree import aattach_comment_trees
+from .models import BlogPost
+from .search import SearchResults
+from .view_tracking import record_view
+from . import views
+
+
+def json_response(data, status_code=status.HTTP_200_OK):
+    return HttpResponse(JSONRenderer().render(data), status=status_code, content_type='application/json')
+
+
+class AsyncReadView(View):
+    # Handlers are chosen in dispatch() rather than by method name
+    view_is_async = True
+    # The DRF view at the same path
+    api_view_class = None
+    # Its as_view(), which handles every other method
+    sync_view = None
+    # Cache responses to anonymous requests, like AnonymousCacheMixin
+    cache_anonymous = False
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        # Writes are handed to DRF views, which are exempt as well
+        return csrf_exempt(super().as_view(sync_view=cls.api_view_class.as_view(), **initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await sync_to_async(self.sync_view)(request, *args, **kwargs)
+        with await db.areplica_reads(request):
+            response = await self.read(request, *args, **kwargs)
+        if request.method == 'HEAD':
+            # The ASGI handler sends what it is given; GET's headers, no body
+            response['Content-Length'] = len(response.content)
+            response.content = b''
+        return response
+
+    def get_api_view(self, request, *args, **kwargs):
+        """The DRF view, set up for ``request`` as its own dispatch() would."""
+        api_request = Request(request, authenticators=())
+        api_request.user = request.user
+        return self.api_view_class(
+            request=api_request, args=args, kwargs=kwargs, format_kwarg=None, headers={},
+        )
+
+    def check_permissions(self):
+        """The DRF view's refusal, as ``APIView.permission_denied()`` words it, or None."""
+        for permission in self.api_view.get_permissions():
+            if permission.has_permission(self.api_view.request, self.api_view):
+                continue
+            if not self.api_view.request.user.is_authenticated:
+                return json_response({'detail': NotAuthenticated.default_detail}, status.HTTP_401_UNAUTHORIZED)
+            message = getattr(permission, 'message', None) or PermissionDenied.default_detail
+            return json_response({'detail': message}, status.HTTP_403_FORBIDDEN)
+        return None
+
+    async def read(self, request, *args, **kwargs):
+        try:
+            request.user = await aauthenticate(request)
+        except AuthenticationFailed as exc:
+            return json_response({'detail': exc.detail}, exc.status_code)
+        self.api_view = self.get_api_view(request, *args, **kwargs)
+        denied = self.check_permissions()
+        if denied is not None:
+            return denied
+
+        etag = await self.get_etag(request, *args, **kwargs)
+        if etag is not None:
+            response = conditional.not_modified(request, etag)
+            if response is not None:
+                await self.responded(request, None)
+                return response
+        try:
+            if self.cache_anonymous and not request.user.is_authenticated:
+                data, cache_status = await self.get_cached_data(request, *args, **kwargs)
+            else:
+                data, cache_status = await self.get_data(request, *args, **kwargs), None
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        response = conditional.tag(json_response(data), request, etag)
+        if cache_status:
+            response['X-Cache'] = cache_status
+        await self.responded(request, data)
+        return response
+
+    async def get_cached_data(self, request, *args, **kwargs):
+        key, data = await cache.alookup(request)
+        if data is not None:
+            return data, 'HIT'
+        data = await self.get_data(request, *args, **kwargs)
+        await cache.astore(key, data)
+        return data, 'MISS'
+
+    async def get_etag(self, request, *args, **kwargs):
+        """The response's ETag (see ``api.conditional``), or ``None`` for none."""
+        return None
+
+    async def get_data(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    async def responded(self, request, data):
+        """Hook run after every successful response, cached or not.
+
+        ``data`` is ``None`` for not-modified responses.
+        """
+
+    def serialize(self, instance, many=False):
+        return self.api_view.get_serializer(instance, many=many).data
+
+    async def paginate(self, queryset):
+        """The page of ``queryset`` the DRF view's paginator would cut."""
+        return await self.api_view.paginator.apaginate_queryset(queryset, self.api_view.request, self.api_view)
+
+    def paginated(self, page):
+        """The paginated response body for ``page``."""
+        return self.api_view.get_paginated_response(self.serialize(page, many=True)).data
+
+
+class BlogPostListView(AsyncReadView):
+    api_view_class = views.BlogPostAPIView
+    cache_anonymous = True
+
+    async def get_etag(self, request):
+        return await sync_to_async(conditional.cached_for_anonymous)(request, lambda: conditional.page_etag(
+            BlogPost.objects.for_list(request.user), self.api_view.paginator, self.api_view.request, request.user
+        ))
+
+    async def get_data(self, request):
+        return self.paginated(await self.paginate(BlogPost.objects.for_list(request.user)))
+
+
+class BlogPostSlugView(AsyncReadView):
+    api_view_class = views.BlogPostSlugAPIView
+    cache_anonymous = True
+
+    async def get_etag(self, request, slug):
+        self.post_id, etag = await sync_to_async(conditional.cached_for_anonymous)(
+            request, lambda: conditional.post_etag(slug, request.user)
+        )
+        return etag
+
+    async def get_data(self, request, slug):
+        try:
+            post = await BlogPost.objects.for_serializer(request.user).aget(slug=slug)
+        except BlogPost.DoesNotExist:
+            raise Http404
+        await aattach_comment_trees([post], request.user)
+        return self.serialize(post)
+
+    async def responded(self, request, data):
+        # May flush the view buffer, which writes through the sync ORM
+        await sync_to_async(record_view)(request, self.post_id)
+
+
+class TopStoriesView(AsyncReadView):
+    api_view_class = views.TopStoriesAPIView
+    cache_anonymous = True
+
+    async def get_data(self, request):
+        k, window_hours = trending.parse_params(request.GET)
+
+        posts = BlogPost.objects.for_list(request.user).filter(status=BlogPost.Status.PUBLISHED)
+        ids = await trending.atop_post_ids(k, window_hours)
+        stories = [post async for post in trending.stories(posts, ids, k).aiterator()]
+        return self.serialize(stories, many=True)
+
+
+class BlogPostSearchView(AsyncReadView):
+    api_view_class = views.BlogPostSearchAPIView
+
+    async def get_data(self, request):
+        query = request.GET.get('q', '')
+        posts = BlogPost.objects.for_list(request.user).filter(status=BlogPost.Status.PUBLISHED)
+        if not query.strip():
+            return self.paginated(await self.paginate(posts))
+        hits = await self.paginate(SearchResults(query))
+        found = {post.pk: post async for post in posts.filter(pk__in=[hit.post_id for hit in hits]).aiterator()}
+        results = []
+        for hit in hits:
+            post = found.get(hit.post_id)
+            if post is not None:
+                post.search_snippet = hit.snippet
+                results.append(post)
+        return self.paginated(results)
+
+
+class FeedView(AsyncReadView):
+    api_view_class = views.FeedAPIView
+
+    async def get_data(self, request):
+        post_ids = await sync_to_async(feed.feed_cache.post_ids)(request.user)
+        # A slice of a list in memory
+        posts = await feed.ahydrate(self.api_view.paginate_queryset(post_ids), request.user)
+        return self.paginated(posts)
+
+
+class PublicUserInfoView(AsyncReadView):
+    api_view_class = views.PublicUserInfoAPIView
+
+    async def get_data(self, request, user_id):
+        try:
+            user = await User.objects.aget(pk=user_id)
+        except User.DoesNotExist:
+            raise Http404
+        posts = BlogPost.objects.for_list(request.user).filter(author=user, status=BlogPost.Status.PUBLISHED)
+        user.published_blog_list = [post async for post in posts.aiterator()]
+        return self.serialize(user)
@@ -0,0 +1,39 @@
+"""JWT authentication for the async views, which run outside DRF."""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+async def auser_for_token(raw_token):
+    """Validate an access token and load its user; raises ``AuthenticationFailed``."""
+    token = JWTAuthentication().get_validated_token(raw_token)
+    try:
+        user_id = token[api_settings.USER_ID_CLAIM]
+    except KeyError:
+        raise InvalidToken('Token contained no recognizable user identification')
+    return await aget_user(user_id)
+
+
+async def aget_user(user_id):
+    """The active user with ``user_id``; raises ``AuthenticationFailed``."""
+    User = get_user_model()
+    try:
+        user = await User.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+    if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+        raise AuthenticationFailed('User is inactive', code='user_inactive')
+    return user
+
+
+async def aauthenticate(request):
+    """The user of a ``Bearer`` request, or ``AnonymousUser`` without one."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return AnonymousUser()
+    return await auser_for_token(raw_token)
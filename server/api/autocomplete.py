@@ -0,0 +1,254 @@
+"""In-memory prefix index behind the search-as-you-type endpoint.
+
+Published post titles and category names are kept in a sorted list of
+``(key, entry)`` tuples, one key per word of the label, so a prefix lookup
+is a ``bisect`` into the list instead of a database scan. The index is
+built when the server starts (see ``techgeek/wsgi.py`` and
+``techgeek/asgi.py``), or by the first lookup otherwise, and refreshed from
+the ``BlogPost``/``Category`` signals in ``api.signals``. Every
+``REFRESH_INTERVAL`` seconds it is rebuilt on a worker thread so that other
+worker processes' changes are picked up; lookups keep reading the current
+index until the new one is swapped in.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import BlogPost, Category
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Posts kept in the index; the oldest are evicted beyond this
+    'MAX_ENTRIES': 50_000,
+    'REFRESH_INTERVAL': 300,
+    # Keys inspected per lookup, which bounds the cost of short prefixes
+    'MAX_SCAN': 2_000,
+}
+
+# Keys longer than this are cut, bounding memory per entry
+MAX_KEY_LENGTH = 64
+# Categories are few and always listed ahead of posts
+CATEGORY_RANK = 2 ** 62
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    type: str
+    id: int
+    label: str
+    slug: str
+    # Higher ranks first: newer posts, and categories above all posts
+    rank: int
+
+    def as_dict(self):
+        return {'type': self.type, 'id': self.id, 'label': self.label, 'slug': self.slug}
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+def _keys(label):
+    words = normalize(label).split(' ')
+    return {' '.join(words[i:])[:MAX_KEY_LENGTH] for i in range(len(words)) if words[i]}
+
+
+class PrefixIndex:
+    def __init__(self, max_entries, refresh_interval, max_scan, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.refresh_interval = refresh_interval
+        self.max_scan = max_scan
+        self.clock = clock
+        self._lock = threading.RLock()
+        # Held by the one thread loading the index from the database
+        self._build_lock = threading.Lock()
+        self._builder = None
+        # Changes made while a build is loading, applied again once it is in
+        self._replay = None
+        self.clear()
+
+    @classmethod
+    def from_settings(cls):
+        config = {**DEFAULTS, **getattr(settings, 'AUTOCOMPLETE', {})}
+        return cls(config['MAX_ENTRIES'], config['REFRESH_INTERVAL'], config['MAX_SCAN'])
+
+    def clear(self):
+        with self._lock:
+            self._keys = []
+            self._entries = {}
+            # (rank, entry key) of posts, oldest first, for eviction
+            self._posts_by_rank = []
+            self._post_count = 0
+            self._built_at = None
+
+    @property
+    def built(self):
+        return self._built_at is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _load(self):
+        """Every category and the newest published posts."""
+        categories = Category.objects.values_list('pk', 'name', 'slug')
+        posts = (
+            BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED)
+            .order_by('-pk')
+            .values_list('pk', 'title', 'slug')[:self.max_entries]
+        )
+        suggestions = [Suggestion('category', pk, name, slug, CATEGORY_RANK) for pk, name, slug in categories]
+        suggestions += [Suggestion('post', pk, title, slug, pk) for pk, title, slug in posts]
+        return suggestions
+
+    def build(self):
+        """Load the index from the database and swap it in."""
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            self._replay = []
+        try:
+            suggestions = self._load()
+        except BaseException:
+            with self._lock:
+                self._replay = None
+            raise
+        # Sort once rather than inserting key by key, outside the lock
+        entries = {(suggestion.type, suggestion.id): suggestion for suggestion in suggestions}
+        keys = sorted((key, entry) for entry, suggestion in entries.items() for key in _keys(suggestion.label))
+        posts_by_rank = [(suggestion.rank, entry) for entry, suggestion in entries.items() if suggestion.type == 'post']
+        heapq.heapify(posts_by_rank)
+        with self._lock:
+            replay, self._replay = self._replay, None
+            self._keys = keys
+            self._entries = entries
+            self._posts_by_rank = posts_by_rank
+            self._post_count = len(posts_by_rank)
+            self._built_at = self.clock()
+            for change, args in replay:
+                change(*args)
+
+    def ensure_fresh(self):
+        """Build the index if it is missing; start a rebuild if it is stale."""
+        if not self.built:
+            # Concurrent first lookups wait for the same build
+            with self._build_lock:
+                if not self.built:
+                    self._build()
+        elif self.clock() - self._built_at >= self.refresh_interval:
+            self.warm()
+
+    def warm(self):
+        """Rebuild the index on a worker thread, unless one is already running."""
+        with self._lock:
+            if self._builder is not None and self._builder.is_alive():
+                return
+            self._builder = threading.Thread(target=self._run_build, name='autocomplete-build', daemon=True)
+            self._builder.start()
+
+    def _run_build(self):
+        try:
+            close_old_connections()
+            self.build()
+        except Exception:
+            logger.exception('Could not rebuild the autocomplete index')
+        finally:
+            close_old_connections()
+
+    def _apply(self, change, *args):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((change, args))
+            if self.built:
+                change(*args)
+
+    def _add(self, suggestion):
+        entry = (suggestion.type, suggestion.id)
+        previous = self._drop(entry)
+        self._entries[entry] = suggestion
+        for key in _keys(suggestion.label):
+            bisect.insort(self._keys, (key, entry))
+        if suggestion.type == 'post':
+            # A renamed post keeps its rank, and with it its heap item
+            if previous is None or previous.rank != suggestion.rank:
+                heapq.heappush(self._posts_by_rank, (suggestion.rank, entry))
+            self._post_count += 1
+            self._evict()
+
+    def _remove(self, entry):
+        suggestion = self._drop(entry)
+        if suggestion is not None and suggestion.type == 'post':
+            self._compact()
+
+    def _drop(self, entry):
+        suggestion = self._entries.pop(entry, None)
+        if suggestion is None:
+            return None
+        for key in _keys(suggestion.label):
+            i = bisect.bisect_left(self._keys, (key, entry))
+            if i < len(self._keys) and self._keys[i] == (key, entry):
+                del self._keys[i]
+        if suggestion.type == 'post':
+            self._post_count -= 1
+        return suggestion
+
+    def _compact(self):
+        # Removed posts leave their heap items behind; drop them once they outnumber the live ones
+        if len(self._posts_by_rank) <= 2 * self._post_count + 64:
+            return
+        live = {}
+        for rank, entry in self._posts_by_rank:
+            current = self._entries.get(entry)
+            if current is not None and current.rank == rank:
+                live[entry] = (rank, entry)
+        self._posts_by_rank = list(live.values())
+        heapq.heapify(self._posts_by_rank)
+
+    def _evict(self):
+        while self._post_count > self.max_entries and self._posts_by_rank:
+            rank, entry = heapq.heappop(self._posts_by_rank)
+            current = self._entries.get(entry)
+            # Skip heap items left behind by removals
+            if current is not None and current.rank == rank:
+                self._drop(entry)
+
+    def update_post(self, post):
+        if post.status == BlogPost.Status.PUBLISHED:
+            self._apply(self._add, Suggestion('post', post.pk, post.title, post.slug, post.pk))
+        else:
+            self._apply(self._remove, ('post', post.pk))
+
+    def remove_post(self, post_id):
+        self._apply(self._remove, ('post', post_id))
+
+    def update_category(self, category):
+        self._apply(self._add, Suggestion('category', category.pk, category.name, category.slug, CATEGORY_RANK))
+
+    def remove_category(self, category_id):
+        self._apply(self._remove, ('category', category_id))
+
+    def suggest(self, prefix, limit):
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            start = bisect.bisect_left(self._keys, (prefix,))
+            found = {}
+            for key, entry in self._keys[start:start + self.max_scan]:
+                if not key.startswith(prefix):
+                    break
+                found[entry] = self._entries[entry]
+        ranked = sorted(found.values(), key=lambda suggestion: -suggestion.rank)
+        return ranked[:limit]
+
+
+suggestion_index = PrefixIndex.from_settings()
@@ -0,0 +1,154 @@
+"""Batch actions over an author's own posts.
+
+``apply()`` runs one action over a list of post ids with a fixed number of
+set-based statements inside a single transaction, however many ids are
+given. Posts are scoped to the author in every statement, so ids belonging
+to someone else are reported ``not_found`` exactly like missing ones.
+
+``QuerySet.update()`` and through-table writes skip the signals a
+per-post save would send, so ``apply()`` reindexes the posts whose status
+changed, schedules them and those whose categories changed for a related
+posts refresh on commit, recounts the posts of the categories involved,
+marks the feeds following newly published posts stale and retires cached
+responses itself. Deletes cascade to comments, likes, bookmarks, notifications and
+the rest with one ``DELETE`` per table (see ``_delete()``), without
+loading the rows or sending ``pre_delete``/``post_delete``, and the
+receivers' upkeep is done once for the whole batch.
+"""
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import cache, categories, feed, notifications, related, search
+from .autocomplete import suggestion_index
+from .models import BlogPost, Notification
+
+
+STATUSES = {
+    'publish': BlogPost.Status.PUBLISHED,
+    'archive': BlogPost.Status.ARCHIVED,
+    'draft': BlogPost.Status.DRAFT,
+}
+CATEGORY_ACTIONS = ('add_category', 'remove_category')
+ACTIONS = (*STATUSES, *CATEGORY_ACTIONS, 'delete')
+
+# Ids accepted in one request
+MAX_IDS = 500
+
+UPDATED, UNCHANGED, DELETED, NOT_FOUND = 'updated', 'unchanged', 'deleted', 'not_found'
+
+
+def apply(author, action, ids, category=None):
+    """Run ``action`` over the posts of ``author`` among ``ids``.
+
+    ``category`` is the ``Category`` added or removed by the category
+    actions. Returns ``{id: result}`` for every id given.
+    """
+    if action not in ACTIONS:
+        raise ValueError(f'Unknown bulk action: {action}')
+    if (action in CATEGORY_ACTIONS) != (category is not None):
+        raise ValueError(f'{action} needs a category' if category is None else f'{action} takes no category')
+
+    unread = Counter()
+    with transaction.atomic():
+        posts = BlogPost.objects.filter(author=author, pk__in=ids)
+        owned = set(posts.select_for_update().values_list('pk', flat=True))
+        if action == 'delete':
+            unread = notifications.unread_by_recipient(
+                Notification.objects.filter(Q(post_id__in=owned) | Q(comment__post_id__in=owned))
+            )
+            filed_under = _categories_of(owned)
+            related.schedule(related.listed_by(owned))
+            _delete(BlogPost.objects.filter(pk__in=owned))
+            changed = owned
+            _unindex(changed)
+            categories.recount(filed_under)
+        elif action in STATUSES:
+            changed = set(posts.exclude(status=STATUSES[action]).values_list('pk', flat=True))
+            BlogPost.objects.filter(pk__in=changed).update(status=STATUSES[action], updated_at=timezone.now())
+        else:
+            changed = _set_category(owned, category, add=action == 'add_category')
+            # Keeps the posts' ETags honest, as saving through the serializer would
+            BlogPost.objects.filter(pk__in=changed).update(updated_at=timezone.now())
+
+        if action in STATUSES and changed:
+            _reindex(changed)
+            categories.recount(_categories_of(changed))
+        elif action in CATEGORY_ACTIONS and changed:
+            categories.recount([category.pk])
+            # Shared categories raise related-post scores
+            related.schedule(changed)
+        if action in ('publish', 'add_category') and changed:
+            _refresh_feeds(author, changed, category)
+
+    if changed:
+        cache.invalidate()
+    notifications.forget_unread(unread)
+
+    done = DELETED if action == 'delete' else UPDATED
+    return {
+        pk: done if pk in changed else UNCHANGED if pk in owned else NOT_FOUND
+        for pk in ids
+    }
+
+
+def _set_category(post_ids, category, add):
+    """Add or remove ``category`` on ``post_ids``; returns the posts changed."""
+    through = BlogPost.category.through
+    links = through.objects.filter(blogpost_id__in=post_ids, category_id=category.pk)
+    linked = set(links.values_list('blogpost_id', flat=True))
+    if not add:
+        links.delete()
+        return linked
+    missing = post_ids - linked
+    through.objects.bulk_create([through(blogpost_id=pk, category_id=category.pk) for pk in sorted(missing)])
+    return missing
+
+
+def _categories_of(post_ids):
+    through = BlogPost.category.through
+    return set(through.objects.filter(blogpost_id__in=post_ids).values_list('category_id', flat=True))
+
+
+def _delete(queryset):
+    """Delete ``queryset`` and everything that cascades from it, one DELETE per table.
+
+    Dependent tables are emptied first, each filtered by a subquery on its
+    parent, so nothing is loaded and no delete signals are sent. Comment
+    replies are the one self-referencing cascade, and they belong to the
+    same posts, so they are already among the rows deleted.
+    """
+    model = queryset.model
+    for relation in model._meta.get_fields(include_hidden=True):
+        # The reverse relations Django's Collector follows
+        if not (relation.auto_created and not relation.concrete and (relation.one_to_one or relation.one_to_many)):
+            continue
+        if relation.related_model is model or relation.on_delete is not models.CASCADE:
+            continue
+        _delete(relation.related_model._base_manager.filter(**{f'{relation.field.name}__in': queryset}))
+    queryset._raw_delete(queryset.db)
+
+
+def _unindex(post_ids):
+    search.get_backend().remove_many(post_ids)
+    for pk in post_ids:
+        suggestion_index.remove_post(pk)
+
+
+def _reindex(post_ids):
+    posts = list(BlogPost.objects.filter(pk__in=post_ids).only('pk', 'title', 'slug', 'content', 'status'))
+    search.get_backend().index_many(posts)
+    related.schedule(post_ids)
+    for post in posts:
+        suggestion_index.update_post(post)
+
+
+def _refresh_feeds(author, post_ids, category):
+    if category is not None:
+        published = BlogPost.objects.filter(pk__in=post_ids, status=BlogPost.Status.PUBLISHED)
+        if published.exists():
+            feed.note_published(category_ids=[category.pk])
+        return
+    feed.note_published([author.pk], _categories_of(post_ids))
@@ -0,0 +1,113 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'api:response-cache:version'
+HITS_KEY = 'api:response-cache:hits'
+MISSES_KEY = 'api:response-cache:misses'
+
+
+def current_version():
+    # A missing version starts from the clock so entries written before an
+    # eviction can never be mistaken for current ones
+    cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+    return cache.get(VERSION_KEY)
+
+
+def invalidate():
+    """Retire every cached response at once by moving to a new key version."""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        current_version()
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def _request_digest(request):
+    query = sorted(request.GET.lists())
+    # Responses hold absolute pagination links, so each origin gets its own entry
+    raw = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def response_key(request):
+    return f'api:response-cache:{current_version()}:{_request_digest(request)}'
+
+
+async def acurrent_version():
+    await cache.aadd(VERSION_KEY, time.time_ns(), timeout=None)
+    return await cache.aget(VERSION_KEY)
+
+
+async def _abump(key):
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        await cache.aadd(key, 0, timeout=None)
+        await cache.aincr(key)
+
+
+async def alookup(request):
+    """Async views' cache read: ``(key, data)``, with ``data`` None on a miss.
+
+    Keys match ``response_key()``, so both stacks share entries.
+    """
+    key = f'api:response-cache:{await acurrent_version()}:{_request_digest(request)}'
+    data = await cache.aget(key)
+    await _abump(MISSES_KEY if data is None else HITS_KEY)
+    return key, data
+
+
+async def astore(key, data):
+    await cache.aset(key, data, settings.API_CACHE_TIMEOUT)
+
+
+class AnonymousCacheMixin:
+    """Caches GET responses for anonymous requests.
+
+    Authenticated responses carry per-user ``liked``/``bookmarked`` flags, so
+    they always go through the view. Entries are invalidated by the model
+    signals in ``api.signals``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        key = response_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _bump(HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _bump(MISSES_KEY)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, settings.API_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,115 @@
+"""Categories held in memory, and their published post counts.
+
+There are only a handful of categories and they almost never change, so
+each process loads them once into a ``CategoryRegistry`` and looks them up
+by id or slug without a query. The registry is dropped from the
+``Category`` signals in ``api.signals`` and reloaded every
+``REFRESH_INTERVAL`` seconds so that other worker processes catch up too.
+
+``Category.post_count`` counts the published posts filed under each
+category. It is kept in step from the ``BlogPost`` and through-table
+signals, ``bulk.apply()`` recounts the categories its set-based statements
+touch, and ``manage.py recount_counters`` repairs any drift.
+"""
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import BlogPost, Category
+
+
+DEFAULTS = {
+    'REFRESH_INTERVAL': 300,
+}
+
+
+@dataclass(frozen=True)
+class Entry:
+    id: int
+    name: str
+    slug: str
+    created_at: object
+
+    @property
+    def pk(self):
+        return self.id
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'slug': self.slug, 'created_at': self.created_at}
+
+
+class CategoryRegistry:
+    def __init__(self, refresh_interval, clock=time.monotonic):
+        self.refresh_interval = refresh_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.clear()
+
+    @classmethod
+    def from_settings(cls):
+        config = {**DEFAULTS, **getattr(settings, 'CATEGORY_REGISTRY', {})}
+        return cls(config['REFRESH_INTERVAL'])
+
+    def clear(self):
+        with self._lock:
+            self._by_id = {}
+            self._by_slug = {}
+            self._loaded_at = None
+
+    def load(self):
+        entries = [Entry(*row) for row in Category.objects.order_by('pk').values_list('pk', 'name', 'slug', 'created_at')]
+        with self._lock:
+            self._by_id = {entry.id: entry for entry in entries}
+            self._by_slug = {entry.slug.lower(): entry for entry in entries}
+            self._loaded_at = self.clock()
+
+    def _fresh(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or self.clock() - loaded_at >= self.refresh_interval:
+            self.load()
+
+    def get(self, pk):
+        self._fresh()
+        return self._by_id.get(pk)
+
+    def by_slug(self, slug):
+        """The category at ``slug``, ignoring case, or None."""
+        self._fresh()
+        return self._by_slug.get(slug.lower())
+
+    def all(self):
+        self._fresh()
+        return list(self._by_id.values())
+
+
+def post_count_subquery():
+    """Correlated COUNT(*) of the published posts filed under the outer category."""
+    through = BlogPost.category.through
+    counts = (
+        through.objects.filter(category_id=OuterRef('pk'), blogpost__status=BlogPost.Status.PUBLISHED)
+        .order_by()
+        .values('category_id')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def recount(category_ids=None):
+    """Recompute ``post_count`` of ``category_ids``, or of every category, in one UPDATE."""
+    categories = Category.objects.all()
+    if category_ids is not None:
+        categories = categories.filter(pk__in=category_ids)
+    categories.update(post_count=post_count_subquery())
+
+
+def adjust(category_ids, by):
+    if category_ids:
+        Category.objects.filter(pk__in=category_ids).increment('post_count', by)
+
+
+registry = CategoryRegistry.from_settings()
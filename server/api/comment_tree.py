@@ -0,0 +1,67 @@
+from collections import defaultdict
+
+from .models import Comment, CommentLike
+
+
+def _comments(post_ids):
+    return (
+        Comment.objects.filter(post_id__in=post_ids, is_approved=True)
+        .select_related('author')
+        .order_by('created_at')
+    )
+
+
+def _liked_ids(user, post_ids):
+    return CommentLike.objects.filter(user=user, comment__post_id__in=post_ids).values_list('comment_id', flat=True)
+
+
+def _wants_likes(user):
+    return user is not None and user.is_authenticated
+
+
+def attach_comment_trees(posts, user=None):
+    """Build the approved comment tree of every post in ``posts``.
+
+    All comments are fetched in one query and the viewer's liked comment ids
+    in another, then parents are linked to children in memory. Each post gets
+    a ``comment_tree`` list of top-level comments and each comment a
+    ``tree_replies`` list and ``is_liked``.
+    """
+    posts = [post for post in posts if not hasattr(post, 'comment_tree')]
+    if not posts:
+        return
+    post_ids = [post.id for post in posts]
+    comments = list(_comments(post_ids))
+    liked_ids = set()
+    if _wants_likes(user) and comments:
+        liked_ids = set(_liked_ids(user, post_ids))
+    _link(posts, comments, liked_ids)
+
+
+async def aattach_comment_trees(posts, user=None):
+    """``attach_comment_trees()`` for async views."""
+    posts = [post for post in posts if not hasattr(post, 'comment_tree')]
+    if not posts:
+        return
+    post_ids = [post.id for post in posts]
+    comments = [comment async for comment in _comments(post_ids).aiterator()]
+    liked_ids = set()
+    if _wants_likes(user) and comments:
+        liked_ids = {comment_id async for comment_id in _liked_ids(user, post_ids).aiterator()}
+    _link(posts, comments, liked_ids)
+
+
+def _link(posts, comments, liked_ids):
+    children = defaultdict(list)
+    top_level = defaultdict(list)
+    for comment in comments:
+        comment.is_liked = comment.id in liked_ids
+        if comment.parent_id is None:
+            top_level[comment.post_id].append(comment)
+        else:
+            children[comment.parent_id].append(comment)
+
+    for comment in comments:
+        comment.tree_replies = children.get(comment.id, [])
+    for post in posts:
+        post.comment_tree = top_level.get(post.id, [])
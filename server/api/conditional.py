@@ -0,0 +1,139 @@
+"""Conditional GET for the post endpoints.
+
+Before a view loads and serializes anything it computes a strong ETag from
+one cheap query over the state its response shows:
+
+* a post: its ``updated_at`` and stored counters, plus the count, latest
+  ``updated_at`` and total likes of its comments;
+* a page of posts: each row's ``created_at``, ``updated_at`` and counters,
+  fetched through the view's own filters and paginator, and whether the
+  page has neighbours.
+
+Both include the author's name and picture and, for signed-in viewers,
+their like/bookmark flags (and liked comments on a post), and the tag is
+tied to the viewer. A matching ``If-None-Match`` is answered with 304
+without running the view.
+
+Anonymous tags are cached next to the anonymous responses (see
+``api.cache``) and retired with them, so a cached response still costs no
+queries.
+
+Changing a post's categories, or a category itself, moves the posts'
+``updated_at`` (see ``api.signals`` and ``api.bulk``), so the tags follow
+the categories a response shows.
+
+Likes and comments move the counters without touching ``updated_at``, so
+``Last-Modified`` cannot describe these responses and only ETags are sent.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db.models import Count, Max, Sum
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+from . import cache
+from .models import BlogPost, CommentLike
+
+
+ROW_FIELDS = ('pk', 'created_at', 'updated_at', 'like_count', 'comment_count', 'author__full_name', 'author__profile_picture')
+VIEWER_FIELDS = ('is_liked', 'is_bookmarked')
+
+
+def _viewer(user):
+    return user if user is not None and user.is_authenticated else None
+
+
+def _row_fields(user):
+    return ROW_FIELDS + VIEWER_FIELDS if _viewer(user) else ROW_FIELDS
+
+
+def make_etag(state, user):
+    viewer = _viewer(user)
+    raw = repr((viewer.pk if viewer else None, state))
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def post_etag(slug, user):
+    """``(post id, ETag)`` of the post at ``slug``, or ``(None, None)`` if there is none."""
+    row = (
+        BlogPost.objects.filter(slug=slug)
+        .with_viewer_flags(user)
+        .annotate(
+            comments_updated=Max('comments__updated_at'),
+            comment_likes=Sum('comments__like_count'),
+            comments_total=Count('comments'),
+        )
+        .values_list(*_row_fields(user), 'bookmark_count', 'comments_updated', 'comment_likes', 'comments_total')
+        .first()
+    )
+    if row is None:
+        return None, None
+    state = [row]
+    if _viewer(user):
+        state.append(sorted(
+            CommentLike.objects.filter(user=user, comment__post_id=row[0]).values_list('comment_id', flat=True)
+        ))
+    return row[0], make_etag(state, user)
+
+
+def page_etag(queryset, paginator, request, user):
+    """ETag of the page ``paginator`` would cut from ``queryset`` for ``request``."""
+    # Dicts, as paginators position their cursors from dicts but not tuples
+    rows = queryset.select_related(None).prefetch_related(None).values(*_row_fields(user))
+    if paginator is None:
+        return make_etag([tuple(row.values()) for row in rows], user)
+    page = [tuple(row.values()) for row in paginator.paginate_queryset(rows, request)]
+    # Whether the page links onwards, e.g. once the posts after it are deleted
+    links = (getattr(paginator, 'has_next', None), getattr(paginator, 'has_previous', None))
+    return make_etag([page, links], user)
+
+
+def cached_for_anonymous(request, compute):
+    """``compute()``, cached for anonymous requests until the response cache moves on."""
+    if _viewer(request.user):
+        return compute()
+    key = f'{cache.response_key(request)}:etag'
+    value = django_cache.get(key)
+    if value is None:
+        value = compute()
+        django_cache.set(key, value, settings.API_CACHE_TIMEOUT)
+    return value
+
+
+def not_modified(request, etag):
+    """The 304 (or failed If-Match 412) response for ``etag``, if any."""
+    validators = tag(HttpResponse(), request, etag)
+    response = get_conditional_response(request, etag=etag, response=validators)
+    return None if response is validators else response
+
+
+def tag(response, request, etag):
+    if etag is not None:
+        response['ETag'] = etag
+        # Revalidate every time; the tag is the viewer's own
+        patch_cache_control(response, no_cache=True, private=bool(_viewer(request.user)))
+        patch_vary_headers(response, ['Authorization'])
+    return response
+
+
+class ConditionalGetMixin:
+    """Answers ``If-None-Match`` with 304 before the view queries or serializes.
+
+    Views implement ``get_etag()``.
+    """
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request, *args, **kwargs)
+        if etag is not None:
+            response = not_modified(request, etag)
+            if response is not None:
+                return response
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == 200:
+            tag(response, request, etag)
+        return response
+
+    def get_etag(self, request, *args, **kwargs):
+        raise NotImplementedError
@@ -0,0 +1,147 @@
+"""Read replica routing with read-your-writes.
+
+Writes, and reads outside the views listed below, always use the primary.
+The read-only views (post lists and details, search, top stories and
+public profiles) opt in with ``ReplicaReadsMixin`` or ``replica_reads()``,
+and their queries go to a random alias in ``DATABASE_ROUTING['REPLICAS']``.
+
+Replicas lag the primary, so a client that has just written would not see
+its own like or comment on the next page it loads. ``ReadYourWritesMiddleware``
+remembers every client that made a successful write for ``STICKY_SECONDS``,
+and that client's reads stay on the primary until then. Clients are told
+apart by their ``Authorization`` header, or session cookie without one.
+
+Without replicas every query goes to the primary and nothing is tracked.
+"""
+import hashlib
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+
+
+DEFAULTS = {
+    # Aliases in DATABASES that mirror the primary
+    'REPLICAS': [],
+    # Seconds a client's reads stay on the primary after it writes
+    'STICKY_SECONDS': 10,
+}
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# The replica alias the current request reads from, if any
+_replica_reads = ContextVar('replica_reads', default=None)
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'DATABASE_ROUTING', {})}
+
+
+def _client_key(request):
+    client = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not client:
+        return None
+    return f'api:db:wrote:{hashlib.md5(client.encode()).hexdigest()}'
+
+
+def note_write(request):
+    """Keep the client's reads on the primary for the next ``STICKY_SECONDS``."""
+    cfg = config()
+    key = _client_key(request)
+    if cfg['REPLICAS'] and key is not None:
+        cache.set(key, True, cfg['STICKY_SECONDS'])
+
+
+async def anote_write(request):
+    cfg = config()
+    key = _client_key(request)
+    if cfg['REPLICAS'] and key is not None:
+        await cache.aset(key, True, cfg['STICKY_SECONDS'])
+
+
+def _may_use_replica(request):
+    return bool(config()['REPLICAS']) and request.method in SAFE_METHODS
+
+
+@contextmanager
+def _routed_to_replicas(enabled):
+    if not enabled:
+        yield
+        return
+    # One replica per request, so its queries see a single point in time
+    token = _replica_reads.set(random.choice(config()['REPLICAS']))
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(request):
+    """Send the ORM reads made inside to a replica, unless the client just wrote."""
+    if not _may_use_replica(request):
+        return _routed_to_replicas(False)
+    key = _client_key(request)
+    return _routed_to_replicas(key is None or cache.get(key) is None)
+
+
+async def areplica_reads(request):
+    """``replica_reads()`` for async views: ``with await areplica_reads(request):``."""
+    if not _may_use_replica(request):
+        return _routed_to_replicas(False)
+    key = _client_key(request)
+    return _routed_to_replicas(key is None or await cache.aget(key) is None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _replica_reads.get() or 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in config()['REPLICAS']
+
+
+class ReplicaReadsMixin:
+    """Routes a DRF view's GET queries to the replicas."""
+
+    def dispatch(self, request, *args, **kwargs):
+        with replica_reads(request):
+            return super().dispatch(request, *args, **kwargs)
+
+
+class ReadYourWritesMiddleware:
+    """Notes the clients whose writes succeeded; see ``note_write()``."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if self.wrote(request, response):
+            note_write(request)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if self.wrote(request, response):
+            await anote_write(request)
+        return response
+
+    @staticmethod
+    def wrote(request, response):
+        return request.method not in SAFE_METHODS and response.status_code < 400
@@ -0,0 +1,204 @@
+"""Personalized home feed.
+
+A reader's feed ranks the ``CANDIDATES`` newest published posts by
+
+    (1 + CATEGORY_WEIGHT * category affinity + AUTHOR_WEIGHT * author affinity)
+    * 2 ** (-age / HALF_LIFE_HOURS)
+
+where category affinity is the share of the reader's bookmarks filed under
+the post's best-matching category, and author affinity the share of their
+likes given to its author. Readers with neither get the newest posts.
+Their own posts are left out.
+
+The ranking is computed on read and only the top ``SIZE`` post ids are kept,
+per reader, in a ``FeedCache``: a bounded LRU of ``MAX_USERS`` entries that
+expire after ``TTL`` seconds. A page of the feed is then one ``id__in``
+query over those ids.
+
+Entries are invalidated lazily. Publishing a post stamps its categories and
+author with the time, in the shared cache so every worker sees it, and an
+entry built before a stamp on one of its reader's categories or authors is
+rebuilt on the next read. Nothing is recomputed for readers who don't come
+back. A reader's own new likes and bookmarks show once their entry expires.
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import BlogPost, Like
+
+
+DEFAULTS = {
+    # Post ids kept per reader
+    'SIZE': 200,
+    # Newest published posts ranked for each feed
+    'CANDIDATES': 1000,
+    'TTL': 10 * 60,
+    'MAX_USERS': 10_000,
+    'HALF_LIFE_HOURS': 48,
+    'CATEGORY_WEIGHT': 2.0,
+    'AUTHOR_WEIGHT': 3.0,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'FEED', {})}
+
+
+def _stamp_key(kind, pk):
+    return f'api:feed:published:{kind}:{pk}'
+
+
+def note_published(author_ids=(), category_ids=()):
+    """Mark the feeds following these authors or categories as stale."""
+    now = time.time()
+    keys = [_stamp_key('author', pk) for pk in author_ids] + [_stamp_key('category', pk) for pk in category_ids]
+    if keys:
+        cache.set_many(dict.fromkeys(keys, now), config()['TTL'])
+
+
+@dataclass
+class Interests:
+    # Shares of the reader's bookmarks and likes, each summing to 1
+    categories: dict
+    authors: dict
+
+    @classmethod
+    def of(cls, user):
+        through = BlogPost.category.through
+        categories = dict(
+            through.objects.filter(blogpost__bookmarks__user=user)
+            .order_by().values_list('category_id').annotate(n=Count('pk'))
+        )
+        authors = dict(
+            Like.objects.filter(user=user).order_by().values_list('post__author_id').annotate(n=Count('pk'))
+        )
+        return cls(_shares(categories), _shares(authors))
+
+    def stamp_keys(self):
+        return [_stamp_key('category', pk) for pk in self.categories] + [_stamp_key('author', pk) for pk in self.authors]
+
+
+def _shares(counts):
+    total = sum(counts.values())
+    return {key: count / total for key, count in counts.items()}
+
+
+def rank(user, interests, now=None):
+    """The ids of the reader's top ``SIZE`` posts, best first."""
+    cfg = config()
+    now = now or time.time()
+    half_life = cfg['HALF_LIFE_HOURS'] * 3600
+    candidates = list(
+        BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED)
+        .exclude(author=user)
+        .order_by('-created_at')
+        .values_list('pk', 'author_id', 'created_at')[:cfg['CANDIDATES']]
+    )
+    if not interests.categories and not interests.authors:
+        return [pk for pk, _, _ in candidates[:cfg['SIZE']]]
+
+    categories = {}
+    through = BlogPost.category.through
+    links = through.objects.filter(blogpost_id__in=[pk for pk, _, _ in candidates], category_id__in=interests.categories)
+    for post_id, category_id in links.values_list('blogpost_id', 'category_id'):
+        categories[post_id] = max(categories.get(post_id, 0), interests.categories[category_id])
+
+    scored = []
+    for pk, author_id, created_at in candidates:
+        affinity = (
+            1 + cfg['CATEGORY_WEIGHT'] * categories.get(pk, 0)
+            + cfg['AUTHOR_WEIGHT'] * interests.authors.get(author_id, 0)
+        )
+        age = max(now - created_at.timestamp(), 0)
+        scored.append((affinity * 2 ** (-age / half_life), created_at, pk))
+    scored.sort(reverse=True)
+    return [pk for _, _, pk in scored[:cfg['SIZE']]]
+
+
+@dataclass
+class Entry:
+    post_ids: list
+    stamp_keys: list
+    built_at: float
+
+
+class FeedCache:
+    """Bounded LRU of ranked feeds that expire after ``ttl`` seconds."""
+
+    def __init__(self, max_users, ttl, clock=time.time):
+        self.max_users = max_users
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @classmethod
+    def from_settings(cls):
+        cfg = config()
+        return cls(cfg['MAX_USERS'], cfg['TTL'])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _fresh(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            if self.clock() - entry.built_at >= self.ttl:
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+        # Something the reader follows was published since
+        stamps = cache.get_many(entry.stamp_keys) if entry.stamp_keys else {}
+        if any(stamp >= entry.built_at for stamp in stamps.values()):
+            return None
+        return entry
+
+    def post_ids(self, user):
+        """The reader's ranked post ids, from the cache or ranked now."""
+        entry = self._fresh(user.pk)
+        if entry is not None:
+            return entry.post_ids
+        # Taken first, so a post published while ranking invalidates the entry
+        built_at = self.clock()
+        interests = Interests.of(user)
+        entry = Entry(rank(user, interests), interests.stamp_keys(), built_at)
+        with self._lock:
+            self._entries[user.pk] = entry
+            self._entries.move_to_end(user.pk)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        return entry.post_ids
+
+    def forget(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+
+def _published(user):
+    return BlogPost.objects.for_list(user).filter(status=BlogPost.Status.PUBLISHED)
+
+
+def hydrate(post_ids, user):
+    """The published posts among ``post_ids``, in that order, with one batched query."""
+    found = _published(user).in_bulk(post_ids)
+    return [found[pk] for pk in post_ids if pk in found]
+
+
+async def ahydrate(post_ids, user):
+    found = await _published(user).ain_bulk(post_ids)
+    return [found[pk] for pk in post_ids if pk in found]
+
+
+feed_cache = FeedCache.from_settings()
@@ -0,0 +1,211 @@
+"""Resized variants of uploaded images.
+
+``BlogPost.image`` and ``User.profile_picture`` are stored as uploaded.
+Every original also has a variant per width in ``WIDTHS`` and format in
+``FORMATS``, stored under ``MEDIA_ROOT`` at::
+
+    variants/<width>w/<original name>.<format>
+
+Variant URLs are derived from the original's name alone, so serializers
+expose them (``ImageVariantsField``) without touching the disk.
+
+Variants are rendered on a pool of ``WORKERS`` threads once an upload's
+transaction commits, so the request doesn't wait for them. A variant
+requested before it exists is rendered by ``views.image_variant`` and kept
+on disk for the next request, and ``generate_image_variants`` backfills
+existing media. Rendering never upscales: an original narrower than a
+width is only re-encoded.
+
+Only files in the image fields' upload directories have variants, and
+``views.image_variant`` renders one only for an original a post or user
+actually holds, so a request can't turn a variant, or any other file
+under ``MEDIA_ROOT``, into a new render.
+"""
+import logging
+import os
+import posixpath
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+from .models import BlogPost
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WIDTHS': [320, 640, 1280],
+    # Listed from most to least preferred
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    # Threads rendering uploads; 0 renders them in the request instead
+    'WORKERS': 2,
+}
+
+PIL_FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+
+VARIANTS_DIR = 'variants'
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'IMAGE_VARIANTS', {})}
+
+
+def variant_name(name, width, fmt):
+    return f'{VARIANTS_DIR}/{width}w/{name}.{fmt}'
+
+
+def _image_fields():
+    return [BlogPost._meta.get_field('image'), get_user_model()._meta.get_field('profile_picture')]
+
+
+def upload_dirs():
+    """The directories uploaded images are stored in, e.g. ``blog_images``."""
+    return {field.upload_to.strip('/') for field in _image_fields()}
+
+
+def parse_variant(width, name):
+    """Split a requested variant into its original's name and format.
+
+    Returns ``None`` for widths and formats that aren't configured and for
+    originals outside the upload directories, variants included.
+    """
+    cfg = config()
+    original, _, fmt = name.rpartition('.')
+    if width not in cfg['WIDTHS'] or fmt not in cfg['FORMATS'] or not original:
+        return None
+    directory = original.partition('/')[0]
+    if posixpath.normpath(original) != original or directory not in upload_dirs():
+        return None
+    return original, fmt
+
+
+def is_upload(name):
+    """Whether a post image or profile picture is stored as ``name``."""
+    return any(
+        field.model._default_manager.filter(**{field.name: name}).exists()
+        for field in _image_fields()
+    )
+
+
+def variant_urls(name, request=None):
+    """``{format: {width: url}}`` for the variants of the image ``name``."""
+    if not name:
+        return None
+    cfg = config()
+    urls = {}
+    for fmt in cfg['FORMATS']:
+        urls[fmt] = {}
+        for width in cfg['WIDTHS']:
+            url = default_storage.url(variant_name(name, width, fmt))
+            urls[fmt][width] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def ensure_variant(name, width, fmt):
+    """Render one variant unless it is on disk already; returns its path.
+
+    Raises ``FileNotFoundError`` if the original is missing and
+    ``SuspiciousFileOperation`` for names outside ``MEDIA_ROOT``.
+    """
+    path = default_storage.path(variant_name(name, width, fmt))
+    if os.path.exists(path):
+        return path
+    original = default_storage.path(name)
+    quality = config()['QUALITY']
+
+    with Image.open(original) as image:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        if fmt == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif fmt == 'webp' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Concurrent renders of one variant each write their own file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, PIL_FORMATS[fmt], quality=quality, optimize=fmt == 'jpeg')
+            # mkstemp() creates the file readable by its owner only
+            if settings.FILE_UPLOAD_PERMISSIONS is not None:
+                os.chmod(tmp_path, settings.FILE_UPLOAD_PERMISSIONS)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return path
+
+
+def generate_variants(name, force=False):
+    """Render every configured variant of ``name``; returns how many were written."""
+    cfg = config()
+    written = 0
+    for width in cfg['WIDTHS']:
+        for fmt in cfg['FORMATS']:
+            if force:
+                path = default_storage.path(variant_name(name, width, fmt))
+                if os.path.exists(path):
+                    os.unlink(path)
+            elif default_storage.exists(variant_name(name, width, fmt)):
+                continue
+            ensure_variant(name, width, fmt)
+            written += 1
+    return written
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(config()['WORKERS'], thread_name_prefix='image-variants')
+        return _executor
+
+
+def _generate_logged(name):
+    try:
+        generate_variants(name)
+    except Exception:
+        logger.exception('Could not render variants of %s', name)
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+
+
+def schedule(name):
+    """Render the variants of ``name`` off the request once it commits."""
+    if not name:
+        return
+
+    def submit():
+        if not config()['WORKERS']:
+            _generate_logged(name)
+            return
+        with _executor_lock:
+            # Saving a post twice in a row renders its image once
+            if name in _pending:
+                return
+            _pending.add(name)
+        _get_executor().submit(_generate_logged, name)
+
+    transaction.on_commit(submit)
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Variant URLs of the image field named by ``source``."""
+
+    def to_representation(self, value):
+        return variant_urls(value.name if value else None, self.context.get('request'))
@@ -0,0 +1,153 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import quote, urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from api.models import BlogPost
+
+
+class Command(BaseCommand):
+    help = (
+        'Load the hot read endpoints through the WSGI stack (DRF views on a pool '
+        'of worker threads) and the ASGI stack (async views on one event loop), '
+        'in process, and report requests/sec and latency percentiles. Runs '
+        'against the configured database, with the anonymous response cache off.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='Requests per endpoint and stack.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Concurrent clients.')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads.')
+        parser.add_argument(
+            '--client-delay-ms', type=float, default=0,
+            help='Time each client takes to receive its response, as with slow networks.',
+        )
+        parser.add_argument('--path', action='append', dest='paths', help='Endpoint to load; repeatable.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        # Imported here: the module sets up Django for ASGI servers
+        from techgeek.asgi import AsyncViewsASGIHandler
+
+        stacks = [('wsgi', self.run_wsgi, WSGIHandler()), ('asgi', self.run_asgi, AsyncViewsASGIHandler())]
+        self.stdout.write(f'{"endpoint":<44}{"stack":<6}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"errors":>8}')
+        with override_settings(API_CACHE_TIMEOUT=0):
+            for path in paths:
+                for name, run, app in stacks:
+                    # Warm up imports and per-process caches
+                    run(app, path, dict(options, requests=options['concurrency']))
+                    started = time.perf_counter()
+                    latencies, errors = run(app, path, options)
+                    elapsed = time.perf_counter() - started
+                    latencies.sort()
+                    self.stdout.write(
+                        f'{path[:43]:<44}{name:<6}{len(latencies) / elapsed:>9.0f}'
+                        f'{statistics.median(latencies) * 1000:>9.1f}'
+                        f'{latencies[int(len(latencies) * 0.99) - 1] * 1000:>9.1f}{errors:>8}'
+                    )
+
+    @staticmethod
+    def default_paths():
+        post = BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED).order_by('-created_at').first()
+        if post is None:
+            raise CommandError('Needs at least one published post; pass --path to load other endpoints.')
+        term = quote(post.title.split()[0])
+        return [
+            '/api/blogs/',
+            f'/api/blogs/slug/{post.slug}/',
+            '/api/blogs/top-stories/',
+            f'/api/blogs/search/?q={term}',
+            f'/api/user/public/{post.author_id}/',
+        ]
+
+    @staticmethod
+    def _clients(options):
+        """Split the requests between the concurrent clients."""
+        share, extra = divmod(options['requests'], options['concurrency'])
+        return [share + (i < extra) for i in range(options['concurrency'])]
+
+    def run_wsgi(self, app, path, options):
+        url = urlsplit(path)
+        delay = options['client_delay_ms'] / 1000
+        latencies, errors = [], []
+        lock = threading.Lock()
+
+        def call():
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': url.path, 'QUERY_STRING': url.query,
+                'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'HTTP_HOST': 'localhost',
+                'REMOTE_ADDR': '127.0.0.1', 'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http',
+            }
+            statuses = []
+            body = b''.join(app(environ, lambda status, headers: statuses.append(status)))
+            # A slow client keeps the worker thread busy while it reads
+            time.sleep(delay)
+            return statuses[0].startswith('200') and bool(body)
+
+        with ThreadPoolExecutor(options['threads']) as workers:
+            def client(count):
+                for _ in range(count):
+                    started = time.perf_counter()
+                    ok = workers.submit(call).result()
+                    with lock:
+                        latencies.append(time.perf_counter() - started)
+                        errors.append(not ok)
+
+            threads = [threading.Thread(target=client, args=(count,)) for count in self._clients(options)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return latencies, sum(errors)
+
+    def run_asgi(self, app, path, options):
+        url = urlsplit(path)
+        delay = options['client_delay_ms'] / 1000
+        latencies, errors = [], []
+
+        async def call():
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+                'method': 'GET', 'scheme': 'http', 'path': url.path, 'raw_path': url.path.encode(),
+                'query_string': url.query.encode(), 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            }
+            received = asyncio.Event()
+            statuses = []
+
+            async def receive():
+                if not received.is_set():
+                    received.set()
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                # Only asked again to watch for a disconnect, which never comes
+                await asyncio.Event().wait()
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    # A slow client only holds a suspended coroutine
+                    await asyncio.sleep(delay)
+
+            await app(scope, receive, send)
+            return statuses == [200]
+
+        async def client(count):
+            for _ in range(count):
+                started = time.perf_counter()
+                ok = await call()
+                latencies.append(time.perf_counter() - started)
+                errors.append(not ok)
+
+        async def main():
+            await asyncio.gather(*(client(count) for count in self._clients(options)))
+
+        asyncio.run(main())
+        return latencies, sum(errors)
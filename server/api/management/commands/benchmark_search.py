@@ -0,0 +1,99 @@
+import itertools
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from api import search
+from api.models import BlogPost
+from users.models import User
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the search index against the old icontains scan on a synthetic '
+        'corpus. Everything runs in a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=100_000)
+        parser.add_argument('--words', type=int, default=150, help='Words per post body.')
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--backend', choices=sorted(search.BACKENDS))
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        backend = search.BACKENDS[options['backend']]() if options['backend'] else search.get_backend()
+        try:
+            with transaction.atomic():
+                self.run(backend, options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, backend, options):
+        rng = random.Random(options['seed'])
+        # Zipf-like vocabulary so some terms are common and others rare
+        vocabulary = [f'term{i}' for i in range(20_000)]
+        cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+
+        def words(count):
+            return ' '.join(rng.choices(vocabulary, cum_weights=cum_weights, k=count))
+
+        author = User.objects.create_user(email='search-benchmark@example.com')
+        self.stdout.write(f'Creating {options["posts"]} posts...')
+        BlogPost.objects.bulk_create(
+            (
+                BlogPost(
+                    title=words(8),
+                    slug=f'search-benchmark-{i}',
+                    content=f'<p>{words(options["words"])}</p>',
+                    author=author,
+                    status=BlogPost.Status.PUBLISHED,
+                )
+                for i in range(options['posts'])
+            ),
+            batch_size=2000,
+        )
+
+        started = time.perf_counter()
+        backend.rebuild(search.indexable_posts())
+        self.stdout.write(f'Built {backend.name} index in {time.perf_counter() - started:.1f}s')
+
+        queries = ['term3', 'term250', 'term7 term40', 'term15000']
+        self.stdout.write(f'{"query":<16}{"icontains ms":>14}{"index ms":>12}{"matches":>10}')
+        for query in queries:
+            scan = self.median_ms(options['repeat'], lambda: self.icontains(query))
+            indexed = self.median_ms(options['repeat'], lambda: self.indexed(backend, query))
+            matches = search.SearchResults(query, backend).count()
+            self.stdout.write(f'{query:<16}{scan:>14.1f}{indexed:>12.1f}{matches:>10}')
+
+    @staticmethod
+    def icontains(query):
+        # The query BlogPostSearchAPIView used to run, first page only
+        queryset = BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED).filter(
+            Q(title__icontains=query) | Q(content__icontains=query)
+        ).distinct()
+        return list(queryset.values_list('pk', flat=True)[:20])
+
+    @staticmethod
+    def indexed(backend, query):
+        results = search.SearchResults(query, backend)
+        results.count()
+        return results[0:20]
+
+    @staticmethod
+    def median_ms(repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Switch the SQLite databases to write-ahead logging. The mode is stored in the '
+        'database file, so this only needs to run once per database.'
+    )
+
+    def handle(self, *args, **options):
+        for alias in connections:
+            connection = connections[alias]
+            if connection.vendor != 'sqlite':
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode=WAL')
+                mode = cursor.fetchone()[0]
+            self.stdout.write(self.style.SUCCESS(f'{alias}: journal_mode={mode}'))
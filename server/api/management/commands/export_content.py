@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from api import transfer
+
+
+class Command(BaseCommand):
+    help = 'Stream posts, comments, likes, bookmarks, categories and notifications to an NDJSON dump.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help="File to write, or '-' for stdout.")
+        parser.add_argument(
+            '--model', action='append', dest='models', choices=transfer.EXPORT_ORDER,
+            help='Only export this model; repeatable.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per query.')
+
+    def handle(self, *args, **options):
+        if options['output'] == '-':
+            counts = transfer.export(self.stdout, options['models'], options['chunk_size'])
+            summary = self.stderr
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as stream:
+                counts = transfer.export(stream, options['models'], options['chunk_size'])
+            summary = self.stdout
+        exported = ', '.join(f'{count} {label}' for label, count in counts.items())
+        # Keep the summary out of a dump written to stdout
+        summary.write(self.style.SUCCESS(f'Exported {exported}.'))
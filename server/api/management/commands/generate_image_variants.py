@@ -0,0 +1,53 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api import images
+from api.models import BlogPost
+from users.models import User
+
+
+def _init_worker(media_root, variants):
+    # Workers started with spawn or forkserver set Django up from scratch
+    django.setup()
+    settings.MEDIA_ROOT = media_root
+    settings.IMAGE_VARIANTS = variants
+
+
+def _render(name, force):
+    try:
+        return name, images.generate_variants(name, force), None
+    except Exception as exc:
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Render the resized variants of every existing post image and profile picture, in parallel.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Worker processes (default: one per CPU).',
+        )
+        parser.add_argument('--force', action='store_true', help='Re-render variants that already exist.')
+
+    def handle(self, *args, **options):
+        names = set(BlogPost.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names |= set(User.objects.exclude(profile_picture='').exclude(profile_picture=None).values_list('profile_picture', flat=True))
+
+        written = failed = 0
+        initargs = (str(settings.MEDIA_ROOT), images.config())
+        with ProcessPoolExecutor(options['workers'], initializer=_init_worker, initargs=initargs) as pool:
+            results = pool.map(_render, sorted(names), [options['force']] * len(names), chunksize=8)
+            for name, count, error in results:
+                written += count
+                if error is not None:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered {written} variant(s) of {len(names) - failed} image(s); {failed} failed.'
+        ))
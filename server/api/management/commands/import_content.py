@@ -0,0 +1,41 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from api import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Load an NDJSON dump written by export_content in batches, resuming from '
+        'its checkpoint if an earlier run stopped part way.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='Dump to import.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows written per transaction.')
+        parser.add_argument(
+            '--checkpoint', help='Checkpoint log (default: the dump path with .checkpoint appended).',
+        )
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and import from the start.')
+
+    def handle(self, *args, **options):
+        checkpoint = transfer.Checkpoint(options['checkpoint'] or f'{options["input"]}.checkpoint')
+        if options['restart']:
+            checkpoint.clear()
+        importer = transfer.Importer(checkpoint, options['batch_size'])
+        if importer.offset:
+            self.stdout.write(f'Resuming at byte {importer.offset}.')
+        with open(options['input'], 'rb') as stream:
+            created = importer.run(stream)
+
+        if any(created.values()):
+            # Rows written by bulk_create skip the signals that keep these in step
+            call_command('recount_counters', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+            call_command('rebuild_related_posts', stdout=self.stdout)
+            call_command('recompute_trending', stdout=self.stdout)
+        imported = ', '.join(f'{count} {label}' for label, count in created.items() if count)
+        skipped = ', '.join(f'{count} {label}' for label, count in importer.skipped.items() if count)
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported or "nothing"}.'))
+        if skipped:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped} whose references are missing.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from api import notifications
+
+
+class Command(BaseCommand):
+    help = 'Delete read notifications older than the retention period, in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help="Keep read notifications newer than this (default: NOTIFICATIONS['RETENTION_DAYS']).",
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = notifications.prune(options['days'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Pruned {deleted} read notification(s).'))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from api import cache, related
+
+
+class Command(BaseCommand):
+    help = 'Recompute the related posts of every published post.'
+
+    def handle(self, *args, **options):
+        count = related.rebuild()
+        cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(f'Related {count} post(s).'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from api import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from every published post.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backend',
+            choices=sorted(search.BACKENDS),
+            help='Index to rebuild (defaults to the configured backend).',
+        )
+
+    def handle(self, *args, **options):
+        if options['backend']:
+            backend = search.BACKENDS[options['backend']]()
+        else:
+            backend = search.get_backend()
+        if not backend.available():
+            self.stderr.write(self.style.ERROR(f'The {backend.name} search backend is not available.'))
+            return
+        count = backend.rebuild(search.indexable_posts())
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} post(s) with the {backend.name} backend.'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import trending
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the trending scores from the likes, comments and views in the window.'
+
+    def handle(self, *args, **options):
+        count = trending.recompute()
+        self.stdout.write(self.style.SUCCESS(f'Scored {count} trending post(s).'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q
+
+from api.categories import post_count_subquery
+from api.models import BlogPost, Bookmark, Category, Comment, CommentLike, Like, count_subquery
+
+
+class Command(BaseCommand):
+    help = 'Recompute the denormalized like/comment/bookmark and category post counters and repair drift.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Only report how many rows have drifted.',
+        )
+
+    def handle(self, *args, **options):
+        post_counts = {
+            'like_count': count_subquery(Like, 'post'),
+            'comment_count': count_subquery(Comment, 'post'),
+            'bookmark_count': count_subquery(Bookmark, 'post'),
+        }
+        comment_counts = {
+            'like_count': count_subquery(CommentLike, 'comment'),
+        }
+        category_counts = {
+            'post_count': post_count_subquery(),
+        }
+        with transaction.atomic():
+            posts = self.repair(BlogPost.objects.all(), post_counts, options['dry_run'])
+            comments = self.repair(Comment.objects.all(), comment_counts, options['dry_run'])
+            categories = self.repair(Category.objects.all(), category_counts, options['dry_run'])
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} {posts} drifted post(s), {comments} drifted comment(s) '
+            f'and {categories} drifted category count(s).'
+        ))
+
+    def repair(self, queryset, counts, dry_run):
+        """Fix every row whose stored counters disagree, in one UPDATE."""
+        actual = {f'actual_{field}': expression for field, expression in counts.items()}
+        drift = Q()
+        for field in counts:
+            drift |= ~Q(**{field: F(f'actual_{field}')})
+        drifted = queryset.annotate(**actual).filter(drift).values('pk')
+        total = drifted.count()
+        if total and not dry_run:
+            queryset.filter(pk__in=drifted).update(**counts)
+        return total
@@ -0,0 +1,188 @@
+"""Serve files under ``MEDIA_ROOT``.
+
+``serve()`` answers conditional requests from the file's size and mtime
+(``ETag``/``Last-Modified``, 304 and 412) and single byte ranges (206 and
+416), so browsers revalidate and resume images without downloading them
+again.
+
+The body itself is sent in one of three ways, chosen by
+``MEDIA_SERVING['OFFLOAD']``:
+
+* ``None`` (default): a ``FileResponse``. WSGI servers that implement
+  ``wsgi.file_wrapper`` with ``sendfile()``, such as gunicorn, copy it
+  from the page cache to the socket without passing through Python.
+* ``'x-accel-redirect'``: an empty response that hands the file to nginx
+  at ``ACCEL_PREFIX`` + path, for an ``internal`` location aliased to
+  ``MEDIA_ROOT``.
+* ``'x-sendfile'``: an empty response naming the file's absolute path,
+  for Apache's mod_xsendfile or lighttpd.
+
+Offloaded responses leave ranges to the web server, which handles them
+for internal redirects.
+
+Names under ``IMMUTABLE_PREFIXES`` never change content, so they are
+cached for a year without revalidation. Everything else is cached for
+``MAX_AGE`` seconds and then revalidated.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+DEFAULTS = {
+    # None, 'x-accel-redirect' or 'x-sendfile'
+    'OFFLOAD': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 60 * 60 * 24,
+    'IMMUTABLE_PREFIXES': ['variants/'],
+}
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'MEDIA_SERVING', {})}
+
+
+class FileRange:
+    """The ``length`` bytes of an open file from its current position.
+
+    Exposes ``fileno()`` so ``sendfile()`` file wrappers can send the range
+    straight from the file, bounded by the response's Content-Length.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def etag_for(stat):
+    return f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+
+def cache_control(name, cfg):
+    if any(name.startswith(prefix) for prefix in cfg['IMMUTABLE_PREFIXES']):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={cfg["MAX_AGE"]}'
+
+
+def parse_range(request, size, etag, last_modified):
+    """The ``(start, end)`` of a satisfiable single byte range, inclusive.
+
+    Returns ``None`` to send the whole file: no or invalid ``Range``,
+    several ranges, or an ``If-Range`` validator that no longer matches.
+    Raises ``ValueError`` for ranges that select no bytes of the file.
+    """
+    header = request.headers.get('Range')
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range:
+        if if_range.startswith('"'):
+            if if_range != etag:
+                return None
+        elif parse_http_date_safe(if_range) != last_modified:
+            return None
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        if last and int(last) < start:
+            # Invalid, so ignored
+            return None
+        if start >= size:
+            raise ValueError('Range starts past the end of the file')
+        end = min(int(last), size - 1) if last else size - 1
+    elif last:
+        # A suffix: the final ``last`` bytes
+        if not int(last) or not size:
+            raise ValueError('Empty suffix range')
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        return None
+    return start, end
+
+
+def serve(request, name):
+    """Respond with the media file ``name``, relative to ``MEDIA_ROOT``."""
+    try:
+        path = default_storage.path(name)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(path):
+        raise Http404
+    stat = os.stat(path)
+
+    cfg = config()
+    etag = etag_for(stat)
+    last_modified = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+    validators = HttpResponse()
+    validators['ETag'] = etag
+    validators['Last-Modified'] = http_date(last_modified)
+    validators['Cache-Control'] = cache_control(name, cfg)
+    # A 304 or 412 copies the validators; otherwise they come back as is
+    conditional = get_conditional_response(request, etag, last_modified, validators)
+    if conditional is not validators:
+        return conditional
+
+    if cfg['OFFLOAD'] == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = cfg['ACCEL_PREFIX'] + quote(name)
+    elif cfg['OFFLOAD'] == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    elif cfg['OFFLOAD'] is not None:
+        raise ValueError(f"Unknown MEDIA_SERVING['OFFLOAD']: {cfg['OFFLOAD']!r}")
+    else:
+        response = file_response(request, path, stat.st_size, etag, last_modified, content_type)
+
+    for header in ('ETag', 'Last-Modified', 'Cache-Control'):
+        response[header] = validators[header]
+    return response
+
+
+def file_response(request, path, size, etag, last_modified, content_type):
+    try:
+        byte_range = parse_range(request, size, etag, last_modified)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    file = open(path, 'rb')
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), content_type=content_type, status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
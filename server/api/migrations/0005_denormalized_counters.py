@@ -0,0 +1,61 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:19
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count(model, field):
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    BlogPost = apps.get_model('api', 'BlogPost')
+    Comment = apps.get_model('api', 'Comment')
+    Like = apps.get_model('api', 'Like')
+    Bookmark = apps.get_model('api', 'Bookmark')
+    CommentLike = apps.get_model('api', 'CommentLike')
+    BlogPost.objects.update(
+        like_count=_count(Like, 'post'),
+        comment_count=_count(Comment, 'post'),
+        bookmark_count=_count(Bookmark, 'post'),
+    )
+    Comment.objects.update(like_count=_count(CommentLike, 'comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogpost',
+            name='bookmark_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='blogpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
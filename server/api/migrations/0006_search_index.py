@@ -0,0 +1,99 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:22
+
+import re
+from collections import Counter
+from html import unescape
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.utils import OperationalError
+from django.utils.html import strip_tags
+
+
+def create_fts_table(apps, schema_editor):
+    # The FTS5 index is optional; api.search falls back to the postings tables
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    BlogPost = apps.get_model('api', 'BlogPost')
+    try:
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE api_blogpost_fts USING fts5("
+            "title, content, tokenize='unicode61 remove_diacritics 2')"
+        )
+    except OperationalError:
+        return
+    posts = BlogPost.objects.filter(status='published').values_list('pk', 'title', 'content')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            'INSERT INTO api_blogpost_fts (rowid, title, content) VALUES (%s, %s, %s)',
+            [(pk, title, unescape(strip_tags(content))) for pk, title, content in posts],
+        )
+
+
+# A frozen copy of api.search.tokenize() and TITLE_WEIGHT
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+TITLE_WEIGHT = 3
+
+
+def tokenize(text):
+    return [token[:64] for token in TOKEN_RE.findall(text.lower())]
+
+
+def fill_postings(apps, schema_editor):
+    # Databases that ran this migration before the backfill was added need
+    # ``manage.py rebuild_search_index --backend python`` once instead
+    BlogPost = apps.get_model('api', 'BlogPost')
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    SearchPosting = apps.get_model('api', 'SearchPosting')
+    posts = BlogPost.objects.filter(status='published').values_list('pk', 'title', 'content').iterator(chunk_size=500)
+    frequencies = {}
+    for pk, title, content in posts:
+        terms = Counter(tokenize(unescape(strip_tags(content or ''))))
+        for term in tokenize(title):
+            terms[term] += TITLE_WEIGHT
+        frequencies[pk] = terms
+    documents = SearchDocument.objects.bulk_create([
+        SearchDocument(post_id=pk, length=sum(terms.values())) for pk, terms in frequencies.items()
+    ], batch_size=500)
+    SearchPosting.objects.bulk_create([
+        SearchPosting(document=document, term=term, frequency=frequency)
+        for document in documents
+        for term, frequency in frequencies[document.post_id].items()
+    ], batch_size=1000)
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS api_blogpost_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_denormalized_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('length', models.PositiveIntegerField()),
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='api.blogpost')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField()),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='api.searchdocument')),
+            ],
+            options={
+                'unique_together': {('term', 'document')},
+            },
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingPost',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='trending', serialize=False, to='api.blogpost')),
+                ('score', models.FloatField(default=0)),
+                ('epoch', models.FloatField()),
+                ('last_event_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-last_event_at'], name='api_trendin_last_ev_64ed19_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 12:30
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_post_counts(apps, schema_editor):
+    BlogPost = apps.get_model('api', 'BlogPost')
+    Category = apps.get_model('api', 'Category')
+    counts = (
+        BlogPost.category.through.objects.filter(category_id=OuterRef('pk'), blogpost__status='published')
+        .order_by()
+        .values('category_id')
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    Category.objects.update(post_count=Coalesce(Subquery(counts, output_field=IntegerField()), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_related_posts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_post_counts, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,29 @@
 from django.db import models
+from django.db.models import Count, Exists, F, IntegerField, OuterRef, Prefetch, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, Substr
 from django.utils.text import slugify
 from django.urls import reverse
 from django.conf import settings
 
 
+def count_subquery(model, field):
+    """Correlated COUNT(*) over ``model`` rows pointing at the outer pk."""
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(n=Count('pk'))
+        .values('n')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+class CounterQuerySet(models.QuerySet):
+    def increment(self, field, by=1):
+        """Atomically add ``by`` to a stored counter column, never below zero."""
+        return self.update(**{field: Greatest(F(field) + by, Value(0))})
+
+
 class Category(models.Model):
     class CategoryType(models.TextChoices):
         ARTIFICIAL_INTELLIGENCE = 'artificial_intelligence', 'Artificial Intelligence'
@@ -23,6 +43,10 @@ class Category(models.Model):
     name = models.CharField(max_length=50, editable=False)
     slug = models.SlugField(unique=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Published posts filed under it; see api/categories.py
+    post_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CounterQuerySet.as_manager()
 
     def save(self, *args, **kwargs):
         self.name = self.get_type_display()
@@ -32,6 +56,41 @@ class Category(models.Model):
     def __str__(self):
         return self.name    
 
+# Characters of raw HTML fetched to build a list excerpt
+EXCERPT_SOURCE_LENGTH = 1000
+
+
+class BlogPostQuerySet(CounterQuerySet):
+    """Query planning for serialized post lists.
+
+    Everything ``BlogPostSerializer`` reads is fetched up front so a page of
+    posts costs a fixed number of queries regardless of its size.
+    """
+
+    def with_viewer_flags(self, user):
+        if user is None or not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_liked=Exists(Like.objects.filter(post=OuterRef('pk'), user=user)),
+            is_bookmarked=Exists(Bookmark.objects.filter(post=OuterRef('pk'), user=user)),
+        )
+
+    def for_serializer(self, user=None):
+        return (
+            self.select_related('author')
+            .prefetch_related('category')
+            .with_viewer_flags(user)
+        )
+
+    def for_list(self, user=None):
+        # List cards only need the start of the body for their excerpt
+        return (
+            self.for_serializer(user)
+            .defer('content')
+            .annotate(content_head=Substr('content', 1, EXCERPT_SOURCE_LENGTH))
+        )
+
+
 class BlogPost(models.Model):
     class Status(models.TextChoices):
         DRAFT = 'draft', 'Draft'
@@ -53,10 +112,18 @@ class BlogPost(models.Model):
     
     # Analytics
     view_count = models.PositiveIntegerField(default=0)
+
+    # Denormalized counters, kept in step by the views and repaired by
+    # `manage.py recount_counters`
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    bookmark_count = models.PositiveIntegerField(default=0)
     
     # Timestamps
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BlogPostQuerySet.as_manager()
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
@@ -71,11 +138,11 @@ class BlogPost(models.Model):
 
     @property
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     @property
     def total_comments(self):
-        return self.comments.count()
+        return self.comment_count
 
     @property
     def is_published(self):
@@ -99,9 +166,12 @@ class Comment(models.Model):
     parent = models.ForeignKey('self', on_delete=models.CASCADE, blank=True, null=True, related_name='replies')
     content = models.TextField()
     is_approved = models.BooleanField(default=True)
+    like_count = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CounterQuerySet.as_manager()
+
     @property
     def is_reply(self):
         return self.parent is not None
@@ -111,7 +181,7 @@ class Comment(models.Model):
 
     @property
     def total_likes(self):
-        return self.likes.count()
+        return self.like_count
 
     def __str__(self):
         return f'Comment by {self.author.email} on {self.post.title}'
@@ -156,11 +226,18 @@ class Like(models.Model):
         return f'Like by {self.user.email} on {self.post.title}'
 
 
+class BookmarkQuerySet(models.QuerySet):
+    def with_posts(self, user=None):
+        return self.prefetch_related(Prefetch('post', queryset=BlogPost.objects.for_list(user)))
+
+
 class Bookmark(models.Model):
     post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='bookmarks')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='bookmarks')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = BookmarkQuerySet.as_manager()
+
     class Meta:
         unique_together = ('post', 'user')
         indexes = [
@@ -189,6 +266,75 @@ class BlogPostView(models.Model):
         return f'View of {self.post.title} at {self.created_at}'
 
 
+class SearchDocument(models.Model):
+    """A post in the portable search index used when FTS5 is unavailable."""
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, related_name='search_document')
+    length = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f'Search document for {self.post_id}'
+
+
+class SearchPosting(models.Model):
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField()
+
+    class Meta:
+        unique_together = ('term', 'document')
+
+    def __str__(self):
+        return f'{self.term} x{self.frequency} in {self.document.post_id}'
+
+
+class RelatedTerm(models.Model):
+    """A weighted term of a post's TF-IDF vector in the related posts index."""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_terms')
+    term = models.CharField(max_length=64)
+    weight = models.FloatField()
+
+    class Meta:
+        unique_together = ('term', 'post')
+
+    def __str__(self):
+        return f'{self.term} {self.weight:.3f} in {self.post_id}'
+
+
+class RelatedPost(models.Model):
+    """One of a post's precomputed nearest neighbours; see ``api.related``."""
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='related_posts')
+    related = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='neighbour_of')
+    score = models.FloatField()
+
+    class Meta:
+        unique_together = ('post', 'related')
+        indexes = [
+            models.Index(fields=['post', '-score']),
+        ]
+
+    def __str__(self):
+        return f'{self.related_id} related to {self.post_id} ({self.score:.3f})'
+
+
+class TrendingPost(models.Model):
+    """Materialized, time-decayed popularity of recently active posts.
+
+    ``score`` is expressed at ``epoch`` (Unix seconds); see ``api.trending``.
+    """
+    post = models.OneToOneField(BlogPost, on_delete=models.CASCADE, primary_key=True, related_name='trending')
+    score = models.FloatField(default=0)
+    epoch = models.FloatField()
+    last_event_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-last_event_at']),
+        ]
+
+    def __str__(self):
+        return f'Trending score {self.score:.2f} for {self.post_id}'
+
+
 class Notification(models.Model):
     class Verb(models.TextChoices):
         LIKE = 'like', 'Like'
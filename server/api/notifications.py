@@ -0,0 +1,273 @@
+"""Notification dispatch kept off the request path.
+
+Views describe what happened with a ``NotificationEvent`` and call
+``notify()`` or ``retract()``. Once the request's transaction commits the
+event goes to a broker, which writes notifications in batches:
+
+* ``ThreadBroker`` (default) queues events in process memory and a worker
+  thread drains them every ``FLUSH_INTERVAL`` seconds or ``BATCH_SIZE``
+  events.
+* ``SyncBroker`` writes each event straight away.
+
+Any class with ``publish(event, retract=False)`` and ``flush()`` can be
+named by dotted path in ``NOTIFICATIONS['BROKER']``.
+
+A batch is coalesced before it is written. A like followed by an unlike
+cancels out, and a like is dropped if the same actor already triggered
+one on that post within ``COALESCE_WINDOW`` seconds. Written notifications
+are pushed to open streams through ``api.realtime``.
+
+Each user's unread count is cached and adjusted in place as notifications
+are written and marked read, so the badge never has to count the table.
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from . import realtime
+from .models import BlogPost, Comment, Notification
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'BROKER': 'thread',
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'COALESCE_WINDOW': 60 * 60,
+    # Seconds a user's cached unread count lives before it is recounted
+    'UNREAD_CACHE_TIMEOUT': 60 * 60,
+    # Read notifications older than this are pruned
+    'RETENTION_DAYS': 90,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'NOTIFICATIONS', {})}
+
+
+@dataclass(frozen=True)
+class NotificationEvent:
+    recipient_id: int
+    actor_id: int
+    verb: str
+    post_id: int = None
+    comment_id: int = None
+
+    @property
+    def key(self):
+        return (self.recipient_id, self.actor_id, self.verb, self.post_id, self.comment_id)
+
+
+def coalesce(entries):
+    """Fold ``(event, retract)`` pairs into the events that still stand."""
+    pending = {}
+    for event, retract in entries:
+        if retract:
+            pending.pop(event.key, None)
+        else:
+            pending.setdefault(event.key, event)
+    return list(pending.values())
+
+
+def write_notifications(events):
+    """Store ``events`` with one ``bulk_create``; returns the rows written."""
+    if not events:
+        return []
+    window = timedelta(seconds=config()['COALESCE_WINDOW'])
+    likes = [event for event in events if event.verb == Notification.Verb.LIKE]
+    recent_likes = set()
+    if likes:
+        recent_likes = set(
+            Notification.objects.filter(
+                verb=Notification.Verb.LIKE,
+                created_at__gte=timezone.now() - window,
+                post_id__in={event.post_id for event in likes},
+            ).values_list('recipient_id', 'actor_id', 'verb', 'post_id', 'comment_id')
+        )
+
+    # The post or comment may have been deleted since the event was queued
+    post_ids = set(BlogPost.objects.filter(
+        pk__in={event.post_id for event in events if event.post_id}
+    ).order_by().values_list('pk', flat=True))
+    comment_ids = set(Comment.objects.filter(
+        pk__in={event.comment_id for event in events if event.comment_id}
+    ).order_by().values_list('pk', flat=True))
+
+    rows = [
+        Notification(
+            recipient_id=event.recipient_id,
+            actor_id=event.actor_id,
+            verb=event.verb,
+            post_id=event.post_id,
+            comment_id=event.comment_id,
+        )
+        for event in events
+        if event.key not in recent_likes
+        and (event.post_id is None or event.post_id in post_ids)
+        and (event.comment_id is None or event.comment_id in comment_ids)
+    ]
+    created = Notification.objects.bulk_create(rows)
+    for recipient_id, count in Counter(row.recipient_id for row in created).items():
+        # The pushed notifications carry their own unread delta
+        adjust_unread(recipient_id, count, publish=False)
+    realtime.publish_notifications(created)
+    return created
+
+
+def _unread_key(user_id):
+    return f'api:notifications:unread:{user_id}'
+
+
+def unread_count(user_id):
+    key = _unread_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = Notification.objects.filter(recipient_id=user_id, is_read=False).count()
+        cache.add(key, count, config()['UNREAD_CACHE_TIMEOUT'])
+    return count
+
+
+def adjust_unread(user_id, delta, publish=True):
+    if not delta:
+        return
+    try:
+        cache.incr(_unread_key(user_id), delta)
+    except ValueError:
+        # Not cached; the next read counts from the table
+        pass
+    if publish:
+        realtime.publish_unread_delta(user_id, delta)
+
+
+def unread_by_recipient(notifications):
+    """``Counter`` of the unread ``notifications`` per recipient, one query."""
+    return Counter(notifications.filter(is_read=False).order_by().values_list('recipient_id', flat=True))
+
+
+def forget_unread(counts):
+    """Take notifications removed by a cascade off the cached unread counts.
+
+    Deleting a post or comment deletes its notifications without calling
+    ``adjust_unread()``, so callers count them with ``unread_by_recipient()``
+    first and pass the counts here once the delete is done.
+    """
+    for user_id, count in counts.items():
+        adjust_unread(user_id, -count)
+
+
+def mark_read(notifications, user_id):
+    """Mark the user's unread ``notifications`` read with one UPDATE."""
+    updated = notifications.filter(recipient_id=user_id, is_read=False).update(is_read=True)
+    adjust_unread(user_id, -updated)
+    return updated
+
+
+def prune(older_than_days=None, batch_size=1000):
+    """Delete old read notifications in batches; returns the number deleted."""
+    days = older_than_days if older_than_days is not None else config()['RETENTION_DAYS']
+    expired = Notification.objects.filter(
+        is_read=True, created_at__lt=timezone.now() - timedelta(days=days)
+    ).order_by('pk')
+    deleted = 0
+    while True:
+        # Short transactions keep writers from queueing behind one huge DELETE
+        batch = list(expired.values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return deleted
+        deleted += Notification.objects.filter(pk__in=batch).delete()[0]
+
+
+class SyncBroker:
+    def publish(self, event, retract=False):
+        if not retract:
+            write_notifications([event])
+
+    def flush(self):
+        pass
+
+
+class ThreadBroker:
+    def __init__(self, batch_size, flush_interval):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def publish(self, event, retract=False):
+        self._ensure_worker()
+        self._queue.put((event, retract))
+
+    def flush(self):
+        """Block until everything queued so far has been written."""
+        self._queue.join()
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='notification-dispatch', daemon=True)
+                self._worker.start()
+
+    def _next_batch(self):
+        entries = [self._queue.get()]
+        # Counted from the first event, so steady traffic still flushes on time
+        deadline = time.monotonic() + self.flush_interval
+        while len(entries) < self.batch_size:
+            try:
+                entries.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        return entries
+
+    def _run(self):
+        while True:
+            entries = self._next_batch()
+            try:
+                close_old_connections()
+                write_notifications(coalesce(entries))
+            except Exception:
+                logger.exception('Dropped a batch of %d notification event(s)', len(entries))
+            finally:
+                close_old_connections()
+                for _ in entries:
+                    self._queue.task_done()
+
+
+_brokers = {}
+
+
+def get_broker():
+    cfg = config()
+    name = cfg['BROKER']
+    if name not in _brokers:
+        if name == 'thread':
+            broker = ThreadBroker(cfg['BATCH_SIZE'], cfg['FLUSH_INTERVAL'])
+        elif name == 'sync':
+            broker = SyncBroker()
+        else:
+            broker = import_string(name)()
+        atexit.register(broker.flush)
+        _brokers[name] = broker
+    return _brokers[name]
+
+
+def notify(event):
+    """Dispatch ``event`` once the current transaction commits."""
+    transaction.on_commit(lambda: get_broker().publish(event))
+
+
+def retract(event):
+    """Withdraw a not-yet-written ``event``, e.g. when a like is undone."""
+    transaction.on_commit(lambda: get_broker().publish(event, retract=True))
@@ -0,0 +1,32 @@
+from asgiref.sync import sync_to_async
+from rest_framework.pagination import CursorPagination, LimitOffsetPagination
+
+
+class AsyncPaginationMixin:
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset()`` for async views; ``request`` is a DRF Request."""
+        # The page is evaluated in the thread the async ORM runs queries on
+        return await sync_to_async(self.paginate_queryset)(queryset, request, view)
+
+
+class CreatedAtCursorPagination(AsyncPaginationMixin, CursorPagination):
+    """Keyset pagination over the ``-created_at`` indexes.
+
+    Each page is a ``WHERE created_at < cursor ... LIMIT n`` lookup, so deep
+    pages cost the same as the first one instead of an OFFSET scan.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class LimitCursorPagination(CreatedAtCursorPagination):
+    """Same scheme, sized by the ``limit`` parameter the home page sends."""
+    page_size_query_param = 'limit'
+
+
+class SearchResultPagination(AsyncPaginationMixin, LimitOffsetPagination):
+    """Ranked results have no stable key to page on, so page by rank offset."""
+    default_limit = 20
+    max_limit = 100
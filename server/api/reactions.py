@@ -0,0 +1,141 @@
+"""Likes, bookmarks and comment likes with set semantics.
+
+``set_state()`` makes the user's like or bookmark on a post or comment be
+on or off, whatever it was before, in two statements inside one
+transaction:
+
+1. ``INSERT ... ON CONFLICT DO NOTHING`` (``INSERT IGNORE`` on MySQL), or a
+   ``DELETE``. Its row count says whether anything changed, and the unique
+   constraint settles concurrent requests: the loser inserts or deletes
+   nothing instead of raising ``IntegrityError``.
+2. ``UPDATE ... RETURNING`` the stored counter, moved only if the first
+   statement changed something, or a ``SELECT`` of it otherwise. Without
+   ``UPDATE ... RETURNING`` (MySQL, SQLite before 3.35) this is an
+   ``UPDATE`` followed by a ``SELECT``.
+
+The insert is guarded by an ``EXISTS`` on the post or comment, so a
+missing target changes nothing and reads as None rather than failing on
+the deferred foreign key at commit.
+
+These statements skip the ``post_save``/``post_delete`` signals, so the
+callers retire cached responses and record trending events themselves.
+"""
+from dataclasses import dataclass
+
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import Bookmark, CommentLike, Like
+
+
+@dataclass(frozen=True)
+class Kind:
+    model: type
+    # The foreign key to the liked or bookmarked row
+    target: str
+    counter: str
+
+
+LIKE = Kind(Like, 'post', 'like_count')
+BOOKMARK = Kind(Bookmark, 'post', 'bookmark_count')
+COMMENT_LIKE = Kind(CommentLike, 'comment', 'like_count')
+
+
+@dataclass(frozen=True)
+class State:
+    on: bool
+    # Whether this call flipped it
+    changed: bool
+    count: int
+    # Author of the post or comment, for notifications
+    owner_id: int
+
+
+def _returns_from_update():
+    return connection.vendor != 'mysql' and connection.features.can_return_columns_from_insert
+
+
+def _names(kind):
+    qn = connection.ops.quote_name
+    target_field = kind.model._meta.get_field(kind.target)
+    target = target_field.related_model._meta
+    return {
+        'table': qn(kind.model._meta.db_table),
+        'target_column': qn(target_field.column),
+        'user_column': qn(kind.model._meta.get_field('user').column),
+        'target_table': qn(target.db_table),
+        'target_pk': qn(target.pk.column),
+        'counter': qn(kind.counter),
+        'owner': qn(target.get_field('author').column),
+        'created_at': qn(kind.model._meta.get_field('created_at').column),
+    }
+
+
+def _insert(cursor, kind, names, target_id, user_id):
+    created_at = kind.model._meta.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+    select = (
+        f"SELECT %s, %s, %s {'FROM DUAL ' if connection.vendor == 'mysql' else ''}"
+        f"WHERE EXISTS (SELECT 1 FROM {names['target_table']} WHERE {names['target_pk']} = %s)"
+    )
+    columns = f"{names['table']} ({names['target_column']}, {names['user_column']}, {names['created_at']})"
+    if connection.vendor == 'mysql':
+        sql = f'INSERT IGNORE INTO {columns} {select}'
+    else:
+        sql = f'INSERT INTO {columns} {select} ON CONFLICT DO NOTHING'
+    cursor.execute(sql, [target_id, user_id, created_at, target_id])
+    return cursor.rowcount == 1
+
+
+def _delete(cursor, kind, names, target_id, user_id):
+    cursor.execute(
+        f"DELETE FROM {names['table']} WHERE {names['target_column']} = %s AND {names['user_column']} = %s",
+        [target_id, user_id],
+    )
+    return cursor.rowcount > 0
+
+
+def _counter(cursor, names, target_id, delta):
+    """``(count, owner_id)`` of the target after adding ``delta``, or None if it is gone."""
+    select = f"SELECT {names['counter']}, {names['owner']} FROM {names['target_table']} WHERE {names['target_pk']} = %s"
+    if not delta:
+        cursor.execute(select, [target_id])
+        return cursor.fetchone()
+    # Never below zero, as CounterQuerySet.increment()
+    update = (
+        f"UPDATE {names['target_table']} SET {names['counter']} = "
+        f"CASE WHEN {names['counter']} + %s < 0 THEN 0 ELSE {names['counter']} + %s END "
+        f"WHERE {names['target_pk']} = %s"
+    )
+    if _returns_from_update():
+        cursor.execute(f"{update} RETURNING {names['counter']}, {names['owner']}", [delta, delta, target_id])
+        return cursor.fetchone()
+    cursor.execute(update, [delta, delta, target_id])
+    cursor.execute(select, [target_id])
+    return cursor.fetchone()
+
+
+def set_state(kind, target_id, user_id, on):
+    """Turn the user's ``kind`` on ``target_id`` on or off; None if the target does not exist."""
+    names = _names(kind)
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            if on:
+                changed = _insert(cursor, kind, names, target_id, user_id)
+            else:
+                changed = _delete(cursor, kind, names, target_id, user_id)
+            row = _counter(cursor, names, target_id, (1 if on else -1) if changed else 0)
+    except IntegrityError:
+        # The target was deleted between the two statements
+        return None
+    if row is None:
+        return None
+    count, owner_id = row
+    return State(on, changed, count, owner_id)
+
+
+def toggle(kind, target_id, user_id):
+    """Flip the user's ``kind`` on ``target_id``, for the older POST endpoints."""
+    state = set_state(kind, target_id, user_id, on=False)
+    if state is None or state.changed:
+        return state
+    return set_state(kind, target_id, user_id, on=True)
@@ -0,0 +1,173 @@
+"""Push notifications to connected users over Server-Sent Events.
+
+``api.notifications`` publishes every notification it writes to the bus,
+and read-state changes publish unread-count deltas. Each open stream (see
+``views.notification_stream``) subscribes an ``asyncio.Queue`` for its
+user, so an idle connection costs one parked coroutine rather than a
+polling request.
+
+EventSource cannot send an ``Authorization`` header, so a stream is opened
+with ``?ticket=`` rather than the access token, which would end up in
+access logs. ``issue_ticket()`` signs a ticket that only opens a stream,
+for ``TICKET_TTL`` seconds, and only once per cache.
+
+``LocalBus`` delivers within the current process, which is enough for a
+single ASGI worker. Deployments with several workers can name a bus class
+shared through e.g. Redis in ``REALTIME['BUS']``. A bus provides
+``subscribe(user_id)``, ``unsubscribe(subscription)``, ``listening(user_ids)``
+and ``publish(user_id, message)``.
+"""
+import asyncio
+import json
+import secrets
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import aget_user
+from .models import Notification
+
+
+DEFAULTS = {
+    'BUS': 'local',
+    # Seconds between keep-alive comments on an idle stream
+    'HEARTBEAT': 25,
+    # Messages buffered per connection before it is told to resync
+    'QUEUE_SIZE': 100,
+    # Seconds a stream ticket stays valid
+    'TICKET_TTL': 30,
+}
+
+TICKET_SALT = 'api.realtime.stream-ticket'
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'REALTIME', {})}
+
+
+class Subscription:
+    def __init__(self, user_id, queue_size):
+        self.user_id = user_id
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+    def deliver(self, message):
+        # Called on the subscriber's loop
+        if self.queue.full():
+            # A client this far behind refetches instead
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            message = {'event': 'resync', 'data': {}}
+        self.queue.put_nowait(message)
+
+    async def get(self):
+        return await self.queue.get()
+
+
+class LocalBus:
+    """In-process pub/sub; publish() may be called from any thread."""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscriptions = defaultdict(set)
+
+    def subscribe(self, user_id):
+        subscription = Subscription(user_id, self.queue_size)
+        with self._lock:
+            self._subscriptions[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.user_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[subscription.user_id]
+
+    def listening(self, user_ids):
+        with self._lock:
+            return {user_id for user_id in user_ids if user_id in self._subscriptions}
+
+    def publish(self, user_id, message):
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+
+
+_buses = {}
+
+
+def get_bus():
+    cfg = config()
+    name = cfg['BUS']
+    if name not in _buses:
+        if name == 'local':
+            _buses[name] = LocalBus(cfg['QUEUE_SIZE'])
+        else:
+            _buses[name] = import_string(name)()
+    return _buses[name]
+
+
+def publish_notifications(notifications):
+    """Push newly created notifications to recipients with an open stream."""
+    from .serializers import NotificationSerializer
+
+    bus = get_bus()
+    listening = bus.listening({notification.recipient_id for notification in notifications})
+    if not listening:
+        return
+    # Serialize from one query rather than following each notification's FKs
+    rows = (
+        Notification.objects.filter(pk__in=[n.pk for n in notifications if n.recipient_id in listening])
+        .select_related('actor', 'post', 'comment')
+        .order_by('created_at', 'pk')
+    )
+    for notification in rows:
+        bus.publish(notification.recipient_id, {
+            'event': 'notification',
+            'data': {
+                'notification': NotificationSerializer(notification).data,
+                'unread_delta': 0 if notification.is_read else 1,
+            },
+        })
+
+
+def publish_unread_delta(user_id, delta):
+    if delta:
+        get_bus().publish(user_id, {'event': 'unread', 'data': {'unread_delta': delta}})
+
+
+def format_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, default=str)}\n\n'
+
+
+def issue_ticket(user):
+    """A signed ticket that opens one notification stream for ``user``."""
+    return signing.dumps({'user': user.pk, 'nonce': secrets.token_urlsafe(12)}, salt=TICKET_SALT)
+
+
+async def authenticate(request):
+    """Resolve the user from ``?ticket=``, as EventSource cannot send headers."""
+    ticket = request.GET.get('ticket')
+    if not ticket:
+        return None
+    ttl = config()['TICKET_TTL']
+    try:
+        payload = signing.loads(ticket, salt=TICKET_SALT, max_age=ttl)
+    except signing.BadSignature:
+        return None
+    # Spent on first use, so a ticket copied from a log opens nothing
+    if not await cache.aadd(f"realtime:ticket:{payload['nonce']}", True, ttl):
+        return None
+    try:
+        return await aget_user(payload['user'])
+    except AuthenticationFailed:
+        return None
@@ -0,0 +1,267 @@
+"""Precomputed related posts.
+
+Every published post has a TF-IDF vector over the words of its title and
+body, with titles counting ``search.TITLE_WEIGHT`` times. Term frequencies
+are dampened (``1 + log tf``), stop words are dropped, only the
+``MAX_TERMS`` heaviest terms are kept and the vector is scaled to unit
+length. Vectors are stored sparsely, one ``RelatedTerm`` row per term,
+indexed by term like a posting list.
+
+Two posts are scored by the cosine of their vectors, raised by up to
+``CATEGORY_WEIGHT`` for the share of categories they have in common
+(Jaccard). Candidates are only the posts sharing a term, found through the
+postings, and each post keeps its ``K`` best as ``RelatedPost`` rows, so
+serving them is one indexed lookup.
+
+``manage.py rebuild_related_posts`` recomputes everything from scratch.
+Between rebuilds, saves and category changes ``schedule()`` their posts,
+which ``refresh_many()`` reindexes once the transaction commits, using the
+document frequencies of the stored postings, and updates the lists of the
+posts that gain or lose them as neighbours. Those frequencies count only
+kept terms, so incremental weights drift until the next rebuild.
+"""
+import heapq
+import math
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from .models import BlogPost, RelatedPost, RelatedTerm
+from .search import TITLE_WEIGHT, plain_text, tokenize
+
+
+DEFAULTS = {
+    # Related posts kept per post
+    'K': 6,
+    # Terms kept per vector
+    'MAX_TERMS': 64,
+    # A post sharing every category scores this much higher
+    'CATEGORY_WEIGHT': 0.5,
+}
+
+
+# Words too common to say anything about a post, whatever their IDF
+STOP_WORDS = frozenset("""
+a about after all also an and are as at be been but by can for from has have how in into is it its more
+new no not of on or our out so than that the their there these they this to up was we what when which
+will with you your
+""".split())
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'RELATED_POSTS', {})}
+
+
+def term_frequencies(title, content):
+    frequencies = Counter(tokenize(plain_text(content)))
+    for term in tokenize(title):
+        frequencies[term] += TITLE_WEIGHT
+    return frequencies
+
+
+def make_vector(frequencies, document_frequency, documents, max_terms):
+    """Unit TF-IDF vector ``{term: weight}`` of the ``max_terms`` heaviest terms."""
+    weights = {}
+    for term, frequency in frequencies.items():
+        if term in STOP_WORDS or not document_frequency[term]:
+            continue
+        # Smoothed, so the first posts indexed still get weights
+        idf = math.log((documents + 1) / document_frequency[term])
+        weights[term] = (1 + math.log(frequency)) * idf
+    kept = heapq.nlargest(max_terms, weights.items(), key=lambda item: (item[1], item[0]))
+    norm = math.sqrt(sum(weight * weight for _, weight in kept))
+    return {term: weight / norm for term, weight in kept} if norm else {}
+
+
+def _categories(post_ids):
+    categories = defaultdict(set)
+    links = BlogPost.category.through.objects.filter(blogpost_id__in=post_ids)
+    for post_id, category_id in links.values_list('blogpost_id', 'category_id'):
+        categories[post_id].add(category_id)
+    return categories
+
+
+def _score(cosine, categories, a, b, category_weight):
+    shared = categories.get(a, set()) & categories.get(b, set())
+    if not shared:
+        return cosine
+    return cosine * (1 + category_weight * len(shared) / len(categories[a] | categories[b]))
+
+
+def _published():
+    return BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED)
+
+
+def rebuild():
+    """Recompute every vector and neighbour list; returns the posts indexed."""
+    cfg = config()
+    frequencies = {
+        pk: term_frequencies(title, content)
+        for pk, title, content in _published().order_by('pk').values_list('pk', 'title', 'content').iterator(chunk_size=500)
+    }
+    document_frequency = Counter(term for terms in frequencies.values() for term in terms)
+    vectors = {
+        pk: make_vector(terms, document_frequency, len(frequencies), cfg['MAX_TERMS'])
+        for pk, terms in frequencies.items()
+    }
+    del frequencies
+
+    postings = defaultdict(list)
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            postings[term].append((pk, weight))
+    categories = _categories(list(vectors))
+
+    neighbours = []
+    for pk, vector in vectors.items():
+        # Sparse dot products with every post sharing a term
+        cosines = defaultdict(float)
+        for term, weight in vector.items():
+            for other, other_weight in postings[term]:
+                if other != pk:
+                    cosines[other] += weight * other_weight
+        scored = [(_score(cosine, categories, pk, other, cfg['CATEGORY_WEIGHT']), other) for other, cosine in cosines.items()]
+        neighbours += [
+            RelatedPost(post_id=pk, related_id=other, score=score)
+            for score, other in heapq.nlargest(cfg['K'], scored)
+        ]
+
+    with transaction.atomic():
+        RelatedTerm.objects.all().delete()
+        RelatedPost.objects.all().delete()
+        RelatedTerm.objects.bulk_create([
+            RelatedTerm(post_id=pk, term=term, weight=weight)
+            for pk, vector in vectors.items() for term, weight in vector.items()
+        ], batch_size=1000)
+        RelatedPost.objects.bulk_create(neighbours, batch_size=1000)
+    return len(vectors)
+
+
+def remove(post_ids):
+    """Drop posts from the index, e.g. when they are unpublished."""
+    RelatedTerm.objects.filter(post_id__in=post_ids).delete()
+    RelatedPost.objects.filter(post_id__in=post_ids).delete()
+    RelatedPost.objects.filter(related_id__in=post_ids).delete()
+
+
+def listed_by(post_ids):
+    """Ids of the other posts whose lists hold any of ``post_ids``."""
+    owners = RelatedPost.objects.filter(related_id__in=post_ids).values_list('post_id', flat=True)
+    return set(owners) - set(post_ids)
+
+
+def _stored_vectors(post_ids):
+    vectors = defaultdict(dict)
+    for pk, term, weight in RelatedTerm.objects.filter(post_id__in=post_ids).values_list('post_id', 'term', 'weight'):
+        vectors[pk][term] = weight
+    return vectors
+
+
+def _scores(vectors, category_weight):
+    """``{pk: {other: score}}`` of ``vectors`` against every stored vector sharing a term."""
+    postings = defaultdict(list)
+    rows = RelatedTerm.objects.filter(term__in=set().union(*vectors.values())).values_list('post_id', 'term', 'weight')
+    for other, term, weight in rows:
+        postings[term].append((other, weight))
+    cosines = {pk: defaultdict(float) for pk in vectors}
+    for pk, vector in vectors.items():
+        for term, weight in vector.items():
+            for other, other_weight in postings[term]:
+                if other != pk:
+                    cosines[pk][other] += weight * other_weight
+    categories = _categories({*vectors, *(other for scored in cosines.values() for other in scored)})
+    return {
+        pk: {other: _score(cosine, categories, pk, other, category_weight) for other, cosine in scored.items()}
+        for pk, scored in cosines.items()
+    }
+
+
+def _best(scored, k):
+    return dict(heapq.nlargest(k, scored.items(), key=lambda item: item[1]))
+
+
+def refresh_many(posts):
+    """Reindex ``posts`` after they changed, in a fixed number of queries.
+
+    The posts' own lists are scored afresh. A post sharing terms with them
+    has its list merged with their new scores, and a post whose list held
+    one of them is rescored from the stored vectors, so lists that lose an
+    entry are refilled rather than left short.
+    """
+    cfg = config()
+    post_ids = {post.pk for post in posts}
+    refill = listed_by(post_ids)
+    with transaction.atomic():
+        # Also takes them out of every list; the published ones are scored back in
+        remove(post_ids)
+        frequencies = {
+            post.pk: term_frequencies(post.title, post.content)
+            for post in posts if post.status == BlogPost.Status.PUBLISHED
+        }
+        vectors = {}
+        if frequencies:
+            terms = set().union(*frequencies.values())
+            document_frequency = Counter(dict(
+                RelatedTerm.objects.filter(term__in=terms).order_by().values_list('term').annotate(n=Count('pk'))
+            ))
+            for post_terms in frequencies.values():
+                document_frequency.update(post_terms.keys())
+            documents = _published().count()
+            vectors = {
+                pk: make_vector(post_terms, document_frequency, documents, cfg['MAX_TERMS'])
+                for pk, post_terms in frequencies.items()
+            }
+            RelatedTerm.objects.bulk_create([
+                RelatedTerm(post_id=pk, term=term, weight=weight)
+                for pk, vector in vectors.items() for term, weight in vector.items()
+            ], batch_size=1000)
+
+        # Scores are symmetric, so each is also the post's score in the other's list
+        scores = _scores(vectors, cfg['CATEGORY_WEIGHT'])
+        others = {other for scored in scores.values() for other in scored} - vectors.keys() - refill
+        lists = defaultdict(dict)
+        for owner, related, score in RelatedPost.objects.filter(post_id__in=others).values_list('post_id', 'related_id', 'score'):
+            lists[owner][related] = score
+        changed = {}
+        for other in others:
+            current = lists[other]
+            best = _best({**current, **{pk: scores[pk][other] for pk in vectors if other in scores[pk]}}, cfg['K'])
+            if best != current:
+                changed[other] = best
+        changed.update(
+            (pk, _best(scored, cfg['K'])) for pk, scored in _scores(_stored_vectors(refill), cfg['CATEGORY_WEIGHT']).items()
+        )
+        changed.update((pk, _best(scored, cfg['K'])) for pk, scored in scores.items())
+
+        RelatedPost.objects.filter(post_id__in=changed.keys() - vectors.keys()).delete()
+        RelatedPost.objects.bulk_create([
+            RelatedPost(post_id=owner, related_id=related, score=score)
+            for owner, best in changed.items() for related, score in best.items()
+        ], batch_size=1000)
+
+
+_pending = threading.local()
+
+
+def schedule(post_ids):
+    """Refresh ``post_ids`` once the current transaction commits.
+
+    Every save and category change of a post in one transaction schedules
+    it, and the first callback to run refreshes them all in one batch.
+    """
+    _pending.__dict__.setdefault('post_ids', set()).update(post_ids)
+    transaction.on_commit(_refresh_pending)
+
+
+def _refresh_pending():
+    post_ids = _pending.__dict__.pop('post_ids', None)
+    if post_ids:
+        refresh_many(list(BlogPost.objects.filter(pk__in=post_ids).only('pk', 'title', 'content', 'status')))
+
+
+def related_posts(queryset, slug):
+    """The posts of ``queryset`` related to the post at ``slug``, best first."""
+    return queryset.filter(status=BlogPost.Status.PUBLISHED, neighbour_of__post__slug=slug).order_by('-neighbour_of__score')
@@ -0,0 +1,327 @@
+"""Full-text search over published posts.
+
+Two interchangeable backends keep an inverted index of post titles and
+bodies and return BM25-ranked hits with snippets:
+
+* ``FTS5Backend`` uses an SQLite FTS5 virtual table.
+* ``PythonBackend`` stores postings in ``SearchDocument``/``SearchPosting``
+  and ranks in Python, for databases without FTS5.
+
+The index is kept current by the ``BlogPost`` signals in ``api.signals`` and
+by ``api.bulk`` for batch status changes, and rebuilt in bulk by
+``manage.py rebuild_search_index``.
+"""
+import math
+import re
+from functools import lru_cache
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from html import unescape
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Avg, Count
+from django.utils.html import escape, strip_tags
+
+from .models import BlogPost, SearchDocument, SearchPosting
+
+
+FTS_TABLE = 'api_blogpost_fts'
+# Title matches count this many times more than body matches
+TITLE_WEIGHT = 3
+SNIPPET_WORDS = 24
+# Control characters mark matches until the snippet has been HTML-escaped
+MARK_START, MARK_END = '\x02', '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [token[:64] for token in _TOKEN_RE.findall(text.lower())]
+
+
+def plain_text(html):
+    return unescape(strip_tags(html or ''))
+
+
+def highlight(snippet):
+    """HTML-escape a raw snippet and turn its match markers into <mark> tags."""
+    return escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+@dataclass
+class SearchHit:
+    post_id: int
+    score: float
+    snippet: str
+
+
+def make_snippet(text, terms):
+    """Return a window of ``text`` around the first term, with terms marked."""
+    words = text.split()
+    if not words:
+        return ''
+    terms = set(terms)
+    first = next(
+        (i for i, word in enumerate(words) if set(tokenize(word)) & terms),
+        0,
+    )
+    start = max(0, first - SNIPPET_WORDS // 3)
+    window = words[start:start + SNIPPET_WORDS]
+    marked = [
+        f'{MARK_START}{word}{MARK_END}' if set(tokenize(word)) & terms else word
+        for word in window
+    ]
+    prefix = '… ' if start else ''
+    suffix = ' …' if start + SNIPPET_WORDS < len(words) else ''
+    return prefix + ' '.join(marked) + suffix
+
+
+@lru_cache(maxsize=None)
+def _table_exists(database, table):
+    return table in connection.introspection.table_names()
+
+
+def forget_tables():
+    """Drop the cached table lookups; ``migrate`` calls this when it finishes."""
+    _table_exists.cache_clear()
+
+
+def _indexable(post):
+    return post.status == BlogPost.Status.PUBLISHED
+
+
+class FTS5Backend:
+    name = 'fts5'
+
+    @staticmethod
+    def available():
+        if connection.vendor != 'sqlite':
+            return False
+        return _table_exists(connection.settings_dict['NAME'], FTS_TABLE)
+
+    def index(self, post):
+        self.index_many([post])
+
+    def index_many(self, posts):
+        if not posts:
+            return
+        with transaction.atomic(), connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(posts))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', [post.pk for post in posts])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)',
+                [(post.pk, post.title, plain_text(post.content)) for post in posts if _indexable(post)],
+            )
+
+    def remove(self, post_id):
+        self.remove_many([post_id])
+
+    def remove_many(self, post_ids):
+        if not post_ids:
+            return
+        with connection.cursor() as cursor:
+            placeholders = ', '.join(['%s'] * len(post_ids))
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', list(post_ids))
+
+    def rebuild(self, posts):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            count = 0
+            for batch in _batches(posts):
+                cursor.executemany(
+                    f'INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)',
+                    [(post.pk, post.title, plain_text(post.content)) for post in batch],
+                )
+                count += len(batch)
+        return count
+
+    @staticmethod
+    def _match(terms):
+        # Quote every term so user input can't use FTS5 query syntax
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+
+    def count(self, terms):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                [self._match(terms)],
+            )
+            return cursor.fetchone()[0]
+
+    def search(self, terms, limit, offset=0):
+        # bm25() is lower-is-better, so negate it into a score
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid, -bm25({FTS_TABLE}, %s, 1.0), '
+                f"snippet({FTS_TABLE}, 1, %s, %s, '…', %s) "
+                f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, %s, 1.0) LIMIT %s OFFSET %s',
+                [
+                    float(TITLE_WEIGHT), MARK_START, MARK_END, SNIPPET_WORDS,
+                    self._match(terms), float(TITLE_WEIGHT), limit, offset,
+                ],
+            )
+            return [
+                SearchHit(post_id, score, highlight(snippet))
+                for post_id, score, snippet in cursor.fetchall()
+            ]
+
+
+class PythonBackend:
+    """BM25 over postings stored in ordinary tables."""
+    name = 'python'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._last_ranking = None
+
+    @staticmethod
+    def available():
+        return True
+
+    @staticmethod
+    def _postings(post):
+        frequencies = Counter(tokenize(plain_text(post.content)))
+        for term in tokenize(post.title):
+            frequencies[term] += TITLE_WEIGHT
+        return frequencies
+
+    def index(self, post):
+        self.index_many([post])
+
+    def index_many(self, posts):
+        with transaction.atomic():
+            SearchDocument.objects.filter(post_id__in=[post.pk for post in posts]).delete()
+            self._store([post for post in posts if _indexable(post)])
+
+    def remove(self, post_id):
+        self.remove_many([post_id])
+
+    def remove_many(self, post_ids):
+        SearchDocument.objects.filter(post_id__in=post_ids).delete()
+
+    def rebuild(self, posts):
+        count = 0
+        with transaction.atomic():
+            SearchDocument.objects.all().delete()
+            for batch in _batches(posts):
+                self._store(batch)
+                count += len(batch)
+        return count
+
+    def _store(self, posts):
+        frequencies = {post.pk: self._postings(post) for post in posts}
+        documents = SearchDocument.objects.bulk_create([
+            SearchDocument(post_id=post_id, length=sum(terms.values()))
+            for post_id, terms in frequencies.items()
+        ])
+        SearchPosting.objects.bulk_create([
+            SearchPosting(document=document, term=term, frequency=frequency)
+            for document in documents
+            for term, frequency in frequencies[document.post_id].items()
+        ], batch_size=1000)
+
+    def _ranked(self, terms):
+        terms = frozenset(terms)
+        # count() and search() of one request rank the same terms
+        if self._last_ranking and self._last_ranking[0] == terms:
+            return self._last_ranking[1]
+        ranking = self._rank(terms)
+        self._last_ranking = (terms, ranking)
+        return ranking
+
+    def _rank(self, terms):
+        rows = SearchPosting.objects.filter(term__in=terms).values_list(
+            'document__post_id', 'document__length', 'term', 'frequency'
+        )
+        matches = defaultdict(dict)
+        lengths = {}
+        for post_id, length, term, frequency in rows:
+            matches[post_id][term] = frequency
+            lengths[post_id] = length
+
+        # Every term must match, as with FTS5's implicit AND
+        matched = {post_id: tf for post_id, tf in matches.items() if len(tf) == len(terms)}
+        if not matched:
+            return []
+
+        corpus = SearchDocument.objects.aggregate(documents=Count('pk'), average_length=Avg('length'))
+        documents, average_length = corpus['documents'], corpus['average_length']
+        document_frequency = Counter(term for tf in matches.values() for term in tf)
+        scores = []
+        for post_id, tf in matched.items():
+            norm = self.k1 * (1 - self.b + self.b * lengths[post_id] / average_length)
+            score = 0.0
+            for term, frequency in tf.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+                score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+            scores.append((score, post_id))
+        scores.sort(key=lambda pair: (-pair[0], pair[1]))
+        return scores
+
+    def count(self, terms):
+        return len(self._ranked(terms))
+
+    def search(self, terms, limit, offset=0):
+        page = self._ranked(terms)[offset:offset + limit]
+        contents = dict(
+            BlogPost.objects.filter(pk__in=[post_id for _, post_id in page])
+            .values_list('pk', 'content')
+        )
+        return [
+            SearchHit(post_id, score, highlight(make_snippet(plain_text(contents.get(post_id)), terms)))
+            for score, post_id in page
+        ]
+
+
+def _batches(posts, size=500):
+    batch = []
+    for post in posts:
+        batch.append(post)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+BACKENDS = {backend.name: backend for backend in (FTS5Backend, PythonBackend)}
+
+
+def get_backend():
+    """Return the configured backend, falling back to the portable one."""
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        return FTS5Backend() if FTS5Backend.available() else PythonBackend()
+    return BACKENDS[name]()
+
+
+def indexable_posts():
+    return (
+        BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED)
+        .only('pk', 'title', 'content')
+        .order_by('pk')
+        .iterator(chunk_size=500)
+    )
+
+
+class SearchResults:
+    """Lazy, sliceable view of ranked hits for DRF's LimitOffsetPagination."""
+
+    def __init__(self, query, backend=None):
+        self.terms = tokenize(query)
+        self.backend = backend or get_backend()
+
+    def count(self):
+        return self.backend.count(self.terms) if self.terms else 0
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, page):
+        if not self.terms:
+            return []
+        return self.backend.search(self.terms, page.stop - page.start, page.start)
@@ -1,13 +1,23 @@
+from html import unescape
+
+from django.db import models
+from django.utils.html import strip_tags
+from django.utils.text import Truncator
 from rest_framework import serializers
+from .categories import registry as category_registry
+from .comment_tree import attach_comment_trees
+from .images import ImageVariantsField
 from .models import BlogPost, Comment, Like, Bookmark, Category, CommentLike, Notification
 from users.models import User
 from users.serializers import UserSerializer
 
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'profile_picture', 'is_active']
+        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_variants', 'is_active']
         read_only_fields = ['id', 'email', 'is_active']
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -15,7 +25,23 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'slug', 'created_at']
         read_only_fields = ['id', 'created_at']
-        
+
+
+class CategorySlugField(serializers.SlugRelatedField):
+    """Category slugs resolved through the in-memory registry, without a query per slug."""
+
+    def __init__(self, **kwargs):
+        super().__init__(slug_field='slug', queryset=Category.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        category = category_registry.by_slug(data)
+        if category is None:
+            self.fail('does_not_exist', slug_name=self.slug_field, value=data)
+        return category.id
+
+
 class CommentSerializer(serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
@@ -28,7 +54,12 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'updated_at', 'total_likes', 'liked']
 
     def get_replies(self, obj):
-        return CommentSerializer(obj.get_replies(), many=True, context=self.context).data
+        # Comments from attach_comment_trees() already carry their replies
+        if hasattr(obj, 'tree_replies'):
+            replies = obj.tree_replies
+        else:
+            replies = obj.get_replies()
+        return CommentSerializer(replies, many=True, context=self.context).data
 
     def get_total_likes(self, obj):
         return obj.total_likes
@@ -36,59 +67,117 @@ class CommentSerializer(serializers.ModelSerializer):
     def get_liked(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if hasattr(obj, 'is_liked'):
+                return obj.is_liked
             return CommentLike.objects.filter(comment=obj, user=request.user).exists()
         return False
 
-class BlogPostSerializer(serializers.ModelSerializer):
+def _request_user(context):
+    request = context.get('request')
+    return getattr(request, 'user', None)
+
+
+class BlogPostListSerializer(serializers.ListSerializer):
+    """Builds the comment trees of a whole page of posts in one pass."""
+
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        attach_comment_trees(posts, _request_user(self.context))
+        return super().to_representation(posts)
+
+
+class BlogPostSummarySerializer(serializers.ModelSerializer):
+    """Card-sized post representation used by list endpoints."""
     author = UserSerializer(read_only=True)
     category = CategorySerializer(many=True, read_only=True)
-    # Accept category slugs for write operations
-    category_slugs = serializers.SlugRelatedField(
-        queryset=Category.objects.all(),
-        many=True,
-        slug_field='slug',
-        write_only=True,
-        source='category'
-    )
-    comments = serializers.SerializerMethodField(read_only=True)
-    image = serializers.ImageField(required=False)
+    excerpt = serializers.SerializerMethodField(read_only=True)
     total_likes = serializers.IntegerField(read_only=True)
     total_comments = serializers.IntegerField(read_only=True)
     liked = serializers.SerializerMethodField(read_only=True)
     bookmarked = serializers.SerializerMethodField(read_only=True)
+    image_variants = ImageVariantsField(source='image')
+
+    EXCERPT_LENGTH = 200
 
     class Meta:
         model = BlogPost
         fields = [
-            'id', 'title', 'content', 'image', 'slug', 'status',
-            'created_at', 'updated_at', 'author', 'comments', 'category', 'category_slugs',
+            'id', 'title', 'excerpt', 'image', 'image_variants', 'slug', 'status',
+            'created_at', 'updated_at', 'author', 'category',
             'total_likes', 'total_comments', 'liked', 'bookmarked'
         ]
-        read_only_fields = [
-            'id', 'slug', 'created_at', 'updated_at',
-            'author', 'comments', 'category', 'total_likes', 'total_comments', 'liked', 'bookmarked'
-        ]
+        read_only_fields = fields
+
+    def get_excerpt(self, obj):
+        # BlogPost.objects.for_list() only loads the head of the body
+        html = getattr(obj, 'content_head', None)
+        if html is None:
+            html = obj.content
+        elif html.rfind('<') > html.rfind('>'):
+            # Cut inside a tag, such as an inline base64 image; strip_tags would keep it as text
+            html = html[:html.rfind('<')]
+        return Truncator(unescape(strip_tags(html))).chars(self.EXCERPT_LENGTH)
 
-    def get_comments(self, obj):
-        # Only top-level comments
-        top_level_comments = obj.comments.filter(parent__isnull=True)
-        return CommentSerializer(top_level_comments, many=True, context=self.context).data
-    
     def get_liked(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if hasattr(obj, 'is_liked'):
+                return obj.is_liked
             return Like.objects.filter(post=obj, user=request.user).exists()
         return False
 
     def get_bookmarked(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user') and request.user.is_authenticated:
+            if hasattr(obj, 'is_bookmarked'):
+                return obj.is_bookmarked
             return Bookmark.objects.filter(post=obj, user=request.user).exists()
         return False
-        
+
+
+class BlogPostSearchResultSerializer(BlogPostSummarySerializer):
+    snippet = serializers.SerializerMethodField(read_only=True)
+
+    class Meta(BlogPostSummarySerializer.Meta):
+        fields = BlogPostSummarySerializer.Meta.fields + ['snippet']
+        read_only_fields = fields
+
+    def get_snippet(self, obj):
+        # HTML-escaped text around the matches, which are wrapped in <mark>
+        return getattr(obj, 'search_snippet', None)
+
+
+class BlogPostSerializer(BlogPostSummarySerializer):
+    # Accept category slugs for write operations
+    category_slugs = CategorySlugField(
+        many=True,
+        write_only=True,
+        source='category'
+    )
+    comments = serializers.SerializerMethodField(read_only=True)
+    image = serializers.ImageField(required=False)
+
+    class Meta:
+        model = BlogPost
+        fields = [
+            'id', 'title', 'content', 'image', 'image_variants', 'slug', 'status',
+            'created_at', 'updated_at', 'author', 'comments', 'category', 'category_slugs',
+            'total_likes', 'total_comments', 'liked', 'bookmarked'
+        ]
+        read_only_fields = [
+            'id', 'slug', 'created_at', 'updated_at',
+            'author', 'comments', 'category', 'total_likes', 'total_comments', 'liked', 'bookmarked', 'image_variants'
+        ]
+        list_serializer_class = BlogPostListSerializer
+
+    def get_comments(self, obj):
+        # Only top-level comments; replies are linked in memory
+        attach_comment_trees([obj], _request_user(self.context))
+        return CommentSerializer(obj.comment_tree, many=True, context=self.context).data
+
 
 class BookmarkSerializer(serializers.ModelSerializer):
-    post = BlogPostSerializer(read_only=True)
+    post = BlogPostSummarySerializer(read_only=True)
     class Meta:
         model = Bookmark
         fields = ['id', 'post', 'created_at']
@@ -99,40 +188,41 @@ class UserFullInfoSerializer(serializers.ModelSerializer):
     drafts = serializers.SerializerMethodField()
     blog_posts = serializers.SerializerMethodField()
     bookmarks = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'profile_picture', 'drafts', 'blog_posts', 'bookmarks']
+        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_variants', 'drafts', 'blog_posts', 'bookmarks']
         read_only_fields = ['id', 'email', 'drafts', 'blog_posts', 'bookmarks']
 
     def get_drafts(self, obj):
-        from .models import BlogPost
-        drafts = BlogPost.objects.filter(author=obj, status=BlogPost.Status.DRAFT)
-        return BlogPostSerializer(drafts, many=True).data
+        drafts = BlogPost.objects.for_list(_request_user(self.context)).filter(author=obj, status=BlogPost.Status.DRAFT)
+        return BlogPostSummarySerializer(drafts, many=True, context=self.context).data
 
     def get_blog_posts(self, obj):
-        from .models import BlogPost
-        posts = BlogPost.objects.filter(author=obj)
-        return BlogPostSerializer(posts, many=True).data
+        posts = BlogPost.objects.for_list(_request_user(self.context)).filter(author=obj)
+        return BlogPostSummarySerializer(posts, many=True, context=self.context).data
 
     def get_bookmarks(self, obj):
-        from .models import Bookmark
-        bookmarks = Bookmark.objects.filter(user=obj).select_related('post')
-        return BookmarkSerializer(bookmarks, many=True).data
+        bookmarks = Bookmark.objects.filter(user=obj).with_posts(_request_user(self.context))
+        return BookmarkSerializer(bookmarks, many=True, context=self.context).data
         
 
 class PublicUserInfoSerializer(serializers.ModelSerializer):
     published_blogs = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
 
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'profile_picture', 'published_blogs']
+        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_variants', 'published_blogs']
         read_only_fields = ['id', 'email', 'full_name', 'profile_picture', 'published_blogs']
 
     def get_published_blogs(self, obj):
-        from .models import BlogPost
-        posts = BlogPost.objects.filter(author=obj, status=BlogPost.Status.PUBLISHED)
-        return BlogPostSerializer(posts, many=True).data
+        # Async views load the posts up front as ``published_blog_list``
+        posts = getattr(obj, 'published_blog_list', None)
+        if posts is None:
+            posts = BlogPost.objects.for_list(_request_user(self.context)).filter(author=obj, status=BlogPost.Status.PUBLISHED)
+        return BlogPostSummarySerializer(posts, many=True, context=self.context).data
         
 
 class CommentLikeSerializer(serializers.ModelSerializer):
@@ -0,0 +1,192 @@
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from users.models import User
+from . import cache, categories, feed, images, related, search, trending
+from .autocomplete import suggestion_index
+from .models import BlogPost, Category, Comment, CommentLike, Like
+
+
+@receiver([post_save, post_delete], sender=BlogPost)
+@receiver([post_save, post_delete], sender=Comment)
+@receiver([post_save, post_delete], sender=Like)
+@receiver([post_save, post_delete], sender=CommentLike)
+@receiver([post_save, post_delete], sender=Category)
+@receiver(m2m_changed, sender=BlogPost.category.through)
+def invalidate_response_cache(sender, **kwargs):
+    cache.invalidate()
+
+
+SEARCHED_FIELDS = {'title', 'content', 'status'}
+RELATED_FIELDS = {'title', 'content', 'status'}
+SUGGESTED_FIELDS = {'title', 'slug', 'status'}
+
+
+def _touches(update_fields, fields):
+    return update_fields is None or bool(fields & set(update_fields))
+
+
+@receiver(post_save, sender=BlogPost)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, SEARCHED_FIELDS):
+        search.get_backend().index(instance)
+    if _touches(update_fields, SUGGESTED_FIELDS):
+        suggestion_index.update_post(instance)
+
+
+@receiver(post_migrate)
+def forget_search_tables(sender, **kwargs):
+    # Migrations may have created or dropped the FTS5 table
+    search.forget_tables()
+
+
+@receiver(post_save, sender=BlogPost)
+def relate_post(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, RELATED_FIELDS):
+        related.schedule([instance.pk])
+
+
+@receiver(m2m_changed, sender=BlogPost.category.through)
+def relate_post_categories(sender, instance, action, reverse, **kwargs):
+    # Shared categories raise the scores
+    if action in ('post_add', 'post_remove', 'post_clear') and not reverse:
+        related.schedule([instance.pk])
+
+
+@receiver(pre_delete, sender=BlogPost)
+def relist_neighbours(sender, instance, **kwargs):
+    # The delete cascades out of their lists, which are refilled once it commits
+    related.schedule(related.listed_by([instance.pk]))
+
+
+@receiver(m2m_changed, sender=BlogPost.category.through)
+def touch_recategorized_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    # Post and page ETags read updated_at, which link changes don't move
+    if reverse and action == 'pre_clear':
+        instance._recategorized_posts = list(sender.objects.filter(category=instance).values_list('blogpost_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        post_ids = [instance.pk]
+    elif action == 'post_clear':
+        post_ids = instance.__dict__.pop('_recategorized_posts', [])
+    else:
+        post_ids = pk_set
+    if post_ids:
+        BlogPost.objects.filter(pk__in=post_ids).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def touch_category_posts(sender, instance, created=False, **kwargs):
+    # Their responses show the category's name and slug
+    if not created:
+        BlogPost.objects.filter(category=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=BlogPost)
+def refresh_feeds(sender, instance, update_fields=None, **kwargs):
+    if instance.status == BlogPost.Status.PUBLISHED and _touches(update_fields, {'status'}):
+        feed.note_published([instance.author_id], instance.category.values_list('pk', flat=True))
+
+
+@receiver(m2m_changed, sender=BlogPost.category.through)
+def refresh_category_feeds(sender, instance, action, pk_set, reverse, **kwargs):
+    # Categories are set after the post is saved
+    if action == 'post_add' and not reverse and instance.status == BlogPost.Status.PUBLISHED:
+        feed.note_published(category_ids=pk_set)
+
+
+@receiver(post_delete, sender=BlogPost)
+def unindex_post(sender, instance, **kwargs):
+    search.get_backend().remove(instance.pk)
+    suggestion_index.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def index_category(sender, instance, **kwargs):
+    suggestion_index.update_category(instance)
+
+
+@receiver(post_delete, sender=Category)
+def unindex_category(sender, instance, **kwargs):
+    suggestion_index.remove_category(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def forget_categories(sender, **kwargs):
+    categories.registry.clear()
+
+
+def _published(post):
+    return post.status == BlogPost.Status.PUBLISHED
+
+
+@receiver(pre_save, sender=BlogPost)
+def remember_published(sender, instance, update_fields=None, **kwargs):
+    if not instance._state.adding and _touches(update_fields, {'status'}):
+        stored = BlogPost.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+        instance._was_published = stored == BlogPost.Status.PUBLISHED
+
+
+@receiver(post_save, sender=BlogPost)
+def count_category_posts(sender, instance, created, update_fields=None, **kwargs):
+    # A new post has no categories yet; they are counted as they are added
+    if created or not hasattr(instance, '_was_published'):
+        return
+    if instance.__dict__.pop('_was_published') != _published(instance):
+        Category.objects.filter(blogpost=instance).increment('post_count', 1 if _published(instance) else -1)
+
+
+@receiver(pre_delete, sender=BlogPost)
+def uncount_category_posts(sender, instance, **kwargs):
+    if _published(instance):
+        Category.objects.filter(blogpost=instance).increment('post_count', -1)
+
+
+@receiver(m2m_changed, sender=BlogPost.category.through)
+def count_category_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # category.blogpost_set changes, from the admin or a shell
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            categories.recount([instance.pk])
+        return
+    if not _published(instance):
+        return
+    links = sender.objects.filter(blogpost=instance)
+    if action == 'pre_remove':
+        # pk_set holds every id asked for, linked or not
+        instance._unlinked_categories = list(links.filter(category_id__in=pk_set).values_list('category_id', flat=True))
+    elif action == 'pre_clear':
+        instance._unlinked_categories = list(links.values_list('category_id', flat=True))
+    elif action in ('post_remove', 'post_clear'):
+        categories.adjust(instance.__dict__.pop('_unlinked_categories', []), -1)
+    elif action == 'post_add':
+        # Only the ids that were not linked yet
+        categories.adjust(pk_set, 1)
+
+
+@receiver(post_save, sender=Like)
+def trend_like(sender, instance, created, **kwargs):
+    if created:
+        trending.record(instance.post_id, 'like')
+
+
+@receiver(post_save, sender=Comment)
+def trend_comment(sender, instance, created, **kwargs):
+    if created and instance.is_approved:
+        trending.record(instance.post_id, 'comment')
+
+
+@receiver(post_save, sender=BlogPost)
+def render_post_image(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, {'image'}):
+        images.schedule(instance.image.name)
+
+
+@receiver(post_save, sender=User)
+def render_profile_picture(sender, instance, update_fields=None, **kwargs):
+    if _touches(update_fields, {'profile_picture'}):
+        images.schedule(instance.profile_picture.name)
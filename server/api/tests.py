@@ -1,3 +1,1872 @@
-from django.test import TestCase
+import importlib
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncRequestFactory, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from PIL import Image
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+from .models import BlogPost, BlogPostView, Bookmark, Category, Comment, CommentLike, Like, Notification, RelatedPost, TrendingPost
+from techgeek import databases
+from . import async_views, categories, db, feed, images, notifications, reactions, related, search, transfer, trending
+from .autocomplete import PrefixIndex, suggestion_index
+from .view_tracking import ViewBuffer
+
+
+class BlogPostListQueryCountTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.category = Category.objects.create(type=Category.CategoryType.GAMING)
+
+    def make_posts(self, count):
+        for i in range(count):
+            post = BlogPost.objects.create(
+                title=f'Post {BlogPost.objects.count()}',
+                content='Body',
+                author=self.author,
+                status=BlogPost.Status.PUBLISHED,
+            )
+            post.category.add(self.category)
+            Like.objects.create(post=post, user=self.reader)
+            Bookmark.objects.create(post=post, user=self.reader)
+            comment = Comment.objects.create(post=post, author=self.reader, content='First')
+            reply = Comment.objects.create(post=post, author=self.author, parent=comment, content='Reply')
+            CommentLike.objects.create(comment=reply, user=self.reader)
+        call_command('recount_counters', stdout=StringIO())
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response
+
+    def test_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        urls = [
+            reverse('blog-list-create'),
+            reverse('blog-filtered') + '?slug=gaming',
+            reverse('blog-search') + '?q=Post',
+            reverse('blog-top-stories'),
+        ]
+        self.make_posts(2)
+        # Loaded once per process, then category slugs cost no query
+        categories.registry.load()
+        small = [self.count_queries(url)[0] for url in urls]
+        self.make_posts(8)
+        large = [self.count_queries(url)[0] for url in urls]
+        self.assertEqual(small, large)
+
+        # The page's ETag, then the page and its categories
+        with self.assertNumQueries(3):
+            self.client.get(reverse('blog-list-create'))
+
+    def test_list_payload_matches_per_post_lookups(self):
+        self.client.force_authenticate(self.reader)
+        self.make_posts(1)
+        _, response = self.count_queries(reverse('blog-list-create'))
+        post = response.data['results'][0]
+        self.assertEqual(post['total_likes'], 1)
+        self.assertEqual(post['total_comments'], 2)
+        self.assertTrue(post['liked'])
+        self.assertTrue(post['bookmarked'])
+        self.assertEqual(post['category'][0]['slug'], 'gaming')
+
+    def test_list_items_carry_excerpt_instead_of_body(self):
+        BlogPost.objects.create(
+            title='Long', content='<p>' + 'word ' * 100 + '</p>', author=self.author,
+            status=BlogPost.Status.PUBLISHED,
+        )
+        post = self.client.get(reverse('blog-list-create')).data['results'][0]
+        self.assertNotIn('content', post)
+        self.assertNotIn('comments', post)
+        self.assertTrue(post['excerpt'].startswith('word word'))
+        self.assertLessEqual(len(post['excerpt']), 200)
+
+    def test_excerpt_drops_a_tag_cut_off_at_the_boundary(self):
+        BlogPost.objects.create(
+            title='Pictured', content='<p>Hello</p><p><img src="data:image/png;base64,' + 'A' * 2000 + '"></p>',
+            author=self.author, status=BlogPost.Status.PUBLISHED,
+        )
+        post = self.client.get(reverse('blog-list-create')).data['results'][0]
+        self.assertEqual(post['excerpt'], 'Hello')
+
+    def test_bookmark_list_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        url = reverse('user-bookmarks')
+        self.make_posts(2)
+        small, _ = self.count_queries(url)
+        self.make_posts(5)
+        large, response = self.count_queries(url)
+        self.assertEqual(small, large)
+        self.assertTrue(response.data['results'][0]['post']['bookmarked'])
+
+
+def isolate_page_views(test):
+    """Give each test its own view buffer so hits never flush mid-test."""
+    buffer = ViewBuffer(flush_size=1000, flush_interval=3600, dedup_window=300, background=False)
+    patcher = mock.patch('api.view_tracking.page_views', buffer)
+    patcher.start()
+    test.addCleanup(patcher.stop)
+    return buffer
+
+
+class CommentTreeQueryCountTests(APITestCase):
+    def setUp(self):
+        isolate_page_views(self)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Threaded', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+
+    def add_thread(self, depth):
+        parent = None
+        for i in range(depth):
+            parent = Comment.objects.create(post=self.post, author=self.reader, parent=parent, content=f'Level {i}')
+            CommentLike.objects.create(comment=parent, user=self.reader)
+        call_command('recount_counters', stdout=StringIO())
+        return parent
+
+    def test_detail_query_count_is_constant(self):
+        self.client.force_authenticate(self.reader)
+        url = reverse('blog-slug-details', kwargs={'slug': self.post.slug})
+        self.add_thread(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.add_thread(6)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+        threads = response.data['comments']
+        self.assertEqual(len(threads), 2)
+        node = threads[1]
+        for _ in range(5):
+            self.assertTrue(node['liked'])
+            self.assertEqual(node['total_likes'], 1)
+            node = node['replies'][0]
+        self.assertEqual(node['replies'], [])
+
+    def test_unapproved_comments_are_hidden(self):
+        leaf = self.add_thread(2)
+        leaf.is_approved = False
+        leaf.save()
+        response = self.client.get(reverse('blog-details', kwargs={'pk': self.post.pk}))
+        self.assertEqual(response.data['comments'][0]['replies'], [])
+
+
+class CursorPaginationTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.category = Category.objects.create(type=Category.CategoryType.NEWS)
+        for i in range(7):
+            post = BlogPost.objects.create(
+                title=f'Post {i}', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+            )
+            post.category.add(self.category)
+
+    def test_pages_walk_every_post_once(self):
+        url = reverse('blog-list-create') + '?page_size=3'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            seen.extend(post['id'] for post in response.data['results'])
+            url = response.data['next']
+        expected = list(BlogPost.objects.order_by('-created_at').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_filter_limit_sets_page_size(self):
+        response = self.client.get(reverse('blog-filtered') + '?slug=news&limit=4')
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIsNotNone(response.data['next'])
+
+
+class CounterTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(title='Counted', content='Body', author=self.author)
+        self.client.force_authenticate(self.reader)
+
+    def test_toggles_keep_counters_in_step(self):
+        like_url = reverse('blog-like', kwargs={'pk': self.post.pk})
+        self.assertEqual(self.client.post(like_url).data['total_likes'], 1)
+        self.assertEqual(self.client.post(like_url).data['total_likes'], 0)
+
+        bookmark_url = reverse('blog-bookmark', kwargs={'pk': self.post.pk})
+        self.assertEqual(self.client.post(bookmark_url).data['total_bookmarks'], 1)
+
+        create_url = reverse('comment-create')
+        parent = self.client.post(create_url, {'slug': self.post.slug, 'content': 'Hi'}).data
+        self.client.post(create_url, {'slug': self.post.slug, 'content': 'Re', 'parent': parent['id']})
+        comment_like_url = reverse('comment-like', kwargs={'pk': parent['id']})
+        self.assertEqual(self.client.post(comment_like_url).data['total_likes'], 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+
+        self.client.delete(reverse('comment-delete', kwargs={'pk': parent['id']}))
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.like_count, self.post.comment_count, self.post.bookmark_count), (0, 0, 1)
+        )
+
+    def test_recount_command_repairs_drift(self):
+        Like.objects.create(post=self.post, user=self.reader)
+        Comment.objects.create(post=self.post, author=self.reader, content='Hi')
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 1 drifted post(s)', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 0)
+
+        call_command('recount_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.like_count, self.post.comment_count), (1, 1))
+
+
+class ViewBufferTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.posts = [
+            BlogPost.objects.create(title=f'Viewed {i}', content='Body', author=self.author)
+            for i in range(2)
+        ]
+        self.now = 0
+        self.buffer = ViewBuffer(
+            flush_size=10, flush_interval=60, dedup_window=300, clock=lambda: self.now, background=False
+        )
+
+    def test_flush_batches_views_per_post(self):
+        first, second = self.posts
+        for ip in ['10.0.0.1', '10.0.0.2', '10.0.0.3']:
+            self.buffer.record(first.pk, ip)
+        self.buffer.record(second.pk, '10.0.0.1')
+        self.assertEqual(BlogPostView.objects.count(), 0)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.buffer.flush(), 4)
+        statements = [query['sql'] for query in ctx.captured_queries]
+        self.assertEqual(sum(sql.startswith('INSERT INTO "api_blogpostview"') for sql in statements), 1)
+        self.assertEqual(sum(sql.startswith('UPDATE "api_blogpost" ') for sql in statements), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.view_count, second.view_count), (3, 1))
+
+    def test_repeat_viewers_are_deduplicated_within_window(self):
+        post = self.posts[0]
+        self.assertTrue(self.buffer.record(post.pk, '10.0.0.1'))
+        self.assertFalse(self.buffer.record(post.pk, '10.0.0.1'))
+        self.now = 301
+        self.assertTrue(self.buffer.record(post.pk, '10.0.0.1'))
+
+    def test_size_and_interval_make_a_flush_due(self):
+        post = self.posts[0]
+        for i in range(9):
+            self.buffer.record(post.pk, f'10.0.0.{i}')
+        self.assertEqual(self.buffer.flush_due(), 0)
+        # Recording never writes on the request thread
+        self.buffer.record(post.pk, '10.0.0.9')
+        self.assertEqual(BlogPostView.objects.count(), 0)
+        self.assertEqual(self.buffer.flush_due(), 10)
+        self.buffer.record(post.pk, '10.0.1.1')
+        self.now = 61
+        self.assertEqual(self.buffer.flush_due(), 1)
+        self.assertEqual(BlogPostView.objects.count(), 11)
+
+    def test_forwarded_for_is_only_trusted_behind_proxies(self):
+        post = self.posts[0]
+        url = reverse('blog-slug-details', kwargs={'slug': post.slug})
+        page_views = isolate_page_views(self)
+        for spoofed in ['1.1.1.1', '2.2.2.2']:
+            self.client.get(url, HTTP_X_FORWARDED_FOR=spoofed, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(page_views.flush(), 1)
+        with override_settings(VIEW_TRACKING={'TRUSTED_PROXIES': 1}):
+            for spoofed in ['1.1.1.1', '2.2.2.2']:
+                self.client.get(url, HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.2', REMOTE_ADDR='10.0.0.250')
+        self.assertEqual(list(BlogPostView.objects.order_by('pk').values_list('ip_address', flat=True)), ['10.0.0.1'])
+        page_views.flush()
+        self.assertEqual(
+            list(BlogPostView.objects.order_by('pk').values_list('ip_address', flat=True)), ['10.0.0.1', '10.0.0.2']
+        )
+
+    def test_slug_detail_records_view(self):
+        page_views = isolate_page_views(self)
+        post = self.posts[0]
+        url = reverse('blog-slug-details', kwargs={'slug': post.slug})
+        self.client.get(url)
+        self.client.get(url)
+        page_views.flush()
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 1)
+
+
+class ViewBufferWorkerTests(TransactionTestCase):
+    def test_worker_flushes_a_quiet_buffer(self):
+        author = User.objects.create_user(email='author@example.com', password='pass')
+        post = BlogPost.objects.create(title='Viewed', content='Body', author=author)
+        buffer = ViewBuffer(flush_size=100, flush_interval=0.05, dedup_window=300)
+        buffer.record(post.pk, '10.0.0.1')
+        deadline = time.monotonic() + 5
+        while not BlogPostView.objects.exists() and time.monotonic() < deadline:
+            time.sleep(0.02)
+        post.refresh_from_db()
+        self.assertEqual(post.view_count, 1)
+
+
+class AnonymousResponseCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        isolate_page_views(self)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Cached', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.url = reverse('blog-slug-details', kwargs={'slug': self.post.slug})
+
+    def test_repeat_anonymous_requests_hit_the_cache(self):
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['title'], 'Cached')
+
+    def test_query_params_are_part_of_the_key(self):
+        url = reverse('blog-filtered')
+        self.assertEqual(self.client.get(url + '?limit=1')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url + '?limit=2')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url + '?limit=1')['X-Cache'], 'HIT')
+
+    @override_settings(ALLOWED_HOSTS=['a.example.com', 'b.example.com'])
+    def test_host_is_part_of_the_key(self):
+        BlogPost.objects.create(title='Older', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED)
+        url = reverse('blog-filtered') + '?limit=1'
+        self.assertIn('//a.example.com/', self.client.get(url, HTTP_HOST='a.example.com').data['next'])
+        response = self.client.get(url, HTTP_HOST='b.example.com')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn('//b.example.com/', response.data['next'])
+
+    def test_model_changes_invalidate_entries(self):
+        self.client.get(self.url)
+        Comment.objects.create(post=self.post, author=self.author, content='New')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.data['comments']), 1)
+
+    def test_authenticated_requests_bypass_the_cache(self):
+        self.client.get(self.url)
+        self.client.force_authenticate(self.author)
+        response = self.client.get(self.url)
+        self.assertNotIn('X-Cache', response)
+
+    def test_stats_count_hits_and_misses(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        admin = User.objects.create_superuser(email='admin@example.com', password='pass')
+        self.client.force_authenticate(admin)
+        data = self.client.get(reverse('cache-stats')).data
+        self.assertEqual((data['hits'], data['misses']), (1, 1))
+
+
+class SearchIndexTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+
+    def publish(self, title, content, status=BlogPost.Status.PUBLISHED):
+        return BlogPost.objects.create(title=title, content=content, author=self.author, status=status)
+
+    def search(self, query):
+        return self.client.get(reverse('blog-search'), {'q': query}).data
+
+    def check_backend(self):
+        gpu = self.publish('GPU roundup', '<p>The new graphics cards are fast.</p>')
+        body = self.publish('Weekly news', '<p>A short note on <b>gpu</b> prices &amp; more.</p>')
+        self.publish('Draft GPU post', 'gpu gpu gpu', status=BlogPost.Status.DRAFT)
+
+        data = self.search('gpu')
+        self.assertEqual(data['count'], 2)
+        # Title matches outrank body matches
+        self.assertEqual([post['slug'] for post in data['results']], [gpu.slug, body.slug])
+        self.assertIn('<mark>gpu</mark>', data['results'][1]['snippet'])
+        self.assertIn('&amp;', data['results'][1]['snippet'])
+
+        self.assertEqual(self.search('gpu prices')['count'], 1)
+        self.assertEqual(self.search('"gpu" OR')['count'], 0)
+
+        body.title = 'Renamed'
+        body.content = 'Nothing relevant'
+        body.save()
+        self.assertEqual(self.search('gpu')['count'], 1)
+        gpu.delete()
+        self.assertEqual(self.search('gpu')['count'], 0)
+
+    def test_fts5_backend(self):
+        self.assertTrue(search.FTS5Backend.available())
+        self.check_backend()
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_python_backend(self):
+        self.check_backend()
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_rebuild_command(self):
+        BlogPost.objects.bulk_create([
+            BlogPost(title=f'Bulk {i}', slug=f'bulk-{i}', content='imported', author=self.author,
+                     status=BlogPost.Status.PUBLISHED)
+            for i in range(3)
+        ])
+        self.assertEqual(self.search('imported')['count'], 0)
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(self.search('imported')['count'], 3)
+
+    @override_settings(SEARCH_BACKEND='python')
+    def test_migration_fills_the_python_index(self):
+        BlogPost.objects.bulk_create([
+            BlogPost(title=f'Migrated {i}', slug=f'migrated-{i}', content='<p>Legacy &amp; text</p>',
+                     author=self.author, status=BlogPost.Status.PUBLISHED)
+            for i in range(2)
+        ])
+        migration = importlib.import_module('api.migrations.0006_search_index')
+        migration.fill_postings(apps, None)
+        self.assertEqual(self.search('legacy')['count'], 2)
+        self.assertEqual(self.search('migrated')['count'], 2)
+
+    def test_migrate_forgets_cached_tables(self):
+        self.assertTrue(search.FTS5Backend.available())
+        self.assertEqual(search._table_exists.cache_info().currsize, 1)
+        call_command('migrate', 'api', verbosity=0)
+        self.assertEqual(search._table_exists.cache_info().currsize, 0)
+
+
+class AutocompleteTests(APITestCase):
+    def setUp(self):
+        suggestion_index.clear()
+        self.addCleanup(suggestion_index.clear)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        Category.objects.create(type=Category.CategoryType.GAMING)
+        self.old = self.publish('Gaming laptops compared')
+        self.new = self.publish('Best budget gaming mice')
+        self.publish('Gamepad drafts', status=BlogPost.Status.DRAFT)
+
+    def publish(self, title, status=BlogPost.Status.PUBLISHED):
+        return BlogPost.objects.create(title=title, content='Body', author=self.author, status=status)
+
+    def suggest(self, prefix, **params):
+        response = self.client.get(reverse('blog-autocomplete'), {'q': prefix, **params})
+        return [(item['type'], item['label']) for item in response.data['results']]
+
+    def test_prefix_matches_any_word_with_categories_first(self):
+        self.assertEqual(self.suggest('gam'), [
+            ('category', 'Gaming'),
+            ('post', 'Best budget gaming mice'),
+            ('post', 'Gaming laptops compared'),
+        ])
+        self.assertEqual(self.suggest('BUDGET g'), [('post', 'Best budget gaming mice')])
+        self.assertEqual(self.suggest('gam', limit='1'), [('category', 'Gaming')])
+
+    def test_lookups_after_build_do_not_query(self):
+        self.suggest('g')
+        with self.assertNumQueries(0):
+            self.suggest('lap')
+
+    def test_saves_refresh_the_index(self):
+        self.suggest('g')
+        self.old.title = 'Keyboards compared'
+        self.old.save()
+        self.new.status = BlogPost.Status.ARCHIVED
+        self.new.save()
+        self.publish('Gaming chairs')
+        self.assertEqual(self.suggest('gaming'), [('category', 'Gaming'), ('post', 'Gaming chairs')])
+        self.assertEqual(self.suggest('key'), [('post', 'Keyboards compared')])
+
+    def test_index_is_bounded(self):
+        index = PrefixIndex(max_entries=2, refresh_interval=3600, max_scan=100)
+        index.build()
+        for i in range(3):
+            index.update_post(self.publish(f'Gaming extra {i}'))
+        labels = [suggestion.label for suggestion in index.suggest('gaming extra', 10)]
+        self.assertEqual(labels, ['Gaming extra 2', 'Gaming extra 1'])
+
+    def test_eviction_heap_does_not_grow_with_churn(self):
+        index = PrefixIndex(max_entries=2, refresh_interval=3600, max_scan=100)
+        index.build()
+        post = self.publish('Gaming churn')
+        for i in range(200):
+            post.title = f'Gaming churn {i}'
+            index.update_post(post)
+            index.remove_post(post.pk)
+            index.update_post(post)
+        self.assertLessEqual(len(index._posts_by_rank), 2 * len(index) + 64)
+        # Newer posts still push the churned one out
+        for i in range(2):
+            index.update_post(self.publish(f'Gaming newer {i}'))
+        labels = [s.label for s in index.suggest('gaming', 10) if s.type == 'post']
+        self.assertEqual(labels, ['Gaming newer 1', 'Gaming newer 0'])
+
+
+class AutocompleteRebuildTests(TransactionTestCase):
+    def test_stale_index_is_rebuilt_once_in_the_background(self):
+        author = User.objects.create_user(email='author@example.com', password='pass')
+        BlogPost.objects.create(title='Gaming mice', content='Body', author=author, status=BlogPost.Status.PUBLISHED)
+        now = [0]
+        index = PrefixIndex(max_entries=100, refresh_interval=60, max_scan=100, clock=lambda: now[0])
+        index.build()
+        # Written behind the index's back, as another worker process would
+        BlogPost.objects.bulk_create([
+            BlogPost(title='Gaming chairs', slug='gaming-chairs', content='Body', author=author,
+                     status=BlogPost.Status.PUBLISHED),
+        ])
+        now[0] = 61
+        release = threading.Event()
+        load = index._load
+
+        def slow_load():
+            release.wait(5)
+            return load()
+
+        with mock.patch.object(index, '_load', side_effect=slow_load) as loads:
+            for _ in range(3):
+                self.assertEqual([s.label for s in index.suggest('gaming', 10)], ['Gaming mice'])
+            release.set()
+            index._builder.join(5)
+        self.assertEqual(loads.call_count, 1)
+        self.assertEqual([s.label for s in index.suggest('gaming', 10)], ['Gaming chairs', 'Gaming mice'])
+
+    def test_changes_during_a_rebuild_survive_the_swap(self):
+        author = User.objects.create_user(email='author@example.com', password='pass')
+        index = PrefixIndex(max_entries=100, refresh_interval=60, max_scan=100)
+        load = index._load
+
+        def load_then_publish():
+            suggestions = load()
+            index.update_post(BlogPost.objects.create(
+                title='Gaming desks', content='Body', author=author, status=BlogPost.Status.PUBLISHED,
+            ))
+            return suggestions
+
+        with mock.patch.object(index, '_load', side_effect=load_then_publish):
+            index.build()
+        self.assertEqual([s.label for s in index.suggest('gaming', 10)], ['Gaming desks'])
+
+
+class TrendingTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.readers = [
+            User.objects.create_user(email=f'reader{i}@example.com', password='pass') for i in range(3)
+        ]
+        self.posts = [
+            BlogPost.objects.create(
+                title=f'Story {i}', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+            )
+            for i in range(4)
+        ]
+
+    def top_stories(self, **params):
+        response = self.client.get(reverse('blog-top-stories'), params)
+        return [post['id'] for post in response.data]
+
+    def test_likes_and_comments_rank_stories(self):
+        first, second, third, _ = self.posts
+        for reader in self.readers:
+            Like.objects.create(post=second, user=reader)
+        Comment.objects.create(post=third, author=self.readers[0], content='Hi')
+        Like.objects.create(post=first, user=self.readers[0])
+        self.assertEqual(self.top_stories(), [second.pk, third.pk, first.pk])
+
+    def test_older_activity_decays(self):
+        old, new = self.posts[:2]
+        now = timezone.now()
+        trending.record(old.pk, 'like', count=3, now=now - timedelta(hours=36))
+        trending.record(new.pk, 'like', count=1, now=now)
+        self.assertEqual(trending.top_post_ids(2, now=now), [new.pk, old.pk])
+        # Three half-lives earlier, old's three likes are worth 3/8 of one like
+        self.assertEqual(trending.top_post_ids(2, window_hours=24, now=now), [new.pk])
+
+    def test_limit_and_fallback_to_newest(self):
+        Like.objects.create(post=self.posts[0], user=self.readers[0])
+        newest = BlogPost.objects.order_by('-created_at').first()
+        self.assertEqual(self.top_stories(limit='2'), [self.posts[0].pk, newest.pk])
+
+    def test_window_is_clamped(self):
+        Like.objects.create(post=self.posts[0], user=self.readers[0])
+        self.assertEqual(trending.parse_params({'window': '99999999999'}), (3, 720))
+        self.assertEqual(self.top_stories(limit='1', window='99999999999'), [self.posts[0].pk])
+
+    def test_recompute_matches_incremental_scores(self):
+        for post, reader in zip(self.posts, self.readers):
+            Like.objects.create(post=post, user=reader)
+        Comment.objects.create(post=self.posts[2], author=self.author, content='Hi')
+        incremental = trending.top_post_ids(3)
+        call_command('recompute_trending', stdout=StringIO())
+        self.assertEqual(trending.top_post_ids(3), incremental)
+        self.assertEqual(incremental[0], self.posts[2].pk)
+
+
+@override_settings(NOTIFICATIONS={'BROKER': 'sync', 'COALESCE_WINDOW': 3600})
+class NotificationDispatchTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Post', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.client.force_authenticate(self.reader)
+
+    def like(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('blog-like', args=[self.post.pk]))
+
+    def comment(self, **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('comment-create'), {'slug': self.post.slug, 'content': 'Hi', **data})
+
+    def test_comments_and_replies_notify_after_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('comment-create'), {'slug': self.post.slug, 'content': 'Hi'})
+        # Nothing is written until the request's transaction commits
+        self.assertFalse(Notification.objects.exists())
+        for callback in callbacks:
+            callback()
+        self.client.force_authenticate(self.author)
+        self.comment(parent=response.data['id'])
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient__email', 'verb')),
+            [('author@example.com', 'comment'), ('reader@example.com', 'reply')],
+        )
+
+    def test_own_activity_does_not_notify(self):
+        self.client.force_authenticate(self.author)
+        self.like()
+        self.comment()
+        self.assertFalse(Notification.objects.exists())
+
+    def test_like_toggles_collapse_within_window(self):
+        for _ in range(3):
+            self.like()
+            self.like()
+        self.like()
+        self.assertEqual(Notification.objects.filter(verb=Notification.Verb.LIKE).count(), 1)
+
+    def test_batches_coalesce_and_write_in_one_insert(self):
+        other = User.objects.create_user(email='other@example.com', password='pass')
+        like = notifications.NotificationEvent(self.author.pk, self.reader.pk, Notification.Verb.LIKE, self.post.pk)
+        undone = notifications.NotificationEvent(self.author.pk, other.pk, Notification.Verb.LIKE, self.post.pk)
+        events = notifications.coalesce([
+            (like, False), (undone, False), (like, False), (undone, True),
+        ])
+        self.assertEqual(events, [like])
+        comments = [
+            notifications.NotificationEvent(self.author.pk, user.pk, Notification.Verb.COMMENT, self.post.pk)
+            for user in (self.reader, other)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            notifications.write_notifications(events + comments)
+        inserts = [query for query in queries if query['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(Notification.objects.count(), 3)
+
+    def test_steady_traffic_flushes_every_interval(self):
+        broker = notifications.ThreadBroker(batch_size=100, flush_interval=0.2)
+
+        def send():
+            for i in range(40):
+                broker._queue.put((i, False))
+                time.sleep(0.02)
+
+        sender = threading.Thread(target=send)
+        sender.start()
+        started = time.monotonic()
+        batch = broker._next_batch()
+        elapsed = time.monotonic() - started
+        sender.join()
+        # Events arrive faster than the interval, yet the batch closes on time
+        self.assertLess(elapsed, 0.5)
+        self.assertLess(len(batch), 40)
+
+
+class NotificationStreamTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Post', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.unread = Notification.objects.create(
+            recipient=self.author, actor=self.reader, verb=Notification.Verb.LIKE, post=self.post
+        )
+        self.url = reverse('notification-stream')
+
+    async def ticket(self, token):
+        response = await self.async_client.post(
+            reverse('notification-stream-ticket'), headers={'Authorization': f'Bearer {token}'}
+        )
+        return response.data['ticket']
+
+    async def test_stream_pushes_notifications_and_unread_deltas(self):
+        token = str(AccessToken.for_user(self.author))
+        response = await self.async_client.get(self.url, {'ticket': await self.ticket(token)})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'event: unread\ndata: {"count": 1}\n\n')
+
+        event = notifications.NotificationEvent(
+            self.author.pk, self.reader.pk, Notification.Verb.COMMENT, self.post.pk
+        )
+        await sync_to_async(notifications.write_notifications)([event])
+        pushed = await anext(stream)
+        self.assertTrue(pushed.startswith(b'event: notification\n'))
+        self.assertIn(b'"unread_delta": 1', pushed)
+        self.assertIn(b'"post_title": "Post"', pushed)
+
+        await self.async_client.post(
+            reverse('notification-mark-as-read', args=[self.unread.pk]),
+            headers={'Authorization': f'Bearer {token}'},
+        )
+        self.assertEqual(await anext(stream), b'event: unread\ndata: {"unread_delta": -1}\n\n')
+        await stream.aclose()
+
+    async def test_stream_requires_a_ticket_and_asgi(self):
+        response = await self.async_client.get(self.url, {'ticket': 'not-a-ticket'})
+        self.assertEqual(response.status_code, 401)
+        response = await sync_to_async(self.client.get)(self.url)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_tickets_are_single_use_and_short_lived(self):
+        token = str(AccessToken.for_user(self.author))
+        # Access tokens no longer open a stream
+        response = await self.async_client.get(self.url, {'token': token})
+        self.assertEqual(response.status_code, 401)
+        response = await self.async_client.get(self.url, {'ticket': token})
+        self.assertEqual(response.status_code, 401)
+
+        ticket = await self.ticket(token)
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 200)
+        await response.streaming_content.aclose()
+        response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+        ticket = await self.ticket(token)
+        with override_settings(REALTIME={'TICKET_TTL': -1}):
+            response = await self.async_client.get(self.url, {'ticket': ticket})
+        self.assertEqual(response.status_code, 401)
+
+
+@override_settings(NOTIFICATIONS={'BROKER': 'sync'})
+class NotificationReadStateTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Post', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.client.force_authenticate(self.author)
+
+    def notify(self, count, recipient=None):
+        recipient = recipient or self.author
+        return notifications.write_notifications([
+            notifications.NotificationEvent(recipient.pk, self.reader.pk, Notification.Verb.COMMENT, self.post.pk)
+            for _ in range(count)
+        ])
+
+    def unread_count(self):
+        return self.client.get(reverse('notification-unread-count')).data['unread_count']
+
+    def test_unread_count_is_cached_and_kept_current(self):
+        first, second, _ = self.notify(3)
+        self.assertEqual(self.unread_count(), 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 3)
+
+        self.notify(1)
+        self.client.post(reverse('notification-mark-as-read', args=[first.pk]))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 3)
+
+        other = self.notify(1, recipient=self.reader)[0]
+        response = self.client.post(
+            reverse('notification-mark-read'), {'ids': [first.pk, second.pk, other.pk]}, format='json'
+        )
+        self.assertEqual(response.data, {'marked': 1, 'unread_count': 2})
+        self.assertFalse(Notification.objects.get(pk=other.pk).is_read)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('notification-mark-all-read'))
+        self.assertEqual(response.data, {'marked': 2, 'unread_count': 0})
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['UPDATE'])
+        self.assertEqual(Notification.objects.filter(recipient=self.author, is_read=False).count(), 0)
+
+    def test_list_query_count_is_constant(self):
+        url = reverse('notification-list')
+        self.notify(2)
+        with CaptureQueriesContext(connection) as small:
+            self.client.get(url)
+        self.notify(6)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(url)
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+        self.assertEqual(response.data['results'][0]['post_title'], 'Post')
+
+    def test_deleting_comments_and_posts_uncounts_their_notifications(self):
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Mine')
+        reply = Comment.objects.create(post=self.post, author=self.reader, parent=comment, content='Reply')
+        other = Comment.objects.create(post=self.post, author=self.author, content='Kept')
+        notifications.write_notifications([
+            notifications.NotificationEvent(self.author.pk, self.reader.pk, Notification.Verb.COMMENT, self.post.pk, pk)
+            for pk in (reply.pk, other.pk)
+        ])
+        self.notify(1)
+        self.assertEqual(self.unread_count(), 3)
+
+        self.client.delete(reverse('comment-delete', args=[comment.pk]))
+        self.assertEqual(self.unread_count(), 2)
+        self.client.delete(reverse('blog-delete', args=[self.post.pk]))
+        self.assertEqual(self.unread_count(), 0)
+        self.assertFalse(Notification.objects.exists())
+
+    def test_notifications_created_through_the_api_are_counted(self):
+        self.notify(1)
+        self.assertEqual(self.unread_count(), 1)
+        data = {'recipient': self.author.pk, 'verb': Notification.Verb.COMMENT, 'post': self.post.pk}
+        self.assertEqual(self.client.post(reverse('notification-list'), data).status_code, 201)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.unread_count(), 2)
+        self.client.post(reverse('notification-list'), {**data, 'is_read': True})
+        self.assertEqual(self.unread_count(), 2)
+
+    def test_prune_removes_old_read_notifications_in_batches(self):
+        old_read, old_unread, new_read = self.notify(3)
+        Notification.objects.filter(pk__in=[old_read.pk, old_unread.pk]).update(
+            created_at=timezone.now() - timedelta(days=120)
+        )
+        Notification.objects.filter(pk__in=[old_read.pk, new_read.pk]).update(is_read=True)
+        call_command('prune_notifications', '--batch-size=1', stdout=StringIO())
+        self.assertEqual(
+            set(Notification.objects.values_list('pk', flat=True)), {old_unread.pk, new_read.pk}
+        )
+
+
+class AsyncReadViewTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        isolate_page_views(self)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        category = Category.objects.create(type=Category.CategoryType.GAMING)
+        self.posts = []
+        for i in range(3):
+            post = BlogPost.objects.create(
+                title=f'Gaming post {i}', content='<p>Body</p>', author=self.author, status=BlogPost.Status.PUBLISHED
+            )
+            post.category.add(category)
+            self.posts.append(post)
+        Like.objects.create(post=self.posts[1], user=self.reader)
+        comment = Comment.objects.create(post=self.posts[0], author=self.reader, content='First')
+        reply = Comment.objects.create(post=self.posts[0], author=self.author, parent=comment, content='Reply')
+        CommentLike.objects.create(comment=reply, user=self.reader)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(self.reader)}'}
+
+    def get_async(self, url, params=None, **kwargs):
+        # techgeek.asgi routes through this URLconf; the test client does not
+        with override_settings(ROOT_URLCONF='techgeek.asgi_urls'):
+            response = async_to_sync(self.async_client.get)(url, params, **kwargs)
+            response.view_module = response.resolver_match.func.view_class.__module__
+        return response
+
+    def test_async_views_match_drf_views(self):
+        requests = [
+            (reverse('blog-list-create'), {'page_size': '2'}),
+            (reverse('blog-slug-details', args=[self.posts[0].slug]), {}),
+            (reverse('blog-top-stories'), {}),
+            (reverse('blog-search'), {'q': 'gaming'}),
+            (reverse('blog-search'), {}),
+            (reverse('user-public-info', args=[self.author.pk]), {}),
+        ]
+        for url, params in requests:
+            with self.subTest(url=url, params=params):
+                expected = self.client.get(url, params, headers=self.headers)
+                response = self.get_async(url, params, headers=self.headers)
+                self.assertEqual(response.view_module, 'api.async_views')
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected.json())
+
+    def test_anonymous_responses_share_the_response_cache(self):
+        url = reverse('blog-list-create')
+        self.assertEqual(self.get_async(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        cache.clear()
+        self.client.get(url)
+        self.assertEqual(self.get_async(url)['X-Cache'], 'HIT')
+
+    def test_head_sends_the_headers_of_get_without_a_body(self):
+        url = reverse('blog-list-create')
+        expected = self.get_async(url)
+        # The test client drops HEAD bodies itself, so call the view directly
+        response = async_to_sync(async_views.BlogPostListView.as_view())(AsyncRequestFactory().head(url))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], expected['ETag'])
+        self.assertEqual(int(response['Content-Length']), len(expected.content))
+
+    def test_permissions_come_from_the_drf_view(self):
+        expected = self.client.get(reverse('feed'))
+        response = self.get_async(reverse('feed'))
+        self.assertEqual(response.view_module, 'api.async_views')
+        self.assertEqual((response.status_code, response.json()), (expected.status_code, expected.json()))
+
+    def test_errors_and_writes(self):
+        self.assertEqual(self.get_async(reverse('blog-slug-details', args=['missing'])).status_code, 404)
+        response = self.get_async(reverse('blog-list-create'), headers={'Authorization': 'Bearer nope'})
+        self.assertEqual(response.status_code, 401)
+
+        with override_settings(ROOT_URLCONF='techgeek.asgi_urls'):
+            response = async_to_sync(self.async_client.post)(
+                reverse('blog-list-create'),
+                {'title': 'Written via ASGI', 'content': 'Body', 'status': 'published', 'category_slugs': ['gaming']},
+                headers=self.headers,
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(BlogPost.objects.filter(title='Written via ASGI', author=self.reader).exists())
+
+
+class ImageVariantTests(APITestCase):
+    def setUp(self):
+        isolate_page_views(self)
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(
+            MEDIA_ROOT=media_root.name,
+            IMAGE_VARIANTS={'WIDTHS': [32, 64], 'FORMATS': ['webp', 'jpeg'], 'QUALITY': 80, 'WORKERS': 0},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.media_root = media_root.name
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+
+    def upload(self, name='photo.png', size=(100, 50), mode='RGBA'):
+        buffer = BytesIO()
+        Image.new(mode, size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def make_post(self, image):
+        return BlogPost.objects.create(
+            title=f'Pictured {image.name}', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED, image=image
+        )
+
+    def variant_size(self, name, width, fmt):
+        with Image.open(os.path.join(self.media_root, images.variant_name(name, width, fmt))) as variant:
+            return variant.format, variant.size
+
+    def test_upload_renders_variants_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = self.make_post(self.upload())
+        self.assertEqual(self.variant_size(post.image.name, 32, 'webp'), ('WEBP', (32, 16)))
+        self.assertEqual(self.variant_size(post.image.name, 64, 'jpeg'), ('JPEG', (64, 32)))
+
+        response = self.client.get(reverse('blog-slug-details', args=[post.slug]))
+        self.assertEqual(
+            response.json()['image_variants']['webp']['32'],
+            f'http://testserver/media/variants/32w/{post.image.name}.webp',
+        )
+        self.assertIsNone(response.json()['author']['profile_picture_variants'])
+
+    def test_variants_render_lazily_on_first_request(self):
+        # No on_commit callbacks run here, so nothing is rendered up front
+        self.author.profile_picture = self.upload('face.png', size=(20, 20), mode='P')
+        self.author.save()
+        name = self.author.profile_picture.name
+        url = reverse('image-variant', args=[64, f'{name}.jpeg'])
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'\xff\xd8'))
+        # Never upscaled
+        self.assertEqual(self.variant_size(name, 64, 'jpeg'), ('JPEG', (20, 20)))
+
+        for width, variant in [(48, f'{name}.jpeg'), (64, f'{name}.gif'), (64, 'missing.png.webp'), (64, '../../etc/passwd.webp')]:
+            with self.subTest(width=width, variant=variant):
+                self.assertEqual(self.client.get(reverse('image-variant', args=[width, variant])).status_code, 404)
+
+    def test_only_uploaded_originals_get_variants(self):
+        post = self.make_post(self.upload())
+        name = post.image.name
+        self.assertEqual(self.client.get(reverse('image-variant', args=[64, f'{name}.webp'])).status_code, 200)
+        stray = os.path.join(self.media_root, 'blog_images', 'stray.png')
+        Image.new('RGB', (10, 10)).save(stray)
+        os.makedirs(os.path.join(self.media_root, 'other'))
+        Image.new('RGB', (10, 10)).save(os.path.join(self.media_root, 'other', 'file.png'))
+
+        for variant in [
+            f'variants/64w/{name}.webp.webp',
+            f'variants/32w/variants/64w/{name}.webp.webp',
+            'blog_images/stray.png.webp',
+            'other/file.png.webp',
+            f'blog_images/../{name}.webp',
+        ]:
+            with self.subTest(variant=variant):
+                self.assertEqual(self.client.get(reverse('image-variant', args=[64, variant])).status_code, 404)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'variants', '64w', 'variants')))
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'variants', '64w', 'blog_images', 'stray.png.webp')))
+
+    def test_backfill_renders_existing_media_in_parallel(self):
+        posts = [self.make_post(self.upload(f'photo{i}.png')) for i in range(3)]
+        out = StringIO()
+        call_command('generate_image_variants', workers=2, stdout=out)
+        self.assertIn('Rendered 12 variant(s) of 3 image(s); 0 failed.', out.getvalue())
+        for post in posts:
+            self.assertEqual(self.variant_size(post.image.name, 32, 'webp'), ('WEBP', (32, 16)))
+
+        out = StringIO()
+        call_command('generate_image_variants', workers=2, stdout=out)
+        self.assertIn('Rendered 0 variant(s) of 3 image(s)', out.getvalue())
+
+
+class MediaServingTests(APITestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        overrides = override_settings(MEDIA_ROOT=media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        os.makedirs(os.path.join(media_root.name, 'blog_images'))
+        self.body = bytes(range(256)) * 4
+        with open(os.path.join(media_root.name, 'blog_images', 'photo.jpg'), 'wb') as f:
+            f.write(self.body)
+        self.url = reverse('media', args=['blog_images/photo.jpg'])
+
+    def get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def test_full_and_conditional_responses(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.body, self.body)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=86400')
+
+        for headers in [{'If-None-Match': response['ETag']}, {'If-Modified-Since': response['Last-Modified']}]:
+            with self.subTest(headers=headers):
+                not_modified = self.get(**headers)
+                self.assertEqual(not_modified.status_code, 304)
+                self.assertEqual(not_modified.body, b'')
+                self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.get(**{'If-None-Match': '"stale"'}).status_code, 200)
+        self.assertEqual(self.get(**{'If-Match': '"stale"'}).status_code, 412)
+
+        for path in ['blog_images/missing.jpg', 'blog_images', '../../etc/passwd']:
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(reverse('media', args=[path])).status_code, 404)
+
+    def test_range_requests(self):
+        etag = self.get()['ETag']
+        cases = [
+            ('bytes=10-19', 206, 'bytes 10-19/1024', self.body[10:20]),
+            ('bytes=1000-', 206, 'bytes 1000-1023/1024', self.body[1000:]),
+            ('bytes=-4', 206, 'bytes 1020-1023/1024', self.body[-4:]),
+            ('bytes=1000-5000', 206, 'bytes 1000-1023/1024', self.body[1000:]),
+            ('bytes=2000-', 416, 'bytes */1024', b''),
+            ('bytes=0-1,5-6', 200, None, self.body),
+            ('bytes=9-1', 200, None, self.body),
+        ]
+        for header, status_code, content_range, body in cases:
+            with self.subTest(header=header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response.get('Content-Range'), content_range)
+                self.assertEqual(response.body, body)
+                if status_code == 206:
+                    self.assertEqual(int(response['Content-Length']), len(body))
+
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': etag}).status_code, 206)
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': '"changed"'}).status_code, 200)
+
+    def test_offload_headers(self):
+        with override_settings(MEDIA_SERVING={'OFFLOAD': 'x-accel-redirect', 'ACCEL_PREFIX': '/internal/'}):
+            response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], '/internal/blog_images/photo.jpg')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.body, b'')
+        self.assertIn('ETag', response)
+
+        with override_settings(MEDIA_SERVING={'OFFLOAD': 'x-sendfile'}):
+            response = self.get()
+        self.assertEqual(response['X-Sendfile'], os.path.join(settings.MEDIA_ROOT, 'blog_images', 'photo.jpg'))
+
+
+class ConditionalGetTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        isolate_page_views(self)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Tagged', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.comment = Comment.objects.create(post=self.post, author=self.author, content='First')
+        self.detail_url = reverse('blog-slug-details', args=[self.post.slug])
+        self.list_url = reverse('blog-list-create')
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, headers={'If-None-Match': etag})
+
+    def test_unchanged_post_is_not_modified_before_serializing(self):
+        self.client.force_authenticate(self.reader)
+        response = self.client.get(self.detail_url)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+
+        # The post's state and the reader's comment likes, nothing else
+        with self.assertNumQueries(2), mock.patch('api.views.record_view') as record_view:
+            not_modified = self.revalidate(self.detail_url, etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], etag)
+        # Revalidations still count as views
+        record_view.assert_called_once_with(mock.ANY, self.post.pk)
+
+        changes = [
+            lambda: Like.objects.create(post=self.post, user=self.reader)
+            and BlogPost.objects.filter(pk=self.post.pk).increment('like_count'),
+            lambda: Comment.objects.filter(pk=self.comment.pk).update(content='Edited', updated_at=timezone.now()),
+            lambda: CommentLike.objects.create(comment=self.comment, user=self.reader),
+            lambda: BlogPost.objects.filter(pk=self.post.pk).update(title='Retitled', updated_at=timezone.now()),
+        ]
+        for change in changes:
+            change()
+            response = self.revalidate(self.detail_url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response['ETag'], etag)
+            etag = response['ETag']
+
+        self.client.force_authenticate(self.author)
+        self.assertEqual(self.revalidate(self.detail_url, etag).status_code, 200)
+
+    def test_list_pages_are_revalidated_from_their_rows(self):
+        self.client.force_authenticate(self.reader)
+        etag = self.client.get(self.list_url)['ETag']
+        self.assertEqual(self.revalidate(self.list_url, etag).status_code, 304)
+
+        Bookmark.objects.create(post=self.post, user=self.reader)
+        response = self.revalidate(self.list_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['results'][0]['bookmarked'])
+
+        # A deleted neighbour takes the next link with it
+        url = self.list_url + '?page_size=1'
+        BlogPost.objects.create(title='Newer', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED)
+        etag = self.client.get(url)['ETag']
+        self.post.delete()
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['next'])
+
+    def test_list_pages_follow_category_changes(self):
+        self.client.force_authenticate(self.reader)
+        category = Category.objects.create(type=Category.CategoryType.GAMING)
+        other = Category.objects.create(type=Category.CategoryType.NEWS)
+        etag = self.client.get(self.list_url)['ETag']
+
+        def rename():
+            category.type = Category.CategoryType.HARDWARE
+            category.save()
+
+        changes = [
+            lambda: self.post.category.add(category),
+            lambda: other.blogpost_set.add(self.post),
+            lambda: self.post.category.remove(other),
+            rename,
+            lambda: category.blogpost_set.clear(),
+        ]
+        for change in changes:
+            change()
+            response = self.revalidate(self.list_url, etag)
+            self.assertEqual(response.status_code, 200)
+            etag = response['ETag']
+        self.assertEqual(response.data['results'][0]['category'], [])
+
+    def test_anonymous_tags_are_cached_with_the_responses(self):
+        etag = self.client.get(self.detail_url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(self.detail_url, etag).status_code, 304)
+
+        Comment.objects.create(post=self.post, author=self.reader, content='Second')
+        response = self.revalidate(self.detail_url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['comments']), 2)
+
+    def test_async_views_send_the_same_tags(self):
+        self.client.force_authenticate(self.reader)
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.reader)}'}
+        for url in [self.detail_url, self.list_url]:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with override_settings(ROOT_URLCONF='techgeek.asgi_urls'):
+                    response = async_to_sync(self.async_client.get)(url, headers={**headers, 'If-None-Match': etag})
+                self.assertEqual(response.status_code, 304)
+
+
+class ContentTransferTests(APITestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.dump = os.path.join(directory.name, 'content.ndjson')
+        self.author = User.objects.create_user(email='author@example.com', password='pass', full_name='Author')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        category = Category.objects.create(type=Category.CategoryType.GAMING)
+        self.posts = []
+        for i in range(3):
+            post = BlogPost.objects.create(
+                title=f'Post {i}', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+            )
+            post.category.add(category)
+            Like.objects.create(post=post, user=self.reader)
+            Bookmark.objects.create(post=post, user=self.reader)
+            comment = Comment.objects.create(post=post, author=self.reader, content='First')
+            reply = Comment.objects.create(post=post, author=self.author, parent=comment, content='Reply')
+            Comment.objects.create(post=post, author=self.reader, parent=reply, content='Reply to reply')
+            CommentLike.objects.create(comment=reply, user=self.reader)
+            Notification.objects.create(
+                recipient=self.author, actor=self.reader, verb=Notification.Verb.COMMENT, post=post, comment=comment
+            )
+            self.posts.append(post)
+        call_command('recount_counters', stdout=StringIO())
+
+    def snapshot(self):
+        def rows(queryset):
+            # Nullable columns don't sort, their reprs do
+            return sorted(map(repr, queryset))
+
+        return {
+            'posts': rows(BlogPost.objects.values_list(
+                'slug', 'author__email', 'like_count', 'comment_count', 'bookmark_count', 'created_at'
+            )),
+            'categories': rows(BlogPost.objects.values_list('slug', 'category__slug')),
+            'comments': rows(Comment.objects.values_list(
+                'post__slug', 'author__email', 'parent__content', 'content', 'like_count', 'created_at'
+            )),
+            'likes': rows(Like.objects.values_list('post__slug', 'user__email')),
+            'comment_likes': rows(CommentLike.objects.values_list('comment__content', 'user__email')),
+            'bookmarks': rows(Bookmark.objects.values_list('post__slug', 'user__email')),
+            'notifications': rows(Notification.objects.values_list(
+                'recipient__email', 'actor__email', 'post__slug', 'comment__content', 'created_at'
+            )),
+        }
+
+    def export_and_wipe(self):
+        call_command('export_content', self.dump, chunk_size=2, stdout=StringIO())
+        expected = self.snapshot()
+        BlogPost.objects.all().delete()
+        Category.objects.all().delete()
+        self.reader.delete()
+        return expected
+
+    def test_round_trip_through_a_dump(self):
+        expected = self.export_and_wipe()
+        out = StringIO()
+        call_command('import_content', self.dump, batch_size=2, stdout=out)
+        self.assertIn('Imported 1 users.user, 1 api.category, 3 api.blogpost, 9 api.comment', out.getvalue())
+        self.assertIn('Related ', out.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+        self.assertFalse(User.objects.get(email='reader@example.com').has_usable_password())
+
+        # Everything is logged as done, so a rerun writes nothing
+        call_command('import_content', self.dump, stdout=out)
+        self.assertEqual(self.snapshot(), expected)
+
+    def test_resumes_after_a_crash_between_commit_and_checkpoint(self):
+        expected = self.export_and_wipe()
+        record = transfer.Checkpoint.record
+        calls = []
+
+        def crash_on_comments(checkpoint, offset, ids):
+            calls.append(offset)
+            # Users, categories and two batches of posts come first
+            if len(calls) == 5:
+                raise KeyboardInterrupt
+            record(checkpoint, offset, ids)
+
+        with mock.patch.object(transfer.Checkpoint, 'record', crash_on_comments):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('import_content', self.dump, batch_size=2, stdout=StringIO())
+        self.assertEqual(Comment.objects.count(), 2)
+
+        out = StringIO()
+        call_command('import_content', self.dump, batch_size=2, stdout=out)
+        self.assertIn('Resuming at byte', out.getvalue())
+        self.assertEqual(self.snapshot(), expected)
+
+
+class BulkActionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.gaming = Category.objects.create(type=Category.CategoryType.GAMING)
+        self.drafts = [
+            BlogPost.objects.create(title=f'Draft {i}', content='console roundup', author=self.author) for i in range(3)
+        ]
+        self.foreign = BlogPost.objects.create(title='Not mine', content='console', author=self.other)
+        self.client.force_authenticate(self.author)
+
+    def bulk(self, action, ids, **data):
+        return self.client.post(reverse('blog-bulk-action'), {'action': action, 'ids': ids, **data}, format='json')
+
+    def results(self, response):
+        return {row['id']: row['result'] for row in response.data['results']}
+
+    def test_publish_reports_each_id_and_indexes_the_posts(self):
+        first, second, _ = self.drafts
+        second.status = BlogPost.Status.PUBLISHED
+        second.save()
+        response = self.bulk('publish', [first.pk, second.pk, self.foreign.pk, 9999])
+        self.assertEqual(self.results(response), {
+            first.pk: 'updated', second.pk: 'unchanged', self.foreign.pk: 'not_found', 9999: 'not_found',
+        })
+        self.assertEqual(BlogPost.objects.get(pk=self.foreign.pk).status, BlogPost.Status.DRAFT)
+        found = self.client.get(reverse('blog-search'), {'q': 'console'}).data
+        self.assertEqual({post['slug'] for post in found['results']}, {first.slug, second.slug})
+
+    def test_query_count_does_not_grow_with_the_batch(self):
+        self.bulk('add_category', [post.pk for post in self.drafts], category='gaming')
+        with CaptureQueriesContext(connection) as one:
+            self.bulk('archive', [self.drafts[0].pk])
+        with CaptureQueriesContext(connection) as many:
+            self.bulk('archive', [post.pk for post in self.drafts])
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        # Publishing scores related posts for the whole batch at once
+        first, second, *rest = self.drafts + [
+            BlogPost.objects.create(title=f'Draft {i}', content='console roundup', author=self.author) for i in range(3, 5)
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bulk('publish', [first.pk])
+        with CaptureQueriesContext(connection) as one, self.captureOnCommitCallbacks(execute=True):
+            self.bulk('publish', [second.pk])
+        with CaptureQueriesContext(connection) as many, self.captureOnCommitCallbacks(execute=True):
+            self.bulk('publish', [post.pk for post in rest])
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        self.assertEqual(RelatedPost.objects.filter(post=first).count(), 4)
+
+    def test_category_actions(self):
+        first, second, third = self.drafts
+        first.category.add(self.gaming)
+        response = self.bulk('add_category', [first.pk, second.pk], category='gaming')
+        self.assertEqual(self.results(response), {first.pk: 'unchanged', second.pk: 'updated'})
+        response = self.bulk('remove_category', [first.pk, third.pk], category='gaming')
+        self.assertEqual(self.results(response), {first.pk: 'updated', third.pk: 'unchanged'})
+        self.assertEqual(list(self.gaming.blogpost_set.all()), [second])
+
+        self.assertEqual(self.bulk('add_category', [first.pk], category='missing').status_code, 400)
+        self.assertEqual(self.bulk('rename', [first.pk]).status_code, 400)
+        self.assertEqual(self.bulk('publish', []).status_code, 400)
+
+    def test_delete_cascades_and_keeps_unread_counts(self):
+        first, second, _ = self.drafts
+        comment = Comment.objects.create(post=first, author=self.other, content='Nice')
+        Like.objects.create(post=first, user=self.other)
+        Notification.objects.create(recipient=self.author, actor=self.other, verb=Notification.Verb.COMMENT, post=first)
+        Notification.objects.create(
+            recipient=self.other, actor=self.author, verb=Notification.Verb.REPLY, comment=comment
+        )
+        self.assertEqual(notifications.unread_count(self.author.pk), 1)
+        self.assertEqual(notifications.unread_count(self.other.pk), 1)
+
+        response = self.bulk('delete', [first.pk, second.pk, self.foreign.pk])
+        self.assertEqual(self.results(response), {first.pk: 'deleted', second.pk: 'deleted', self.foreign.pk: 'not_found'})
+        self.assertFalse(BlogPost.objects.filter(pk__in=[first.pk, second.pk]).exists())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Like.objects.exists())
+        self.assertFalse(Notification.objects.exists())
+        self.assertEqual(notifications.unread_count(self.author.pk), 0)
+        self.assertEqual(notifications.unread_count(self.other.pk), 0)
+
+
+    def test_delete_query_count_does_not_grow_with_the_batch(self):
+        for post in self.drafts:
+            post.status = BlogPost.Status.PUBLISHED
+            post.save()
+            post.category.add(self.gaming)
+            comment = Comment.objects.create(post=post, author=self.other, content='Nice')
+            reply = Comment.objects.create(post=post, author=self.author, parent=comment, content='Thanks')
+            CommentLike.objects.create(comment=reply, user=self.other)
+            Like.objects.create(post=post, user=self.other)
+            Bookmark.objects.create(post=post, user=self.other)
+        extra = BlogPost.objects.create(title='Extra', content='console', author=self.author)
+        extra.category.add(self.gaming)
+
+        # Savepoints, the owned ids, unread notifications, categories and
+        # related lists, a DELETE per table, the FTS rows and one recount
+        with self.assertNumQueries(23):
+            self.bulk('delete', [extra.pk])
+        with self.assertNumQueries(23):
+            response = self.bulk('delete', [post.pk for post in self.drafts])
+        self.assertEqual(set(self.results(response).values()), {'deleted'})
+        self.assertEqual(BlogPost.objects.get(pk=self.foreign.pk).title, 'Not mine')
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(CommentLike.objects.exists())
+        self.assertFalse(BlogPost.category.through.objects.exists())
+        self.assertEqual(Category.objects.get(pk=self.gaming.pk).post_count, 0)
+        self.assertEqual(self.client.get(reverse('blog-search'), {'q': 'console'}).data['count'], 0)
+
+
+class DatabaseRoutingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        isolate_page_views(self)
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Post', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        # The test database stands in for a replica
+        overrides = override_settings(DATABASE_ROUTING={'REPLICAS': ['default'], 'STICKY_SECONDS': 10})
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def replica_reads(self, method, url, **kwargs):
+        """Whether ``method`` on ``url`` read through a replica."""
+        with mock.patch.object(db.random, 'choice', return_value='default') as choice:
+            method(url, **kwargs)
+        return choice.called
+
+    def test_reads_stay_on_the_primary_after_a_write(self):
+        detail = reverse('blog-slug-details', args=[self.post.slug])
+        reader = {'Authorization': f'Bearer {AccessToken.for_user(self.reader)}'}
+        author = {'Authorization': f'Bearer {AccessToken.for_user(self.author)}'}
+        self.assertTrue(self.replica_reads(self.client.get, detail, headers=reader))
+        self.assertFalse(self.replica_reads(self.client.get, reverse('user-info'), headers=reader))
+
+        self.assertFalse(self.replica_reads(self.client.post, reverse('blog-like', args=[self.post.pk]), headers=reader))
+        self.assertFalse(self.replica_reads(self.client.get, detail, headers=reader))
+        self.assertTrue(self.replica_reads(self.client.get, detail, headers=author))
+
+        # Failed writes change nothing to read back
+        self.client.post(reverse('blog-like', args=[0]), headers=author)
+        self.assertTrue(self.replica_reads(self.client.get, detail, headers=author))
+
+    def test_database_urls(self):
+        self.assertEqual(databases.parse_url('postgres://blog:p%40ss@db:5433/techgeek?sslmode=require'), {
+            'ENGINE': 'django.db.backends.postgresql', 'NAME': 'techgeek', 'USER': 'blog', 'PASSWORD': 'p@ss',
+            'HOST': 'db', 'PORT': '5433', 'OPTIONS': {'sslmode': 'require'},
+        })
+        sqlite = databases.parse_url('sqlite:////srv/db.sqlite3')
+        self.assertEqual(sqlite['NAME'], '/srv/db.sqlite3')
+        self.assertEqual(sqlite['TEST'], {'NAME': '/srv/test_db.sqlite3'})
+        # WAL is set on the file by enable_wal, never by merely connecting
+        self.assertNotIn('journal_mode', sqlite['OPTIONS']['init_command'])
+
+        configured, replicas = databases.from_env({
+            'DATABASE_URL': 'postgres://db/techgeek',
+            'DATABASE_REPLICA_URLS': 'postgres://replica-a/techgeek, postgres://replica-b/techgeek',
+            'DATABASE_POOL': 'true',
+        }, '/unused')
+        self.assertEqual(replicas, ['replica1', 'replica2'])
+        self.assertEqual(configured['replica2']['HOST'], 'replica-b')
+        self.assertEqual(configured['replica1']['TEST'], {'MIRROR': 'default'})
+        self.assertEqual(configured['default']['OPTIONS']['pool'], {'min_size': 2, 'max_size': 10})
+        self.assertEqual(configured['default']['CONN_MAX_AGE'], 0)
+
+        configured, replicas = databases.from_env({}, '/srv/db.sqlite3')
+        self.assertEqual((configured['default']['CONN_MAX_AGE'], configured['default']['CONN_HEALTH_CHECKS']), (60, True))
+        self.assertEqual(replicas, [])
+        with self.assertRaises(ImproperlyConfigured):
+            databases.from_env({'DATABASE_POOL': '1'}, '/srv/db.sqlite3')
+
+
+class FeedTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        feed.feed_cache.clear()
+        self.addCleanup(feed.feed_cache.clear)
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.favourite = User.objects.create_user(email='favourite@example.com', password='pass')
+        self.other = User.objects.create_user(email='other@example.com', password='pass')
+        self.gaming = Category.objects.create(type=Category.CategoryType.GAMING)
+        self.news = Category.objects.create(type=Category.CategoryType.NEWS)
+
+        bookmarked = self.publish('Bookmarked', self.other, self.gaming, hours_ago=50)
+        liked = self.publish('Liked', self.favourite, hours_ago=50)
+        Bookmark.objects.create(post=bookmarked, user=self.reader)
+        Like.objects.create(post=liked, user=self.reader)
+        self.by_favourite = self.publish('By favourite', self.favourite, hours_ago=5)
+        self.in_gaming = self.publish('In gaming', self.other, self.gaming, hours_ago=4)
+        self.unrelated = self.publish('Unrelated', self.other, self.news, hours_ago=3)
+        self.publish('Own post', self.reader)
+        self.client.force_authenticate(self.reader)
+
+    def publish(self, title, author, category=None, hours_ago=0):
+        post = BlogPost.objects.create(title=title, content='Body', author=author, status=BlogPost.Status.PUBLISHED)
+        if category is not None:
+            post.category.add(category)
+        if hours_ago:
+            BlogPost.objects.filter(pk=post.pk).update(created_at=timezone.now() - timedelta(hours=hours_ago))
+        return post
+
+    def slugs(self, **params):
+        response = self.client.get(reverse('feed'), {'limit': 3, **params})
+        return [post['slug'] for post in response.data['results']]
+
+    def test_ranks_followed_authors_and_categories_first(self):
+        # Two days old but followed outranks new but unrelated
+        self.assertEqual(
+            self.slugs(limit=10), [self.by_favourite.slug, self.in_gaming.slug, 'liked', 'bookmarked', self.unrelated.slug]
+        )
+        self.assertEqual(self.client.get(reverse('feed'), {'limit': 3}).data['count'], 5)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get(reverse('feed')).status_code, 401)
+
+    def test_cached_ranking_goes_stale_when_followed_categories_publish(self):
+        self.slugs()
+        with CaptureQueriesContext(connection) as queries:
+            self.slugs()
+        # The page and its categories
+        self.assertEqual(len(queries), 2)
+
+        self.publish('More news', self.other, self.news)
+        self.assertNotIn('more-news', self.slugs(limit=10))
+
+        self.publish('More gaming', self.other, self.gaming)
+        self.assertIn('more-gaming', self.slugs(limit=10))
+
+    def test_cache_is_bounded_and_expires(self):
+        now = [1000.0]
+        feeds = feed.FeedCache(max_users=2, ttl=60, clock=lambda: now[0])
+        for user in (self.reader, self.favourite, self.other):
+            feeds.post_ids(user)
+        self.assertEqual(len(feeds), 2)
+        self.assertIsNone(feeds._fresh(self.reader.pk))
+        self.assertIsNotNone(feeds._fresh(self.other.pk))
+        now[0] += 60
+        self.assertIsNone(feeds._fresh(self.other.pk))
+
+    def test_async_view_matches(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.reader)}'}
+        expected = self.client.get(reverse('feed')).json()
+        with override_settings(ROOT_URLCONF='techgeek.asgi_urls'):
+            response = async_to_sync(self.async_client.get)(reverse('feed'), headers=headers)
+            anonymous = async_to_sync(self.async_client.get)(reverse('feed'))
+        self.assertEqual(response.json(), expected)
+        self.assertEqual(anonymous.status_code, 401)
+
+
+class RelatedPostsTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.hardware = Category.objects.create(type=Category.CategoryType.HARDWARE)
+        self.gpu = self.publish('GPU prices fall', '<p>Graphics cards and GPU prices keep falling this month.</p>')
+        self.cards = self.publish('Graphics cards reviewed', '<p>We benchmark graphics cards from every vendor.</p>')
+        self.gpu_news = self.publish('GPU shortage ends', '<p>The GPU shortage is over and prices fall.</p>')
+        self.phones = self.publish('Phones of the year', '<p>The best smartphone cameras and batteries.</p>')
+
+    def publish(self, title, content, status=BlogPost.Status.PUBLISHED):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BlogPost.objects.create(title=title, content=content, author=self.author, status=status)
+
+    def save(self, post):
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+    def related(self, post):
+        return list(RelatedPost.objects.filter(post=post).order_by('-score').values_list('related__slug', flat=True))
+
+    def test_rebuild_and_endpoint(self):
+        self.assertEqual(related.rebuild(), 4)
+        self.assertEqual(self.related(self.gpu), [self.gpu_news.slug, self.cards.slug])
+        self.assertEqual(self.related(self.phones), [])
+
+        # Sharing a category lifts the weaker match
+        self.gpu.category.add(self.hardware)
+        self.cards.category.add(self.hardware)
+        with override_settings(RELATED_POSTS={'CATEGORY_WEIGHT': 1.5}):
+            related.rebuild()
+        self.assertEqual(self.related(self.gpu), [self.cards.slug, self.gpu_news.slug])
+
+        url = reverse('blog-related', args=[self.gpu.slug])
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual([post['slug'] for post in response.data], [self.cards.slug, self.gpu_news.slug])
+
+    def test_saves_refresh_the_index(self):
+        # Each post above was indexed as it was created
+        self.assertEqual(self.related(self.gpu), [self.gpu_news.slug, self.cards.slug])
+        self.assertIn(self.gpu.slug, self.related(self.gpu_news))
+
+        later = self.publish('GPU prices fall again', '<p>GPU prices fall, graphics cards too.</p>')
+        self.assertEqual(self.related(later)[0], self.gpu.slug)
+        self.assertIn(later.slug, self.related(self.gpu))
+
+        later.status = BlogPost.Status.DRAFT
+        self.save(later)
+        self.assertNotIn(later.slug, self.related(self.gpu))
+        self.assertEqual(self.related(later), [])
+
+        self.gpu_news.content = '<p>Nothing but smartphone cameras now.</p>'
+        self.gpu_news.title = 'Camera phones'
+        self.save(self.gpu_news)
+        self.assertNotIn(self.gpu_news.slug, self.related(self.gpu))
+        self.assertEqual(self.related(self.gpu_news), [self.phones.slug])
+        self.assertIn(self.gpu_news.slug, self.related(self.phones))
+
+    @override_settings(RELATED_POSTS={'CATEGORY_WEIGHT': 1.5})
+    def test_bulk_category_changes_rescore(self):
+        self.client.force_authenticate(self.author)
+        url = reverse('blog-bulk-action')
+        ids = [self.gpu.pk, self.cards.pk]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'add_category', 'ids': ids, 'category': self.hardware.slug}, format='json')
+        self.assertEqual(self.related(self.gpu), [self.cards.slug, self.gpu_news.slug])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'remove_category', 'ids': ids, 'category': self.hardware.slug}, format='json')
+        self.assertEqual(self.related(self.gpu), [self.gpu_news.slug, self.cards.slug])
+
+    def test_a_post_and_its_categories_are_related_once_on_commit(self):
+        self.client.force_authenticate(self.author)
+        data = {'title': 'GPU deals', 'content': '<p>GPU prices fall.</p>', 'status': 'published', 'category_slugs': [self.hardware.slug]}
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.post(reverse('blog-list-create'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.related(BlogPost.objects.get(pk=response.data['id'])), [])
+        with mock.patch.object(related, 'refresh_many', wraps=related.refresh_many) as refresh_many:
+            for callback in callbacks:
+                callback()
+        refresh_many.assert_called_once()
+        self.assertIn(self.gpu.slug, self.related(BlogPost.objects.get(pk=response.data['id'])))
+
+    @override_settings(RELATED_POSTS={'K': 1})
+    def test_lists_are_refilled_when_a_neighbour_leaves(self):
+        related.rebuild()
+        self.assertEqual(self.related(self.gpu), [self.gpu_news.slug])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gpu_news.delete()
+        self.assertEqual(self.related(self.gpu), [self.cards.slug])
+        self.cards.status = BlogPost.Status.DRAFT
+        self.save(self.cards)
+        self.assertEqual(self.related(self.gpu), [])
+
+
+class CategoryRegistryTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.gaming = Category.objects.create(type=Category.CategoryType.GAMING)
+        self.news = Category.objects.create(type=Category.CategoryType.NEWS)
+
+    def post_count(self, category):
+        category.refresh_from_db()
+        return category.post_count
+
+    def test_counts_follow_publishing_links_and_deletes(self):
+        post = BlogPost.objects.create(title='Console roundup', content='Body', author=self.author)
+        post.category.add(self.gaming, self.news)
+        self.assertEqual(self.post_count(self.gaming), 0)
+
+        post.status = BlogPost.Status.PUBLISHED
+        post.save()
+        self.assertEqual((self.post_count(self.gaming), self.post_count(self.news)), (1, 1))
+        post.category.remove(self.news)
+        # No longer linked, so nothing more to take off
+        post.category.remove(self.news)
+        self.assertEqual((self.post_count(self.gaming), self.post_count(self.news)), (1, 0))
+        post.category.clear()
+        self.assertEqual(self.post_count(self.gaming), 0)
+        self.news.blogpost_set.add(post)
+        self.assertEqual(self.post_count(self.news), 1)
+
+        self.client.force_authenticate(self.author)
+        self.client.post(reverse('blog-bulk-action'), {'action': 'draft', 'ids': [post.pk]}, format='json')
+        self.assertEqual(self.post_count(self.news), 0)
+        self.client.post(reverse('blog-bulk-action'), {'action': 'publish', 'ids': [post.pk]}, format='json')
+        self.assertEqual(self.post_count(self.news), 1)
+        post.delete()
+        self.assertEqual(self.post_count(self.news), 0)
+
+        out = StringIO()
+        call_command('recount_counters', '--dry-run', stdout=out)
+        self.assertIn('0 drifted category count(s)', out.getvalue())
+
+    def test_listing_and_filter_read_the_registry(self):
+        post = BlogPost.objects.create(
+            title='Console roundup', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED,
+        )
+        post.category.add(self.gaming)
+        categories.registry.load()
+        with self.assertNumQueries(0):
+            self.assertEqual(categories.registry.by_slug('GAMING').id, self.gaming.pk)
+            self.assertEqual(categories.registry.get(self.news.pk).slug, 'news')
+
+        # Saving a category drops the registry so the next lookup sees it
+        phones = Category.objects.create(type=Category.CategoryType.SMARTPHONE)
+        self.assertEqual(categories.registry.by_slug('smartphone').id, phones.pk)
+
+        response = self.client.get(reverse('category-list'))
+        self.assertEqual(
+            [(row['slug'], row['post_count']) for row in response.data],
+            [('gaming', 1), ('news', 0), ('smartphone', 0)],
+        )
+
+        filtered = reverse('blog-filtered')
+        self.assertEqual([row['slug'] for row in self.client.get(filtered, {'slug': 'Gaming'}).data['results']], [post.slug])
+        self.assertEqual(self.client.get(filtered, {'slug': 'nope'}).data['results'], [])
+
+        self.client.force_authenticate(self.author)
+        response = self.client.post(reverse('blog-list-create'), {
+            'title': 'Phone news', 'content': 'Body', 'status': 'published', 'category_slugs': ['news', 'nope'],
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('category_slugs', response.data)
+        response = self.client.post(reverse('blog-list-create'), {
+            'title': 'Phone news', 'content': 'Body', 'status': 'published', 'category_slugs': ['news', 'smartphone'],
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((self.post_count(self.news), self.post_count(phones)), (1, 1))
+
+
+class ViewerStateTests(APITestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.posts = [
+            BlogPost.objects.create(title=f'Post {i}', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED)
+            for i in range(3)
+        ]
+        self.client.force_authenticate(self.reader)
+        response = self.client.post(reverse('comment-create'), {'slug': self.posts[0].slug, 'content': 'First'})
+        self.comment = Comment.objects.get(pk=response.data['id'])
+        self.client.post(reverse('blog-like', args=[self.posts[1].pk]))
+        self.client.post(reverse('blog-bookmark', args=[self.posts[2].pk]))
+        self.client.post(reverse('comment-like', args=[self.comment.pk]))
+
+    def get(self, **params):
+        return self.client.get(reverse('viewer-state'), params)
+
+    def test_states_and_counts_in_two_queries(self):
+        first, second, third = self.posts
+        ids = f'{third.pk},{first.pk},9999,{second.pk}'
+        with self.assertNumQueries(2):
+            response = self.get(posts=ids, comments=f'{self.comment.pk}')
+        self.assertEqual(response.data['posts'], [
+            {'id': third.pk, 'liked': False, 'bookmarked': True, 'total_likes': 0, 'total_comments': 0},
+            {'id': first.pk, 'liked': False, 'bookmarked': False, 'total_likes': 0, 'total_comments': 1},
+            {'id': second.pk, 'liked': True, 'bookmarked': False, 'total_likes': 1, 'total_comments': 0},
+        ])
+        self.assertEqual(response.data['comments'], [{'id': self.comment.pk, 'liked': True, 'total_likes': 1}])
+
+        self.client.force_authenticate(None)
+        response = self.get(posts=f'{second.pk}')
+        self.assertEqual(response.data['posts'][0]['liked'], False)
+        self.assertEqual(response.data['posts'][0]['total_likes'], 1)
+        self.assertEqual(response.data['comments'], [])
+
+    def test_rejects_malformed_and_oversized_batches(self):
+        self.assertEqual(self.get(posts='1,two').status_code, 400)
+        ids = ','.join(str(pk) for pk in range(1, 300))
+        self.assertEqual(self.get(posts=ids, comments=ids).status_code, 400)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().data, {'posts': [], 'comments': []})
+
+
+@override_settings(NOTIFICATIONS={'BROKER': 'sync', 'COALESCE_WINDOW': 3600})
+class ReactionTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(email='author@example.com', password='pass')
+        self.reader = User.objects.create_user(email='reader@example.com', password='pass')
+        self.post = BlogPost.objects.create(
+            title='Post', content='Body', author=self.author, status=BlogPost.Status.PUBLISHED
+        )
+        self.client.force_authenticate(self.reader)
+
+    def statements(self, method, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = method(url)
+        # Leaving out the SAVEPOINT/RELEASE pairs of the atomic block
+        return response, [q['sql'] for q in ctx.captured_queries if not q['sql'].startswith(('SAVEPOINT', 'RELEASE'))]
+
+    def test_put_and_delete_set_the_state(self):
+        url = reverse('blog-like', args=[self.post.pk])
+        response = self.client.put(url)
+        self.assertEqual((response.status_code, response.data['liked'], response.data['total_likes']), (201, True, 1))
+        response, sql = self.statements(self.client.put, url)
+        self.assertEqual((response.status_code, response.data['liked'], response.data['total_likes']), (200, True, 1))
+        self.assertEqual(len(sql), 2)
+        self.assertEqual(Like.objects.filter(post=self.post).count(), 1)
+
+        for _ in range(2):
+            response, sql = self.statements(self.client.delete, url)
+            self.assertEqual((response.status_code, response.data['liked'], response.data['total_likes']), (200, False, 0))
+        self.assertEqual(len(sql), 2)
+
+        bookmark_url = reverse('blog-bookmark', args=[self.post.pk])
+        response, sql = self.statements(self.client.put, bookmark_url)
+        self.assertEqual((response.data['bookmarked'], response.data['total_bookmarks'], len(sql)), (True, 1, 2))
+        self.assertTrue(Bookmark.objects.filter(post=self.post, user=self.reader).exists())
+
+        comment = Comment.objects.create(post=self.post, author=self.author, content='Hi')
+        comment_url = reverse('comment-like', args=[comment.pk])
+        self.assertEqual(self.client.put(comment_url).data['total_likes'], 1)
+        self.assertEqual(self.client.post(comment_url).data['total_likes'], 0)
+
+        self.assertEqual(self.client.put(reverse('blog-like', args=[0])).status_code, 404)
+        self.assertEqual(self.client.delete(reverse('comment-like', args=[0])).status_code, 404)
+
+    def test_repeated_likes_notify_and_trend_once(self):
+        url = reverse('blog-like', args=[self.post.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(url)
+            self.client.put(url)
+        self.assertEqual(Notification.objects.filter(recipient=self.author, verb=Notification.Verb.LIKE).count(), 1)
+        self.assertEqual(TrendingPost.objects.get(post=self.post).score, trending.config()['WEIGHTS']['like'])
+
+
+class ReactionConcurrencyTests(TransactionTestCase):
+    def test_concurrent_set_and_toggle_keep_counters_exact(self):
+        author = User.objects.create_user(email='author@example.com', password='pass')
+        readers = [User.objects.create_user(email=f'reader{i}@example.com', password='pass') for i in range(6)]
+        post = BlogPost.objects.create(title='Post', content='Body', author=author, status=BlogPost.Status.PUBLISHED)
+
+        def hammer(reader, round):
+            try:
+                for step in range(12):
+                    if (step + round) % 3 == 2:
+                        reactions.toggle(reactions.LIKE, post.pk, reader.pk)
+                    else:
+                        reactions.set_state(reactions.LIKE, post.pk, reader.pk, on=(step + round) % 2 == 0)
+                    reactions.set_state(reactions.BOOKMARK, post.pk, reader.pk, on=True)
+            finally:
+                connection.close()
+
+        # Each reader runs in several threads at once, like repeated clicks
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            for result in [pool.submit(hammer, reader, round) for reader in readers for round in range(3)]:
+                result.result()
+
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, Like.objects.filter(post=post).count())
+        self.assertEqual(post.bookmark_count, Bookmark.objects.filter(post=post).count())
+        self.assertEqual(post.bookmark_count, len(readers))
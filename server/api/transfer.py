@@ -0,0 +1,410 @@
+"""Streamed NDJSON export and import of blog content.
+
+Each line is one row in the layout of Django's ``jsonl`` serializer::
+
+    {"model": "api.comment", "pk": 12, "fields": {"post": 3, "author": "a@example.com", ...}}
+
+Users are referenced by email and categories by slug, so a dump loads into
+a database whose ids differ from the source. Posts and comments are
+referenced by their source pk and mapped to the ids they are given on
+import. Passwords are never exported; users missing on import are created
+without a usable password.
+
+``export()`` walks each table in pk order with ``.iterator(chunk_size)``,
+so memory stays flat however large the dump. Rows are written parents
+first: users, categories, posts, comments, then likes, bookmarks and
+notifications.
+
+``Importer`` reads a dump line by line and writes each model in batches of
+``bulk_create`` inside a transaction. Foreign keys resolve through
+in-memory maps built up front (users, categories, post slugs) and as rows
+are created (posts, comments). Timestamps are kept as exported.
+
+After every committed batch the importer appends the input offset and the
+ids it created to a checkpoint log, and a rerun resumes from there. A
+crash can land between a commit and its log line, so the first batch of a
+resumed run matches comments and notifications against existing rows
+before creating them. Posts match by slug, and likes and bookmarks are
+unique anyway, so replaying that batch writes nothing twice.
+"""
+import datetime
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache as django_cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from users.models import User
+from . import cache
+from .models import BlogPost, Bookmark, Category, Comment, CommentLike, Like, Notification
+from .notifications import _unread_key
+
+
+class DumpEncoder(DjangoJSONEncoder):
+    """Keeps the microseconds that ``DjangoJSONEncoder`` rounds to milliseconds."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+EXPORT_ORDER = [
+    'users.user', 'api.category', 'api.blogpost', 'api.comment',
+    'api.like', 'api.commentlike', 'api.bookmark', 'api.notification',
+]
+
+# Exported columns, renamed from lookups to the dump's field names
+COLUMNS = {
+    'users.user': (User, {'email': 'email', 'full_name': 'full_name', 'is_active': 'is_active'}),
+    'api.category': (Category, {'type': 'type', 'created_at': 'created_at'}),
+    'api.blogpost': (BlogPost, {
+        'title': 'title', 'slug': 'slug', 'content': 'content', 'image': 'image', 'status': 'status',
+        'author__email': 'author', 'view_count': 'view_count', 'like_count': 'like_count',
+        'comment_count': 'comment_count', 'bookmark_count': 'bookmark_count',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    'api.comment': (Comment, {
+        'post_id': 'post', 'author__email': 'author', 'parent_id': 'parent', 'content': 'content',
+        'is_approved': 'is_approved', 'like_count': 'like_count',
+        'created_at': 'created_at', 'updated_at': 'updated_at',
+    }),
+    'api.like': (Like, {'post_id': 'post', 'user__email': 'user', 'created_at': 'created_at'}),
+    'api.commentlike': (CommentLike, {'comment_id': 'comment', 'user__email': 'user', 'created_at': 'created_at'}),
+    'api.bookmark': (Bookmark, {'post_id': 'post', 'user__email': 'user', 'created_at': 'created_at'}),
+    'api.notification': (Notification, {
+        'recipient__email': 'recipient', 'actor__email': 'actor', 'verb': 'verb', 'post_id': 'post',
+        'comment_id': 'comment', 'is_read': 'is_read', 'created_at': 'created_at',
+    }),
+}
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def export_rows(label, chunk_size):
+    """Yield the dump records of one model, ``chunk_size`` rows per query."""
+    model, columns = COLUMNS[label]
+    rows = model._default_manager.order_by('pk').values('pk', *columns).iterator(chunk_size=chunk_size)
+    for chunk in _chunks(rows, chunk_size):
+        categories = {}
+        if label == 'api.blogpost':
+            links = BlogPost.category.through.objects.filter(blogpost_id__in=[row['pk'] for row in chunk])
+            for post_id, slug in links.order_by('category__slug').values_list('blogpost_id', 'category__slug'):
+                categories.setdefault(post_id, []).append(slug)
+        for row in chunk:
+            fields = {name: row[lookup] for lookup, name in columns.items()}
+            if label == 'api.blogpost':
+                fields['category'] = categories.get(row['pk'], [])
+            yield {'model': label, 'pk': row['pk'], 'fields': fields}
+
+
+def export(stream, labels=None, chunk_size=2000):
+    """Write the dump of ``labels`` (all models by default) to the text ``stream``."""
+    counts = {}
+    encoder = DumpEncoder(ensure_ascii=False)
+    for label in EXPORT_ORDER:
+        if labels is not None and label not in labels:
+            continue
+        counts[label] = 0
+        for record in export_rows(label, chunk_size):
+            stream.write(encoder.encode(record) + '\n')
+            counts[label] += 1
+    return counts
+
+
+@contextmanager
+def kept_timestamps(*models):
+    """Let ``bulk_create`` write the exported ``created_at``/``updated_at``."""
+    fields = [
+        field for model in models for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Checkpoint:
+    """Append-only log of committed batches: input offset and created ids."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """``(offset, {label: {source pk: pk}})`` of the batches logged so far."""
+        offset, ids = 0, {}
+        if not os.path.exists(self.path):
+            return offset, ids
+        with open(self.path, 'r+b') as log:
+            end = 0
+            for line in log:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Cut short by a crash; its batch is replayed
+                    log.truncate(end)
+                    break
+                end += len(line)
+                offset = entry['offset']
+                for label, pairs in entry['ids'].items():
+                    ids.setdefault(label, {}).update(pairs)
+        return offset, ids
+
+    def record(self, offset, ids):
+        with open(self.path, 'a', encoding='utf-8') as log:
+            log.write(json.dumps({'offset': offset, 'ids': ids}) + '\n')
+            log.flush()
+            os.fsync(log.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+class Importer:
+    # Models whose source pks other rows refer to
+    MAPPED = ('api.blogpost', 'api.comment')
+    # Models a replayed batch could duplicate, and the fields that identify a row
+    RECONCILED = {
+        'api.comment': ('post_id', 'author_id', 'created_at'),
+        'api.notification': ('recipient_id', 'actor_id', 'verb', 'created_at'),
+    }
+
+    def __init__(self, checkpoint, batch_size=2000):
+        self.checkpoint = checkpoint
+        self.batch_size = batch_size
+        self.offset, self.ids = checkpoint.load()
+        for label in self.MAPPED:
+            self.ids.setdefault(label, {})
+        # Only the first batch after a restart can already be in the database
+        self.reconcile = self.offset > 0
+        self.users = dict(User.objects.values_list('email', 'pk'))
+        self.categories = dict(Category.objects.values_list('slug', 'pk'))
+        self.slugs = dict(BlogPost.objects.values_list('slug', 'pk'))
+        self.created = dict.fromkeys(EXPORT_ORDER, 0)
+        self.skipped = dict.fromkeys(EXPORT_ORDER, 0)
+        self.recipients = set()
+
+    def run(self, stream):
+        """Import the binary ``stream`` from the checkpoint on; returns rows created per model."""
+        stream.seek(self.offset)
+        offset = self.offset
+        label, batch = None, []
+        with kept_timestamps(*(model for model, _ in COLUMNS.values())):
+            for line in stream:
+                if line.strip():
+                    record = json.loads(line)
+                    if batch and (record['model'] != label or len(batch) >= self.batch_size):
+                        self.flush(label, batch, offset)
+                        batch = []
+                    label = record['model']
+                    batch.append(record)
+                offset += len(line)
+            if batch:
+                self.flush(label, batch, offset)
+        self.finish()
+        return self.created
+
+    def flush(self, label, batch, end_offset):
+        """Write one batch of ``label`` rows, then log it as ending at ``end_offset``."""
+        if label not in COLUMNS:
+            raise ValueError(f'Unknown model in dump: {label}')
+        with transaction.atomic():
+            created = getattr(self, f'_import_{label.replace(".", "_")}')(batch)
+        self.checkpoint.record(end_offset, created)
+        for mapped, pairs in created.items():
+            self.ids[mapped].update(pairs)
+        self.reconcile = False
+
+    def finish(self):
+        cache.invalidate()
+        django_cache.delete_many([_unread_key(user_id) for user_id in self.recipients])
+
+    # Resolving references
+
+    def _user(self, email):
+        return self.users.get(email)
+
+    def _mapped(self, label, source_pk):
+        return self.ids[label].get(str(source_pk)) if source_pk is not None else None
+
+    @staticmethod
+    def _time(value):
+        return parse_datetime(value) if value else timezone.now()
+
+    def _create(self, label, objects, sources=(), ignore_conflicts=False):
+        model = COLUMNS[label][0]
+        if self.reconcile and label in self.RECONCILED:
+            objects, sources, existing = self._reconciled(label, objects, sources)
+        else:
+            existing = {}
+        model.objects.bulk_create(objects, batch_size=self.batch_size, ignore_conflicts=ignore_conflicts)
+        self.created[label] += len(objects)
+        if label not in self.MAPPED:
+            return {}
+        existing.update({str(source): obj.pk for source, obj in zip(sources, objects)})
+        return {label: existing}
+
+    def _reconciled(self, label, objects, sources):
+        """Drop the objects a crashed run already wrote, mapping them to those rows."""
+        fields = self.RECONCILED[label]
+        model = COLUMNS[label][0]
+        keys = [tuple(getattr(obj, field) for field in fields) for obj in objects]
+        rows = model.objects.filter(created_at__in={key[-1] for key in keys}).values_list(*fields, 'pk')
+        found = {tuple(row[:-1]): row[-1] for row in rows}
+        existing, kept_objects, kept_sources = {}, [], []
+        for key, obj, source in zip(keys, objects, list(sources) or [None] * len(objects)):
+            if key in found:
+                if source is not None:
+                    existing[str(source)] = found[key]
+            else:
+                kept_objects.append(obj)
+                kept_sources.append(source)
+        return kept_objects, kept_sources, existing
+
+    # One importer per model
+
+    def _import_users_user(self, batch):
+        users = []
+        for record in batch:
+            fields = record['fields']
+            if fields['email'] in self.users:
+                continue
+            users.append(User(
+                email=fields['email'], full_name=fields['full_name'], is_active=fields['is_active'],
+                password=make_password(None),
+            ))
+        User.objects.bulk_create(users, batch_size=self.batch_size, ignore_conflicts=True)
+        self.created['users.user'] += len(users)
+        self.users.update(User.objects.filter(email__in=[user.email for user in users]).values_list('email', 'pk'))
+        return {}
+
+    def _import_api_category(self, batch):
+        for record in batch:
+            fields = record['fields']
+            if fields['type'] not in self.categories:
+                category = Category(type=fields['type'], created_at=self._time(fields['created_at']))
+                category.save()
+                self.categories[category.slug] = category.pk
+                self.created['api.category'] += 1
+        return {}
+
+    def _import_api_blogpost(self, batch):
+        posts, sources, links, existing = [], [], [], {}
+        for record in batch:
+            fields = record['fields']
+            if fields['slug'] in self.slugs:
+                # Imported before, or already here under the same slug
+                existing[str(record['pk'])] = self.slugs[fields['slug']]
+                continue
+            author = self._user(fields['author'])
+            if author is None:
+                self.skipped['api.blogpost'] += 1
+                continue
+            posts.append(BlogPost(
+                title=fields['title'], slug=fields['slug'], content=fields['content'], image=fields['image'] or None,
+                status=fields['status'], author_id=author, view_count=fields['view_count'],
+                like_count=fields['like_count'], comment_count=fields['comment_count'],
+                bookmark_count=fields['bookmark_count'],
+                created_at=self._time(fields['created_at']), updated_at=self._time(fields['updated_at']),
+            ))
+            sources.append(record['pk'])
+            links.append(fields['category'])
+        created = self._create('api.blogpost', posts, sources)
+        through = BlogPost.category.through
+        through.objects.bulk_create([
+            through(blogpost_id=post.pk, category_id=self.categories[slug])
+            for post, slugs in zip(posts, links) for slug in slugs if slug in self.categories
+        ], batch_size=self.batch_size)
+        self.slugs.update({post.slug: post.pk for post in posts})
+        created['api.blogpost'].update(existing)
+        return created
+
+    def _import_api_comment(self, batch):
+        # Replies to comments in the same batch are written a level at a time
+        created, waiting = {}, batch
+        while waiting:
+            comments, sources, later = [], [], []
+            for record in waiting:
+                fields = record['fields']
+                post = self._mapped('api.blogpost', fields['post'])
+                author = self._user(fields['author'])
+                parent = None
+                if fields['parent'] is not None:
+                    parent = created.get(str(fields['parent'])) or self._mapped('api.comment', fields['parent'])
+                    if parent is None:
+                        later.append(record)
+                        continue
+                if post is None or author is None:
+                    self.skipped['api.comment'] += 1
+                    continue
+                comments.append(Comment(
+                    post_id=post, author_id=author, parent_id=parent, content=fields['content'],
+                    is_approved=fields['is_approved'], like_count=fields['like_count'],
+                    created_at=self._time(fields['created_at']), updated_at=self._time(fields['updated_at']),
+                ))
+                sources.append(record['pk'])
+            if not comments:
+                # The rest reply to comments that aren't in the dump
+                self.skipped['api.comment'] += len(later)
+                break
+            created.update(self._create('api.comment', comments, sources)['api.comment'])
+            waiting = later
+        return {'api.comment': created}
+
+    def _import_reaction(self, label, model, target_label, target_field, batch):
+        objects = []
+        for record in batch:
+            fields = record['fields']
+            target = self._mapped(target_label, fields[target_field])
+            user = self._user(fields['user'])
+            if target is None or user is None:
+                self.skipped[label] += 1
+                continue
+            objects.append(model(
+                **{f'{target_field}_id': target}, user_id=user, created_at=self._time(fields['created_at'])
+            ))
+        # Already liked or bookmarked in this database
+        return self._create(label, objects, ignore_conflicts=True)
+
+    def _import_api_like(self, batch):
+        return self._import_reaction('api.like', Like, 'api.blogpost', 'post', batch)
+
+    def _import_api_commentlike(self, batch):
+        return self._import_reaction('api.commentlike', CommentLike, 'api.comment', 'comment', batch)
+
+    def _import_api_bookmark(self, batch):
+        return self._import_reaction('api.bookmark', Bookmark, 'api.blogpost', 'post', batch)
+
+    def _import_api_notification(self, batch):
+        notifications = []
+        for record in batch:
+            fields = record['fields']
+            recipient, actor = self._user(fields['recipient']), self._user(fields['actor'])
+            post = self._mapped('api.blogpost', fields['post'])
+            comment = self._mapped('api.comment', fields['comment'])
+            missing = (fields['post'] is not None and post is None) or (fields['comment'] is not None and comment is None)
+            if recipient is None or actor is None or missing:
+                self.skipped['api.notification'] += 1
+                continue
+            notifications.append(Notification(
+                recipient_id=recipient, actor_id=actor, verb=fields['verb'], post_id=post, comment_id=comment,
+                is_read=fields['is_read'], created_at=self._time(fields['created_at']),
+            ))
+            self.recipients.add(recipient)
+        return self._create('api.notification', notifications)
@@ -0,0 +1,157 @@
+"""Time-decayed trending ranking behind the top stories endpoint.
+
+A post's score is a weighted sum of its likes, comments and views in which
+every event loses half its weight each ``HALF_LIFE_HOURS``. Scores use
+forward decay: a row stores its score as of its ``epoch``, and a new event
+at time ``t`` adds ``weight * 2 ** ((t - epoch) / half_life)``. That lets
+events be applied with one atomic UPDATE, and rows are compared by decaying
+them all to the same instant when the ranking is read.
+
+``manage.py recompute_trending`` rebuilds the table from the raw events in
+the window, which rebases every epoch and drops posts that went quiet. It
+is meant to run hourly (see the README): until it does, a post's boosts
+keep growing as ``2 ** (age / half_life)`` of its epoch, so long-lived rows
+lose float precision, and posts with no events stay in the table.
+"""
+import heapq
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, FloatField, IntegerField, Value, When
+from django.db.models.functions import Power
+from django.utils import timezone
+
+from .models import BlogPost, BlogPostView, Comment, Like, TrendingPost
+
+
+DEFAULTS = {
+    'HALF_LIFE_HOURS': 12,
+    # Events older than this are ignored by the recompute job
+    'WINDOW_HOURS': 72,
+    'WEIGHTS': {'like': 3.0, 'comment': 5.0, 'view': 1.0},
+    'DEFAULT_K': 3,
+    'MAX_K': 20,
+    # Larger top stories windows are clamped to this
+    'MAX_WINDOW_HOURS': 720,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'TRENDING', {})}
+
+
+def parse_params(params):
+    """``(k, window_hours)`` from the top stories ``limit``/``window`` parameters."""
+    cfg = config()
+    limit = params.get('limit', '')
+    window = params.get('window', '')
+    k = min(int(limit), cfg['MAX_K']) if limit.isdigit() and int(limit) else cfg['DEFAULT_K']
+    window_hours = min(int(window), cfg['MAX_WINDOW_HOURS']) if window.isdigit() and int(window) else None
+    return k, window_hours
+
+
+def _half_life_seconds():
+    return config()['HALF_LIFE_HOURS'] * 3600
+
+
+def _decay_factor(elapsed_seconds):
+    return 2 ** (elapsed_seconds / _half_life_seconds())
+
+
+def record(post_id, kind, count=1, now=None):
+    """Add ``count`` events of ``kind`` ('like', 'comment' or 'view') to a post."""
+    now = now or timezone.now()
+    weight = config()['WEIGHTS'][kind] * count
+    timestamp = now.timestamp()
+    boost = Value(weight, output_field=FloatField()) * Power(
+        Value(2.0), (Value(timestamp) - F('epoch')) / Value(float(_half_life_seconds()))
+    )
+    updated = TrendingPost.objects.filter(post_id=post_id).update(
+        score=F('score') + boost, last_event_at=now
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            TrendingPost.objects.create(post_id=post_id, score=weight, epoch=timestamp, last_event_at=now)
+    except IntegrityError:
+        # Created concurrently, or the post is gone
+        TrendingPost.objects.filter(post_id=post_id).update(score=F('score') + boost, last_event_at=now)
+
+
+def _active_rows(window_hours, now):
+    window_hours = window_hours or config()['WINDOW_HOURS']
+    return (
+        TrendingPost.objects.filter(
+            post__status=BlogPost.Status.PUBLISHED,
+            last_event_at__gte=now - timedelta(hours=window_hours),
+        )
+        .values_list('post_id', 'score', 'epoch')
+    )
+
+
+def _rank(rows, k, now):
+    # The table only holds recently active posts, so rank it in Python
+    timestamp = now.timestamp()
+    ranked = heapq.nsmallest(
+        k, rows, key=lambda row: (-row[1] / _decay_factor(timestamp - row[2]), -row[0])
+    )
+    return [post_id for post_id, _, _ in ranked]
+
+
+def top_post_ids(k, window_hours=None, now=None):
+    """Ids of the ``k`` highest scoring published posts active in the window."""
+    now = now or timezone.now()
+    return _rank(_active_rows(window_hours, now), k, now)
+
+
+async def atop_post_ids(k, window_hours=None, now=None):
+    now = now or timezone.now()
+    # Not aiterator(): multi-field values_list() runs its SQL eagerly there
+    rows = [row async for row in _active_rows(window_hours, now)]
+    return _rank(rows, k, now)
+
+
+def stories(posts, ids, k):
+    """The ``posts`` at ``ids`` in that order, then the newest others up to ``k``, in one query."""
+    rank = Case(
+        *[When(pk=post_id, then=Value(i)) for i, post_id in enumerate(ids)],
+        default=Value(len(ids)),
+        output_field=IntegerField(),
+    )
+    # Quiet periods fall back to the newest posts
+    return posts.annotate(trending_rank=rank).order_by('trending_rank', '-created_at')[:k]
+
+
+def recompute(now=None):
+    """Rebuild every score from the events in the window; returns the row count."""
+    now = now or timezone.now()
+    cfg = config()
+    since = now - timedelta(hours=cfg['WINDOW_HOURS'])
+    timestamp = now.timestamp()
+    scores = defaultdict(float)
+    last_event = {}
+    sources = [
+        ('like', Like.objects.filter(created_at__gte=since)),
+        ('comment', Comment.objects.filter(created_at__gte=since, is_approved=True)),
+        ('view', BlogPostView.objects.filter(created_at__gte=since)),
+    ]
+    for kind, events in sources:
+        weight = cfg['WEIGHTS'][kind]
+        for post_id, created_at in events.values_list('post_id', 'created_at').iterator(chunk_size=2000):
+            scores[post_id] += weight / _decay_factor(timestamp - created_at.timestamp())
+            if post_id not in last_event or created_at > last_event[post_id]:
+                last_event[post_id] = created_at
+
+    with transaction.atomic():
+        TrendingPost.objects.all().delete()
+        TrendingPost.objects.bulk_create(
+            [
+                TrendingPost(post_id=post_id, score=score, epoch=timestamp, last_event_at=last_event[post_id])
+                for post_id, score in scores.items()
+            ],
+            batch_size=1000,
+        )
+    return len(scores)
@@ -11,20 +11,28 @@ urlpatterns = [
     path('blogs/', views.BlogPostAPIView.as_view(), name='blog-list-create'),
     path('blogs/<int:pk>/', views.BlogPostDetailAPIView.as_view(), name='blog-details'),
     path('blogs/slug/<slug:slug>/', views.BlogPostSlugAPIView.as_view(), name='blog-slug-details'),
+    path('blogs/slug/<slug:slug>/related/', views.RelatedPostsAPIView.as_view(), name='blog-related'),
     path('blogs/filter/', views.FilteredBlogPostAPIView.as_view(), name='blog-filtered'),
     path('blogs/<int:pk>/like/', views.LikePostAPIView.as_view(), name='blog-like'),
     path('blogs/<int:pk>/bookmark/', views.BookmarkPostAPIView.as_view(), name='blog-bookmark'),
     path('blogs/<int:pk>/update/', views.BlogPostUpdateAPIView.as_view(), name='blog-update'),
     path('blogs/<int:pk>/delete/', views.BlogPostDeleteAPIView.as_view(), name='blog-delete'),
+    path('blogs/bulk/', views.BlogPostBulkActionAPIView.as_view(), name='blog-bulk-action'),
     path('user/drafts/', views.UserDraftPostsAPIView.as_view(), name='user-draft-posts'),
     path('user/bookmarks/', views.UserBookmarksAPIView.as_view(), name='user-bookmarks'),
     path('user/info/', views.UserInfoAPIView.as_view(), name='user-info'),
     path('user/public/<int:user_id>/', views.PublicUserInfoAPIView.as_view(), name='user-public-info'),
+    path('user/viewer-state/', views.ViewerStateAPIView.as_view(), name='viewer-state'),
     path('blogs/top-stories/', views.TopStoriesAPIView.as_view(), name='blog-top-stories'),
+    path('feed/', views.FeedAPIView.as_view(), name='feed'),
     path('blogs/search/', views.BlogPostSearchAPIView.as_view(), name='blog-search'),
+    path('blogs/autocomplete/', views.AutocompleteAPIView.as_view(), name='blog-autocomplete'),
+    path('categories/', views.CategoryListAPIView.as_view(), name='category-list'),
     path('comments/create/', views.CommentCreateAPIView.as_view(), name='comment-create'),
     path('comments/<int:pk>/update/', views.CommentUpdateAPIView.as_view(), name='comment-update'),
     path('comments/<int:pk>/delete/', views.CommentDeleteAPIView.as_view(), name='comment-delete'),
     path('comments/<int:pk>/like/', CommentLikeAPIView.as_view(), name='comment-like'),
+    path('notifications/stream/', views.notification_stream, name='notification-stream'),
+    path('cache/stats/', views.ResponseCacheStatsAPIView.as_view(), name='cache-stats'),
     path('', include(router.urls)),
 ]
@@ -0,0 +1,165 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from . import trending
+from .models import BlogPost, BlogPostView
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Flush once this many views are buffered...
+    'FLUSH_SIZE': 100,
+    # ...or once this many seconds have passed since the last flush
+    'FLUSH_INTERVAL': 30,
+    # A viewer counts once per post within this many seconds
+    'DEDUP_WINDOW': 30 * 60,
+    # Reverse proxies in front of the app that append to X-Forwarded-For;
+    # with none the header is ignored, as any client can set it
+    'TRUSTED_PROXIES': 0,
+}
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'VIEW_TRACKING', {})}
+
+
+class ViewBuffer:
+    """Buffers page views in process memory and writes them in batches.
+
+    A flush is one ``bulk_create`` into ``BlogPostView`` plus one
+    ``view_count = view_count + n`` UPDATE and one trending score UPDATE per
+    viewed post, instead of writes for every hit.
+
+    Flushes run on a worker thread, started with the first view, every
+    ``flush_interval`` seconds or as soon as ``flush_size`` views are
+    waiting, so no request waits on one and a quiet site still writes
+    its views out.
+    """
+
+    def __init__(self, flush_size, flush_interval, dedup_window, clock=time.monotonic, background=True):
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.dedup_window = dedup_window
+        self.clock = clock
+        self.background = background
+        self._lock = threading.Lock()
+        self._pending = []
+        self._seen = {}
+        self._last_flush = clock()
+        self._wake = threading.Event()
+        self._worker = None
+
+    @classmethod
+    def from_settings(cls):
+        cfg = config()
+        return cls(cfg['FLUSH_SIZE'], cfg['FLUSH_INTERVAL'], cfg['DEDUP_WINDOW'])
+
+    def record(self, post_id, ip_address, user_id=None, user_agent=''):
+        """Queue a view, returning False if the viewer was seen recently."""
+        now = self.clock()
+        viewer = user_id if user_id is not None else ip_address
+        with self._lock:
+            seen_at = self._seen.get((post_id, viewer))
+            if seen_at is not None and now - seen_at < self.dedup_window:
+                return False
+            self._seen[(post_id, viewer)] = now
+            self._pending.append(BlogPostView(
+                post_id=post_id, user_id=user_id, ip_address=ip_address, user_agent=user_agent
+            ))
+            full = len(self._pending) >= self.flush_size
+        if self.background:
+            self._ensure_worker()
+        if full:
+            self._wake.set()
+        return True
+
+    def flush_due(self):
+        """Flush if ``flush_size`` views are waiting or ``flush_interval`` has passed."""
+        with self._lock:
+            due = (
+                len(self._pending) >= self.flush_size
+                or self.clock() - self._last_flush >= self.flush_interval
+            )
+        return self.flush() if due else 0
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name='view-buffer-flush', daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                close_old_connections()
+                self.flush_due()
+            except Exception:
+                logger.exception('Could not write buffered page views')
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write every buffered view and return how many were stored."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            now = self._last_flush = self.clock()
+            self._seen = {
+                key: seen_at for key, seen_at in self._seen.items()
+                if now - seen_at < self.dedup_window
+            }
+        if not pending:
+            return 0
+
+        # Posts deleted since the view was recorded are dropped
+        existing = set(
+            BlogPost.objects.filter(pk__in={view.post_id for view in pending})
+            .order_by()
+            .values_list('pk', flat=True)
+        )
+        pending = [view for view in pending if view.post_id in existing]
+        per_post = Counter(view.post_id for view in pending)
+        with transaction.atomic():
+            BlogPostView.objects.bulk_create(pending)
+            for post_id, views in per_post.items():
+                BlogPost.objects.filter(pk=post_id).update(view_count=F('view_count') + views)
+                trending.record(post_id, 'view', views)
+        return len(pending)
+
+
+def client_ip(request):
+    """The viewer's address, read from X-Forwarded-For only behind ``TRUSTED_PROXIES`` proxies."""
+    proxies = config()['TRUSTED_PROXIES']
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and forwarded:
+        # Each trusted proxy appends the address it saw; anything further
+        # left was sent by the client and may be made up
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR')
+
+
+def record_view(request, post_id):
+    ip_address = client_ip(request)
+    if not ip_address:
+        return
+    user = request.user
+    page_views.record(
+        post_id,
+        ip_address,
+        user_id=user.pk if user.is_authenticated else None,
+        user_agent=request.META.get('HTTP_USER_AGENT', ''),
+    )
+
+
+page_views = ViewBuffer.from_settings()
+atexit.register(page_views.flush)
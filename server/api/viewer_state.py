@@ -0,0 +1,62 @@
+"""The requesting user's like and bookmark state for a batch of posts and comments.
+
+Post and comment bodies are the same for every reader, so the frontend can
+load them from the shared anonymous cache and ask for the per-user bits
+separately: whether the viewer liked or bookmarked each post, liked each
+comment, and the current counters. ``states()`` answers for up to
+``MAX_IDS`` ids with one query per model, the flags computed as ``EXISTS``
+subqueries next to the stored counters.
+"""
+from django.db.models import Exists, OuterRef
+
+from .models import BlogPost, Comment, CommentLike
+
+# Post and comment ids accepted in one request, together
+MAX_IDS = 500
+
+
+def parse_ids(value):
+    """``[1, 2, 3]`` from ``'1,2,3'``, without duplicates; None if malformed."""
+    parts = [part.strip() for part in value.split(',') if part.strip()]
+    if not all(part.isdigit() for part in parts):
+        return None
+    return list(dict.fromkeys(int(part) for part in parts))
+
+
+def _posts(user, post_ids):
+    fields = ['pk', 'like_count', 'comment_count']
+    posts = BlogPost.objects.filter(pk__in=post_ids).order_by().with_viewer_flags(user)
+    if user.is_authenticated:
+        fields += ['is_liked', 'is_bookmarked']
+    return {
+        row['pk']: {
+            'id': row['pk'],
+            'liked': row.get('is_liked', False),
+            'bookmarked': row.get('is_bookmarked', False),
+            'total_likes': row['like_count'],
+            'total_comments': row['comment_count'],
+        }
+        for row in posts.values(*fields)
+    }
+
+
+def _comments(user, comment_ids):
+    fields = ['pk', 'like_count']
+    comments = Comment.objects.filter(pk__in=comment_ids).order_by()
+    if user.is_authenticated:
+        comments = comments.annotate(is_liked=Exists(CommentLike.objects.filter(comment=OuterRef('pk'), user=user)))
+        fields.append('is_liked')
+    return {
+        row['pk']: {'id': row['pk'], 'liked': row.get('is_liked', False), 'total_likes': row['like_count']}
+        for row in comments.values(*fields)
+    }
+
+
+def states(user, post_ids=(), comment_ids=()):
+    """``{'posts': [...], 'comments': [...]}`` in the order asked, missing ids left out."""
+    posts = _posts(user, post_ids) if post_ids else {}
+    comments = _comments(user, comment_ids) if comment_ids else {}
+    return {
+        'posts': [posts[pk] for pk in post_ids if pk in posts],
+        'comments': [comments[pk] for pk in comment_ids if pk in comments],
+    }
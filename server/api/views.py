@@ -1,144 +1,201 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_safe
+from PIL import UnidentifiedImageError
 from django.shortcuts import render
 from rest_framework import generics, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import BlogPost, Like, Bookmark, Comment, CommentLike, Notification
-from .serializers import BlogPostSerializer, BookmarkSerializer, UserFullInfoSerializer, PublicUserInfoSerializer, CommentSerializer, NotificationSerializer
+from .models import BlogPost, Category, Bookmark, Comment, Notification
+from .serializers import BlogPostSerializer, BlogPostSearchResultSerializer, BlogPostSummarySerializer, BookmarkSerializer, UserFullInfoSerializer, PublicUserInfoSerializer, CommentSerializer, NotificationSerializer
 from users.models import User
 from rest_framework.permissions import IsAuthenticated
 from users.serializers import UserSerializer
-from django.utils import timezone
-from django.db.models import Count, Q
+from django.db import transaction
+from django.db.models import Q
 from rest_framework.generics import UpdateAPIView, DestroyAPIView
 from rest_framework.exceptions import PermissionDenied
 from rest_framework import viewsets
 from rest_framework.decorators import action
+from .pagination import CreatedAtCursorPagination, LimitCursorPagination, SearchResultPagination
+from .view_tracking import record_view
+from . import cache
+from .cache import AnonymousCacheMixin
+from . import conditional
+from .conditional import ConditionalGetMixin
+from .db import ReplicaReadsMixin
+from .search import SearchResults
+from .autocomplete import suggestion_index
+from . import trending
+from . import bulk, categories, feed, images, media, notifications, reactions, realtime, related, viewer_state
+from .notifications import NotificationEvent
 
 
-class BlogPostAPIView(generics.ListCreateAPIView):
-    queryset = BlogPost.objects.all()
+class BlogPostQueryMixin:
+    """Plans the queries ``BlogPostSerializer`` needs for the requesting user."""
+
+    def get_blog_post_queryset(self):
+        return BlogPost.objects.for_serializer(self.request.user)
+
+    def get_blog_post_list_queryset(self):
+        return BlogPost.objects.for_list(self.request.user)
+
+
+class PageETagMixin(ConditionalGetMixin):
+    def get_etag(self, request, *args, **kwargs):
+        return conditional.cached_for_anonymous(request, lambda: conditional.page_etag(
+            self.filter_queryset(self.get_queryset()), self.paginator, request, request.user
+        ))
+
+
+class BlogPostAPIView(ReplicaReadsMixin, PageETagMixin, AnonymousCacheMixin, BlogPostQueryMixin, generics.ListCreateAPIView):
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    pagination_class = CreatedAtCursorPagination
+
+    def get_queryset(self):
+        return self.get_blog_post_list_queryset()
+
+    def get_serializer_class(self):
+        if self.request.method in ('GET', 'HEAD'):
+            return BlogPostSummarySerializer
+        return BlogPostSerializer
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        # One transaction, so related posts are refreshed once for the post and its categories
+        with transaction.atomic():
+            serializer.save(author=self.request.user)
 
-class BlogPostSlugAPIView(generics.RetrieveAPIView):
-    queryset = BlogPost.objects.all()
+class BlogPostSlugAPIView(ReplicaReadsMixin, ConditionalGetMixin, AnonymousCacheMixin, BlogPostQueryMixin, generics.RetrieveAPIView):
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
 
-class BlogPostDetailAPIView(generics.RetrieveAPIView):
-    queryset = BlogPost.objects.all()
-    serializer_class = BlogPostSerializer
+    def get_queryset(self):
+        return self.get_blog_post_queryset()
+
+    def get_etag(self, request, slug):
+        self.post_id, etag = conditional.cached_for_anonymous(request, lambda: conditional.post_etag(slug, request.user))
+        return etag
 
+    def get(self, request, *args, **kwargs):
+        # Cached and not-modified responses still count as views
+        response = super().get(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            record_view(request, self.post_id)
+        return response
 
-class FilteredBlogPostAPIView(generics.ListAPIView):
+class BlogPostDetailAPIView(ReplicaReadsMixin, BlogPostQueryMixin, generics.RetrieveAPIView):
     serializer_class = BlogPostSerializer
-    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
     def get_queryset(self):
-        queryset = BlogPost.objects.all()
-        slug = self.request.query_params.get('slug')
-        filter_type = self.request.query_params.get('filter')
-        limit = self.request.query_params.get('limit')
+        return self.get_blog_post_queryset()
 
-        if slug:
-            queryset = queryset.filter(category__slug__iexact=slug)
 
-        if filter_type == 'recent':
-            queryset = queryset.order_by('-created_at')
+class FilteredBlogPostAPIView(ReplicaReadsMixin, PageETagMixin, AnonymousCacheMixin, BlogPostQueryMixin, generics.ListAPIView):
+    serializer_class = BlogPostSummarySerializer
+    permission_classes = [permissions.IsAuthenticatedOrReadOnly]
+    # Pages are always newest first, so filter=recent needs no extra ordering
+    # and ``limit`` is the page size
+    pagination_class = LimitCursorPagination
 
-        # Apply distinct BEFORE slicing
-        queryset = queryset.distinct()
+    def get_queryset(self):
+        queryset = self.get_blog_post_list_queryset()
+        slug = self.request.query_params.get('slug')
 
-        if limit and limit.isdigit():
-            queryset = queryset[:int(limit)]
+        if slug:
+            category = categories.registry.by_slug(slug)
+            if category is None:
+                return queryset.none()
+            # One through-table row per post and category, so no duplicates to drop
+            queryset = queryset.filter(category=category.id)
 
         return queryset
 
 
-class LikePostAPIView(APIView):
+class ReactionAPIView(APIView):
+    """PUT turns the user's like or bookmark on and DELETE turns it off, whatever it was.
+
+    POST still toggles it, for older clients. Each is one conditional write
+    and one counter update; see ``api.reactions``.
+    """
     permission_classes = [IsAuthenticated]
+    kind = None
+    not_found = 'Post not found.'
+    state_key, count_key = 'liked', 'total_likes'
+    messages = {True: 'Post liked.', False: 'Post unliked.'}
+    created_status = status.HTTP_201_CREATED
 
     def post(self, request, pk):
-        try:
-            post = BlogPost.objects.get(pk=pk)
-        except BlogPost.DoesNotExist:
-            print(f"[DEBUG] Post with pk={pk} not found.")
-            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        user = request.user
-        print(f"[DEBUG] Like attempt: user={user}, post author={post.author}, post id={post.id}")
-        like = Like.objects.filter(post=post, user=user).first()
-        if like:
-            like.delete()
-            print(f"[DEBUG] Like removed for user={user} on post id={post.id}")
-            return Response({
-                'liked': False,
-                'total_likes': post.likes.count(),
-                'message': 'Post unliked.'
-            }, status=status.HTTP_200_OK)
-        else:
-            Like.objects.create(post=post, user=user)
-            # Notification for post like
-            if post.author != user:
-                Notification.objects.create(
-                    recipient=post.author,
-                    actor=user,
-                    verb=Notification.Verb.LIKE,
-                    post=post
-                )
-                print(f"[DEBUG] Notification created: {user} liked post by {post.author}")
-            else:
-                print(f"[DEBUG] No notification: user liked their own post.")
-            return Response({
-                'liked': True,
-                'total_likes': post.likes.count(),
-                'message': 'Post liked.'
-            }, status=status.HTTP_201_CREATED)
+        return self.respond(request, pk, reactions.toggle(self.kind, pk, request.user.pk))
 
+    def put(self, request, pk):
+        return self.respond(request, pk, reactions.set_state(self.kind, pk, request.user.pk, on=True))
 
-class BookmarkPostAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+    def delete(self, request, pk):
+        return self.respond(request, pk, reactions.set_state(self.kind, pk, request.user.pk, on=False))
 
-    def post(self, request, pk):
-        try:
-            post = BlogPost.objects.get(pk=pk)
-        except BlogPost.DoesNotExist:
-            return Response({'detail': 'Post not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        user = request.user
-        bookmark, created = Bookmark.objects.get_or_create(post=post, user=user)
-        if not created:
-            # Already bookmarked, so unbookmark
-            bookmark.delete()
-            bookmarked = False
-        else:
-            bookmarked = True
-        total_bookmarks = Bookmark.objects.filter(post=post).count()
+    def respond(self, request, pk, state):
+        if state is None:
+            return Response({'detail': self.not_found}, status=status.HTTP_404_NOT_FOUND)
+        if state.changed:
+            # The writes skip the model signals that would retire cached pages
+            cache.invalidate()
+            self.changed(request, pk, state)
         return Response({
-            'bookmarked': bookmarked,
-            'total_bookmarks': total_bookmarks,
-            'message': 'Post bookmarked.' if bookmarked else 'Bookmark removed.'
-        }, status=status.HTTP_200_OK)
+            self.state_key: state.on,
+            self.count_key: state.count,
+            'message': self.messages[state.on],
+        }, status=self.created_status if state.on and state.changed else status.HTTP_200_OK)
 
+    def changed(self, request, pk, state):
+        pass
 
-class UserDraftPostsAPIView(generics.ListAPIView):
-    serializer_class = BlogPostSerializer
+
+class LikePostAPIView(ReactionAPIView):
+    kind = reactions.LIKE
+
+    def changed(self, request, pk, state):
+        event = NotificationEvent(
+            recipient_id=state.owner_id, actor_id=request.user.pk, verb=Notification.Verb.LIKE, post_id=pk
+        )
+        if not state.on:
+            # Drops the like notification if it has not been written yet
+            notifications.retract(event)
+            return
+        trending.record(pk, 'like')
+        if state.owner_id != request.user.pk:
+            notifications.notify(event)
+
+
+class BookmarkPostAPIView(ReactionAPIView):
+    kind = reactions.BOOKMARK
+    state_key, count_key = 'bookmarked', 'total_bookmarks'
+    messages = {True: 'Post bookmarked.', False: 'Bookmark removed.'}
+    created_status = status.HTTP_200_OK
+
+
+class UserDraftPostsAPIView(BlogPostQueryMixin, generics.ListAPIView):
+    serializer_class = BlogPostSummarySerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return BlogPost.objects.filter(author=self.request.user, status=BlogPost.Status.DRAFT)
+        return self.get_blog_post_list_queryset().filter(author=self.request.user, status=BlogPost.Status.DRAFT)
 
 class UserBookmarksAPIView(generics.ListAPIView):
     serializer_class = BookmarkSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return Bookmark.objects.filter(user=self.request.user).select_related('post')
+        return Bookmark.objects.filter(user=self.request.user).with_posts(self.request.user)
 
 
 class UserInfoAPIView(generics.RetrieveAPIView):
@@ -161,31 +218,92 @@ class BlogPostUpdateAPIView(generics.RetrieveUpdateAPIView):
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
 class BlogPostDeleteAPIView(generics.DestroyAPIView):
     queryset = BlogPost.objects.all()
     serializer_class = BlogPostSerializer
     permission_classes = [permissions.IsAuthenticated, IsAuthorOrReadOnly]
 
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # The cascade skips the cached unread counts
+            unread = notifications.unread_by_recipient(
+                Notification.objects.filter(Q(post=instance) | Q(comment__post=instance))
+            )
+            instance.delete()
+        notifications.forget_unread(unread)
 
-class TopStoriesAPIView(generics.ListAPIView):
-    serializer_class = BlogPostSerializer
+
+class BlogPostBulkActionAPIView(APIView):
+    """Publish, archive, recategorize or delete many of the user's posts at once."""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        action = request.data.get('action')
+        ids = request.data.get('ids')
+        if action not in bulk.ACTIONS:
+            return Response(
+                {'detail': f'action must be one of: {", ".join(bulk.ACTIONS)}.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        if not isinstance(ids, list) or not ids or not all(isinstance(pk, int) for pk in ids):
+            return Response({'detail': 'ids must be a non-empty list of post ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > bulk.MAX_IDS:
+            return Response(
+                {'detail': f'At most {bulk.MAX_IDS} posts can be changed at once.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        category = None
+        if action in bulk.CATEGORY_ACTIONS:
+            slug = request.data.get('category')
+            category = categories.registry.by_slug(slug) if isinstance(slug, str) else None
+            if category is None:
+                return Response({'detail': 'Category not found.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results = bulk.apply(request.user, action, list(dict.fromkeys(ids)), category)
+        return Response({
+            'action': action,
+            'results': [{'id': pk, 'result': result} for pk, result in results.items()],
+        })
+
+
+class TopStoriesAPIView(ReplicaReadsMixin, AnonymousCacheMixin, BlogPostQueryMixin, generics.ListAPIView):
+    serializer_class = BlogPostSummarySerializer
     permission_classes = [permissions.AllowAny]
 
     def get_queryset(self):
-        today = timezone.now().date()
+        k, window_hours = trending.parse_params(self.request.query_params)
+
         # Only published posts
-        posts = BlogPost.objects.filter(
-            status=BlogPost.Status.PUBLISHED,
-            created_at__date__lte=today
-        )
-        # Annotate with today's like count
-        posts = posts.annotate(
-            likes_today=Count('likes', filter=Q(likes__created_at__date=today))
-        ).order_by('-likes_today', '-created_at')
-        return posts[:3]
+        posts = self.get_blog_post_list_queryset().filter(status=BlogPost.Status.PUBLISHED)
+        return trending.stories(posts, trending.top_post_ids(k, window_hours), k)
+
+
+class RelatedPostsAPIView(ReplicaReadsMixin, AnonymousCacheMixin, BlogPostQueryMixin, generics.ListAPIView):
+    """Posts related to the one at ``slug``, best first (see ``api.related``)."""
+    serializer_class = BlogPostSummarySerializer
+    permission_classes = [permissions.AllowAny]
+
+    def get_queryset(self):
+        return related.related_posts(self.get_blog_post_list_queryset(), self.kwargs['slug'])[:related.config()['K']]
 
 
-class PublicUserInfoAPIView(generics.RetrieveAPIView):
+class FeedAPIView(ReplicaReadsMixin, generics.ListAPIView):
+    """The user's personalized feed (see ``api.feed``)."""
+    serializer_class = BlogPostSummarySerializer
+    permission_classes = [IsAuthenticated]
+    # Ranked like search results, so paged by offset too
+    pagination_class = SearchResultPagination
+
+    def list(self, request, *args, **kwargs):
+        post_ids = feed.feed_cache.post_ids(request.user)
+        posts = feed.hydrate(self.paginate_queryset(post_ids), request.user)
+        return self.get_paginated_response(self.get_serializer(posts, many=True).data)
+
+
+class PublicUserInfoAPIView(ReplicaReadsMixin, generics.RetrieveAPIView):
     serializer_class = PublicUserInfoSerializer
     permission_classes = [permissions.AllowAny]
     lookup_url_kwarg = 'user_id'
@@ -195,18 +313,78 @@ class PublicUserInfoAPIView(generics.RetrieveAPIView):
         return User.objects.get(pk=user_id)
 
 
-class BlogPostSearchAPIView(generics.ListAPIView):
-    serializer_class = BlogPostSerializer
+class BlogPostSearchAPIView(ReplicaReadsMixin, BlogPostQueryMixin, generics.ListAPIView):
+    serializer_class = BlogPostSearchResultSerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = SearchResultPagination
 
     def get_queryset(self):
-        queryset = BlogPost.objects.filter(status=BlogPost.Status.PUBLISHED)
-        query = self.request.query_params.get('q')
-        if query:
-            queryset = queryset.filter(
-                Q(title__icontains=query) | Q(content__icontains=query)
+        return self.get_blog_post_list_queryset().filter(status=BlogPost.Status.PUBLISHED)
+
+    def list(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '')
+        if not query.strip():
+            return super().list(request, *args, **kwargs)
+
+        # Rank through the search index, then load the page in one query
+        hits = self.paginate_queryset(SearchResults(query))
+        posts = self.get_queryset().in_bulk([hit.post_id for hit in hits])
+        results = []
+        for hit in hits:
+            post = posts.get(hit.post_id)
+            if post is None:
+                continue
+            post.search_snippet = hit.snippet
+            results.append(post)
+        serializer = self.get_serializer(results, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
+class AutocompleteAPIView(APIView):
+    """Title and category suggestions for a search prefix, served from memory."""
+    permission_classes = [permissions.AllowAny]
+    # Suggestions are the same for everyone, so skip the user lookup
+    authentication_classes = []
+    default_limit = 8
+    max_limit = 20
+
+    def get(self, request):
+        prefix = request.query_params.get('q', '')
+        limit = request.query_params.get('limit', '')
+        limit = min(int(limit), self.max_limit) if limit.isdigit() else self.default_limit
+        suggestions = suggestion_index.suggest(prefix, limit)
+        return Response({'results': [suggestion.as_dict() for suggestion in suggestions]})
+
+
+class CategoryListAPIView(ReplicaReadsMixin, AnonymousCacheMixin, APIView):
+    """Every category with its number of published posts, read off the stored counters."""
+    permission_classes = [permissions.AllowAny]
+    # The same for everyone, so every response can be cached
+    authentication_classes = []
+
+    def get(self, request):
+        rows = Category.objects.order_by('name').values('id', 'name', 'slug', 'post_count')
+        return Response(list(rows))
+
+
+class ViewerStateAPIView(ReplicaReadsMixin, APIView):
+    """The user's likes and bookmarks, and current counts, for many posts and comments at once."""
+    permission_classes = [permissions.AllowAny]
+
+    def get(self, request):
+        ids = {}
+        for param in ('posts', 'comments'):
+            ids[param] = viewer_state.parse_ids(request.query_params.get(param, ''))
+            if ids[param] is None:
+                return Response(
+                    {'detail': f'{param} must be a comma-separated list of ids.'}, status=status.HTTP_400_BAD_REQUEST
+                )
+        if len(ids['posts']) + len(ids['comments']) > viewer_state.MAX_IDS:
+            return Response(
+                {'detail': f'At most {viewer_state.MAX_IDS} ids can be looked up at once.'},
+                status=status.HTTP_400_BAD_REQUEST,
             )
-        return queryset.distinct()
+        return Response(viewer_state.states(request.user, ids['posts'], ids['comments']))
 
 
 class CommentCreateAPIView(APIView):
@@ -224,37 +402,19 @@ class CommentCreateAPIView(APIView):
         data['post'] = post.id
         serializer = CommentSerializer(data=data)
         if serializer.is_valid():
-            comment = serializer.save(author=request.user)
-            # Notification for comment or reply
-            parent_id = data.get('parent')
-            if parent_id:
-                try:
-                    parent_comment = Comment.objects.get(id=parent_id)
-                    if parent_comment.author != request.user:
-                        Notification.objects.create(
-                            recipient=parent_comment.author,
-                            actor=request.user,
-                            verb=Notification.Verb.REPLY,
-                            post=post,
-                            comment=comment
-                        )
-                        print(f"[DEBUG] Notification created: {request.user} replied to comment by {parent_comment.author}")
-                    else:
-                        print(f"[DEBUG] No notification: user replied to their own comment.")
-                except Comment.DoesNotExist:
-                    print(f"[DEBUG] Parent comment not found for reply notification.")
-            else:
-                if post.author != request.user:
-                    Notification.objects.create(
-                        recipient=post.author,
-                        actor=request.user,
-                        verb=Notification.Verb.COMMENT,
-                        post=post,
-                        comment=comment
-                    )
-                    print(f"[DEBUG] Notification created: {request.user} commented on post by {post.author}")
+            with transaction.atomic():
+                comment = serializer.save(author=request.user)
+                BlogPost.objects.filter(pk=post.pk).increment('comment_count')
+                # The serializer has already loaded the parent comment
+                if comment.parent_id:
+                    recipient_id, verb = comment.parent.author_id, Notification.Verb.REPLY
                 else:
-                    print(f"[DEBUG] No notification: user commented on their own post.")
+                    recipient_id, verb = post.author_id, Notification.Verb.COMMENT
+                if recipient_id != request.user.pk:
+                    notifications.notify(NotificationEvent(
+                        recipient_id=recipient_id, actor_id=request.user.pk, verb=verb,
+                        post_id=post.pk, comment_id=comment.pk,
+                    ))
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -278,56 +438,151 @@ class CommentDeleteAPIView(DestroyAPIView):
         # Only allow delete if user is author
         if instance.author != self.request.user:
             raise PermissionDenied('You do not have permission to delete this comment.')
-        instance.delete()
-
-class CommentLikeAPIView(APIView):
-    permission_classes = [IsAuthenticated]
+        # Notifications about the comment and its replies go with them
+        on_post = Notification.objects.filter(comment__post_id=instance.post_id)
+        with transaction.atomic():
+            unread = notifications.unread_by_recipient(on_post)
+            # Replies are removed by the cascade, so count them too
+            _, deleted = instance.delete()
+            BlogPost.objects.filter(pk=instance.post_id).increment(
+                'comment_count', -deleted.get(Comment._meta.label, 0)
+            )
+            unread -= notifications.unread_by_recipient(on_post)
+        notifications.forget_unread(unread)
 
-    def post(self, request, pk):
-        try:
-            comment = Comment.objects.get(pk=pk)
-        except Comment.DoesNotExist:
-            return Response({'detail': 'Comment not found.'}, status=status.HTTP_404_NOT_FOUND)
-
-        user = request.user
-        like = CommentLike.objects.filter(comment=comment, user=user).first()
-        if like:
-            like.delete()
-            comment.refresh_from_db()
-            return Response({
-                'liked': False,
-                'total_likes': comment.total_likes,
-                'message': 'Comment unliked.'
-            }, status=status.HTTP_200_OK)
-        else:
-            CommentLike.objects.create(comment=comment, user=user)
-            comment.refresh_from_db()
-            # Notification for comment like (optional, not required by your spec)
-            # if comment.author != user:
-            #     Notification.objects.create(
-            #         recipient=comment.author,
-            #         actor=user,
-            #         verb=Notification.Verb.LIKE,
-            #         post=comment.post,
-            #         comment=comment
-            #     )
-            return Response({
-                'liked': True,
-                'total_likes': comment.total_likes,
-                'message': 'Comment liked.'
-            }, status=status.HTTP_201_CREATED)
+class CommentLikeAPIView(ReactionAPIView):
+    kind = reactions.COMMENT_LIKE
+    not_found = 'Comment not found.'
+    messages = {True: 'Comment liked.', False: 'Comment unliked.'}
 
 
 class NotificationViewSet(viewsets.ModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
 
     def get_queryset(self):
-        return Notification.objects.filter(recipient=self.request.user)
+        return Notification.objects.filter(recipient=self.request.user).select_related('actor', 'post', 'comment')
+
+    def perform_create(self, serializer):
+        notification = serializer.save(actor=self.request.user)
+        # Counted and pushed as write_notifications() does for the broker's rows
+        if not notification.is_read:
+            notifications.adjust_unread(notification.recipient_id, 1, publish=False)
+        realtime.publish_notifications([notification])
+
+    def perform_update(self, serializer):
+        was_read = serializer.instance.is_read
+        notification = serializer.save()
+        if notification.is_read != was_read:
+            notifications.adjust_unread(notification.recipient_id, -1 if notification.is_read else 1)
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        if not instance.is_read:
+            notifications.adjust_unread(instance.recipient_id, -1)
 
     @action(detail=True, methods=['post'])
     def mark_as_read(self, request, pk=None):
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        notifications.mark_read(Notification.objects.filter(pk=notification.pk), request.user.pk)
         return Response({'status': 'marked as read'})
+
+    @action(detail=False, methods=['post'])
+    def mark_read(self, request):
+        """Mark the notifications listed in ``ids`` as read."""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(pk, int) for pk in ids):
+            return Response({'detail': 'ids must be a list of notification ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        marked = notifications.mark_read(Notification.objects.filter(pk__in=ids), request.user.pk)
+        return Response({'marked': marked, 'unread_count': notifications.unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'])
+    def mark_all_read(self, request):
+        marked = notifications.mark_read(Notification.objects.all(), request.user.pk)
+        return Response({'marked': marked, 'unread_count': notifications.unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        return Response({'unread_count': notifications.unread_count(request.user.pk)})
+
+    @action(detail=False, methods=['post'])
+    def stream_ticket(self, request):
+        """A short-lived ticket for ``notification_stream``'s ``?ticket=``."""
+        return Response({'ticket': realtime.issue_ticket(request.user), 'expires_in': realtime.config()['TICKET_TTL']})
+
+
+async def notification_stream(request):
+    """Server-Sent Events stream of the user's new notifications.
+
+    Opens with the current unread count, then sends ``notification`` and
+    ``unread`` delta events as they are published on ``api.realtime``.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {'detail': 'Notification streaming needs the ASGI server.'},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    user = await realtime.authenticate(request)
+    if user is None:
+        return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=status.HTTP_401_UNAUTHORIZED)
+
+    bus = realtime.get_bus()
+    heartbeat = realtime.config()['HEARTBEAT']
+
+    async def events():
+        # Subscribe before counting so nothing created in between is missed
+        subscription = bus.subscribe(user.pk)
+        try:
+            unread = await sync_to_async(notifications.unread_count)(user.pk)
+            yield realtime.format_event('unread', {'count': unread})
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield realtime.format_event(message['event'], message['data'])
+        finally:
+            bus.unsubscribe(subscription)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_safe
+def image_variant(request, width, name):
+    """Serve a resized image variant, rendering it on first request.
+
+    The web server should serve ``variants/`` from disk and only fall back
+    to this view for variants that don't exist yet.
+    """
+    parsed = images.parse_variant(width, name)
+    if parsed is None:
+        raise Http404
+    original, fmt = parsed
+    variant = images.variant_name(original, width, fmt)
+    try:
+        # Rendered only for files someone uploaded, not whatever is on disk
+        if not default_storage.exists(variant) and not images.is_upload(original):
+            raise Http404
+        images.ensure_variant(original, width, fmt)
+    except (FileNotFoundError, SuspiciousFileOperation, UnidentifiedImageError):
+        raise Http404
+    return media.serve(request, variant)
+
+
+@require_safe
+def media_file(request, path):
+    """Serve an uploaded file (see ``api.media``)."""
+    return media.serve(request, path)
+
+
+class ResponseCacheStatsAPIView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.stats())
@@ -3,14 +3,36 @@ ASGI config for techgeek project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests are routed through ``techgeek.asgi_urls``, which serves the hot
+read endpoints from the async views in ``api.async_views``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techgeek.settings')
 
-application = get_asgi_application()
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    urlconf = 'techgeek.asgi_urls'
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = self.urlconf
+        return request, error_response
+
+
+# What get_asgi_application() does, with the handler above
+django.setup(set_prefix=False)
+application = AsyncViewsASGIHandler()
+
+# Load the search-as-you-type index before the first request needs it
+from api.autocomplete import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
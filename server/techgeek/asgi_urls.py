@@ -0,0 +1,18 @@
+"""URLconf of the ASGI application (see techgeek/asgi.py).
+
+The async read views in ``api.async_views`` are matched ahead of the DRF
+views at the same paths; everything else is ``techgeek.urls``.
+"""
+from django.urls import path
+
+from api import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/blogs/', async_views.BlogPostListView.as_view(), name='blog-list-create'),
+    path('api/blogs/slug/<slug:slug>/', async_views.BlogPostSlugView.as_view(), name='blog-slug-details'),
+    path('api/blogs/top-stories/', async_views.TopStoriesView.as_view(), name='blog-top-stories'),
+    path('api/blogs/search/', async_views.BlogPostSearchView.as_view(), name='blog-search'),
+    path('api/feed/', async_views.FeedView.as_view(), name='feed'),
+    path('api/user/public/<int:user_id>/', async_views.PublicUserInfoView.as_view(), name='user-public-info'),
+] + sync_urlpatterns
@@ -0,0 +1,117 @@
+"""``DATABASES`` from the environment.
+
+``DATABASE_URL``
+    The primary, e.g. ``postgres://user:password@db:5432/techgeek`` or
+    ``sqlite:////srv/techgeek/db.sqlite3``. Defaults to ``db.sqlite3`` next
+    to ``manage.py``.
+``DATABASE_REPLICA_URLS``
+    Comma-separated read replicas, added as ``replica1``, ``replica2``, ...
+    and routed by ``api.db.ReplicaRouter``.
+``DATABASE_CONN_MAX_AGE``
+    Seconds a connection is reused across requests (default 60; 0 closes
+    it after every request). Reused connections are health-checked before
+    each request.
+``DATABASE_POOL``
+    ``true`` to draw PostgreSQL connections from a psycopg pool instead
+    (needs ``psycopg[pool]``), sized by ``DATABASE_POOL_MIN_SIZE`` and
+    ``DATABASE_POOL_MAX_SIZE``.
+
+Query parameters of a URL become ``OPTIONS``. SQLite connections use
+``IMMEDIATE`` transactions, so a writer takes the lock when it begins
+rather than failing part way through when another writer holds it.
+Write-ahead logging, which stops readers waiting on the writer, is a
+property of the database file rather than of a connection, so it is
+switched on once per deployment with ``manage.py enable_wal`` instead of on
+every connect, which would rewrite any database file it opened.
+
+A file-backed SQLite database gets a file-backed test database
+(``test_<name>``) too, so tests running threads lock as in production
+rather than failing with "table is locked" in shared-cache memory.
+"""
+import os
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgres': 'django.db.backends.postgresql',
+    'postgresql': 'django.db.backends.postgresql',
+    'mysql': 'django.db.backends.mysql',
+}
+
+# Run on every new SQLite connection; these only last as long as it does
+SQLITE_PRAGMAS = [
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+    'PRAGMA mmap_size=134217728',
+]
+
+SQLITE_OPTIONS = {
+    'init_command': ';'.join(SQLITE_PRAGMAS),
+    'transaction_mode': 'IMMEDIATE',
+    # Seconds a writer waits for the lock before "database is locked"
+    'timeout': 20,
+}
+
+
+def parse_url(url):
+    """The ``DATABASES`` entry described by ``url``."""
+    parts = urlsplit(url)
+    if parts.scheme not in ENGINES:
+        raise ImproperlyConfigured(f'Unsupported database URL scheme: {parts.scheme!r}')
+    options = dict(parse_qsl(parts.query))
+    if parts.scheme == 'sqlite':
+        # sqlite:////absolute/path or sqlite:///relative/path
+        name = unquote(parts.path[1:]) or ':memory:'
+        database = {
+            'ENGINE': ENGINES['sqlite'],
+            'NAME': name,
+            'OPTIONS': {**SQLITE_OPTIONS, **options},
+        }
+        if name != ':memory:':
+            directory, filename = os.path.split(name)
+            database['TEST'] = {'NAME': os.path.join(directory, f'test_{filename}')}
+        return database
+    return {
+        'ENGINE': ENGINES[parts.scheme],
+        'NAME': unquote(parts.path.lstrip('/')),
+        'USER': unquote(parts.username or ''),
+        'PASSWORD': unquote(parts.password or ''),
+        'HOST': parts.hostname or '',
+        'PORT': str(parts.port or ''),
+        'OPTIONS': options,
+    }
+
+
+def _flag(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def from_env(environ, default_sqlite_path):
+    """``(DATABASES, replica aliases)`` configured by ``environ``."""
+    primary = parse_url(environ.get('DATABASE_URL') or f'sqlite:///{default_sqlite_path}')
+    replica_urls = [url.strip() for url in environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    conn_max_age = int(environ.get('DATABASE_CONN_MAX_AGE', 60))
+    pool = _flag(environ.get('DATABASE_POOL', ''))
+
+    databases = {'default': primary}
+    for number, url in enumerate(replica_urls, 1):
+        # Tests read the primary through replica aliases rather than create them
+        databases[f'replica{number}'] = {**parse_url(url), 'TEST': {'MIRROR': 'default'}}
+
+    for alias, database in databases.items():
+        if pool:
+            if database['ENGINE'] != ENGINES['postgres']:
+                raise ImproperlyConfigured(f'DATABASE_POOL needs PostgreSQL, not {database["ENGINE"]} ({alias}).')
+            database['OPTIONS']['pool'] = {
+                'min_size': int(environ.get('DATABASE_POOL_MIN_SIZE', 2)),
+                'max_size': int(environ.get('DATABASE_POOL_MAX_SIZE', 10)),
+            }
+            # Pooled connections go back to the pool; Django refuses both
+            database['CONN_MAX_AGE'] = 0
+        else:
+            database['CONN_MAX_AGE'] = conn_max_age
+            database['CONN_HEALTH_CHECKS'] = conn_max_age != 0
+    return databases, [alias for alias in databases if alias != 'default']
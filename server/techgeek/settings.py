@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from . import databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -53,6 +56,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.db.ReadYourWritesMiddleware',
 ]
 
 
@@ -86,13 +90,31 @@ WSGI_APPLICATION = 'techgeek.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
+# Set by DATABASE_URL, DATABASE_REPLICA_URLS and friends (see
+# techgeek/databases.py); SQLite at BASE_DIR / 'db.sqlite3' by default
+DATABASES, DATABASE_REPLICAS = databases.from_env(os.environ, BASE_DIR / 'db.sqlite3')
+
+DATABASE_ROUTERS = ['api.db.ReplicaRouter']
+
+# Read replica routing for the read-only views (see api/db.py)
+DATABASE_ROUTING = {
+    'REPLICAS': DATABASE_REPLICAS,
+    'STICKY_SECONDS': 10,
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
+# Seconds an anonymous API response stays cached (see api/cache.py)
+API_CACHE_TIMEOUT = 300
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -140,6 +162,98 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+# Buffered page-view tracking (see api/view_tracking.py)
+VIEW_TRACKING = {
+    'FLUSH_SIZE': 100,
+    'FLUSH_INTERVAL': 30,
+    'DEDUP_WINDOW': 30 * 60,
+    # Set to the number of reverse proxies when deployed behind them
+    'TRUSTED_PROXIES': 0,
+}
+
+# Full-text search index: 'auto' uses SQLite FTS5 when the table exists and
+# falls back to the portable 'python' index otherwise (see api/search.py)
+SEARCH_BACKEND = 'auto'
+
+# In-memory search-as-you-type index (see api/autocomplete.py)
+AUTOCOMPLETE = {
+    'MAX_ENTRIES': 50_000,
+    'REFRESH_INTERVAL': 300,
+    'MAX_SCAN': 2_000,
+}
+
+# Categories looked up in memory by id and slug (see api/categories.py)
+CATEGORY_REGISTRY = {
+    'REFRESH_INTERVAL': 300,
+}
+
+# Time-decayed top stories ranking (see api/trending.py)
+TRENDING = {
+    'HALF_LIFE_HOURS': 12,
+    'WINDOW_HOURS': 72,
+    'WEIGHTS': {'like': 3.0, 'comment': 5.0, 'view': 1.0},
+    'DEFAULT_K': 3,
+    'MAX_K': 20,
+    'MAX_WINDOW_HOURS': 720,
+}
+
+# Precomputed TF-IDF related posts (see api/related.py)
+RELATED_POSTS = {
+    'K': 6,
+    'MAX_TERMS': 64,
+    'CATEGORY_WEIGHT': 0.5,
+}
+
+# Personalized feed rankings cached per reader (see api/feed.py)
+FEED = {
+    'SIZE': 200,
+    'CANDIDATES': 1000,
+    'TTL': 10 * 60,
+    'MAX_USERS': 10_000,
+    'HALF_LIFE_HOURS': 48,
+    'CATEGORY_WEIGHT': 2.0,
+    'AUTHOR_WEIGHT': 3.0,
+}
+
+# Batched notification writes outside the request (see api/notifications.py)
+NOTIFICATIONS = {
+    # 'thread', 'sync' or the dotted path of a broker class
+    'BROKER': 'thread',
+    'BATCH_SIZE': 200,
+    'FLUSH_INTERVAL': 1.0,
+    'COALESCE_WINDOW': 60 * 60,
+    'UNREAD_CACHE_TIMEOUT': 60 * 60,
+    # Read notifications older than this are pruned by prune_notifications
+    'RETENTION_DAYS': 90,
+}
+
+# Server-Sent Events notification push (see api/realtime.py)
+REALTIME = {
+    # 'local' or the dotted path of a bus shared between workers
+    'BUS': 'local',
+    'HEARTBEAT': 25,
+    'QUEUE_SIZE': 100,
+    'TICKET_TTL': 30,
+}
+
+# Resized copies of uploaded images (see api/images.py)
+IMAGE_VARIANTS = {
+    'WIDTHS': [320, 640, 1280],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': 80,
+    'WORKERS': 2,
+}
+
+# Media file serving (see api/media.py)
+MEDIA_SERVING = {
+    # None sends files from Django; 'x-accel-redirect' (nginx) or
+    # 'x-sendfile' (Apache, lighttpd) hands them to the web server
+    'OFFLOAD': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 60 * 60 * 24,
+    'IMMUTABLE_PREFIXES': ['variants/'],
+}
+
 MEDIA_ROOT = BASE_DIR / 'media'
 MEDIA_URL = '/media/'
 
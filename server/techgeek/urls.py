@@ -1,16 +1,21 @@
 from django.conf import settings
 from django.contrib import admin
-from django.conf.urls.static import static
 from django.urls import path, include
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+from api import views as api_views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
     path('api/', include('users.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT) 
+    # Resized images are rendered on first request (see api/images.py)
+    path(settings.MEDIA_URL.lstrip('/') + 'variants/<int:width>w/<path:name>', api_views.image_variant, name='image-variant'),
+    # Conditional and range requests, optionally offloaded (see api/media.py)
+    path(settings.MEDIA_URL.lstrip('/') + '<path:path>', api_views.media_file, name='media'),
+]
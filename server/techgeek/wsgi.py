@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'techgeek.settings')
 
 application = get_wsgi_application()
+
+# Load the search-as-you-type index before the first request needs it
+from api.autocomplete import suggestion_index  # noqa: E402
+
+suggestion_index.warm()
@@ -2,6 +2,7 @@ from rest_framework import serializers
 from .models import User
 from django.contrib.auth.password_validation import validate_password
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from api.images import ImageVariantsField
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -23,9 +24,11 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 class UserSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
+
     class Meta:
         model = User
-        fields = ['id', 'email', 'full_name', 'profile_picture']
+        fields = ['id', 'email', 'full_name', 'profile_picture', 'profile_picture_variants']
         read_only_fields = ['id', 'email']
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -42,9 +45,11 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 class ProfileUpdateSerializer(serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField(source='profile_picture')
+
     class Meta:
         model = User
-        fields = ['full_name', 'profile_picture']
+        fields = ['full_name', 'profile_picture', 'profile_picture_variants']
 
 class ChangePasswordSerializer(serializers.Serializer):
     old_password = serializers.CharField(required=True)